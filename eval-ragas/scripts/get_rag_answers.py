@@ -8,12 +8,15 @@ from urllib.request import Request, urlopen
 QUESTIONS_PATH = Path("../src/scripts/questions.json")
 OUT_DIR = Path("ragas-data")
 API_URL = "http://localhost:8000/ask"
+API_BATCH_URL = "http://localhost:8000/ask_batch"
 
 
 def parse_args():
     p = argparse.ArgumentParser(description="Lade Antworten der RAG API für RAGAS Messungen.")
     p.add_argument("-r", "--run-id", required=True, help="Dazugehörige GMT Messlauf ID.")
     p.add_argument("-d", "--date", required=True, help="Datum des Messlaufs YYYY-MM-DD (gleich wie GMT).")
+    p.add_argument("-b", "--batch-size", type=int, default=0,
+                   help="Anzahl Fragen pro Request an /ask_batch (0 = einzeln über /ask).")
     return p.parse_args()
 
 
@@ -23,10 +26,19 @@ def read_questions(path: Path):
 
 
 def fetch_json(q_id: str, question: str, timeout_s: int):
+    return _post_json(API_URL, {"q_id": q_id, "question": question}, timeout_s)
+
+
+def fetch_json_batch(questions: list[dict], timeout_s: int):
+    batch = [{"q_id": q.get("q_id"), "question": q.get("question")} for q in questions]
+    return _post_json(API_BATCH_URL, {"questions": batch}, timeout_s * len(batch))
+
+
+def _post_json(url: str, body, timeout_s: int):
     try:
-        payload = json.dumps({"q_id": q_id, "question": question}).encode("utf-8")
+        payload = json.dumps(body).encode("utf-8")
         req = Request(
-            API_URL,
+            url,
             data=payload,
             headers={"Content-Type": "application/json"},
             method="POST",
@@ -63,39 +75,44 @@ def main():
     records = []
     ok = 0
 
+    batch_size = max(1, args.batch_size)
+
     with tqdm(total=len(questions)) as pbar:
-        for idx, q in enumerate(questions, start=1):
-            q_id = q.get("q_id")
-            question = q.get("question")
-            gold_doc = q.get("gold_doc")
-            ground_truth = q.get("ground_truth", None)
-            pbar.set_description(f"Frage {q_id} wird bearbeitet")
-
-            record = {
-                "q_id": q_id,
-                "question": question,
-                "answer": None,
-                "contexts": [],
-                "context_meta": [],
-                "gold_doc": gold_doc,
-                "ground_truth": ground_truth,
-                "error": None,
-            }
-
-            res = fetch_json(q_id, question, 60)
-            record["answer"] = res.get("answer")
-            record["contexts"] = res.get("context", []) or []
-            record["context_meta"] = res.get("context_meta", []) or []
-            ok += 1
-
-            records.append(record)
-            pbar.update(1)
+        for i in range(0, len(questions), batch_size):
+            batch = questions[i:i + batch_size]
+            pbar.set_description(f"Frage {batch[0].get('q_id')} wird bearbeitet" if len(batch) == 1 else
+                                 f"Fragen {batch[0].get('q_id')} - {batch[-1].get('q_id')} werden bearbeitet")
+
+            if args.batch_size > 0:
+                results = fetch_json_batch(batch, 60)
+            else:
+                results = [fetch_json(batch[0].get("q_id"), batch[0].get("question"), 60)]
+
+            for q, res in zip(batch, results):
+                record = {
+                    "q_id": q.get("q_id"),
+                    "question": q.get("question"),
+                    "answer": None,
+                    "contexts": [],
+                    "context_meta": [],
+                    "gold_doc": q.get("gold_doc"),
+                    "ground_truth": q.get("ground_truth", None),
+                    "error": None,
+                }
+
+                record["answer"] = res.get("answer")
+                record["contexts"] = res.get("context", []) or []
+                record["context_meta"] = res.get("context_meta", []) or []
+                ok += 1
+
+                records.append(record)
+            pbar.update(len(batch))
 
     out_json = {
         "meta": {
             "run_id": run_id,
             "run_date": run_date.isoformat(),
-            "api_url": API_URL,
+            "api_url": API_BATCH_URL if args.batch_size > 0 else API_URL,
         },
         "records": records,
     }
@@ -0,0 +1,231 @@
+import copy
+import hashlib
+import json
+import logging
+import numpy as np
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from app.config import Config
+from app.embedding import embedding_variant
+from app.index_manifest import GenerationWatcher
+from app.prompt_template import BASE_PROMPT
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = "answer_cache.json"
+_WS = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    return _WS.sub(" ", question.strip().lower())
+
+
+def cache_fingerprint(cfg: Config, generation: str | None) -> str:
+    """
+    Fingerprint aller Parameter, von denen eine Antwort abhängt. Einträge mit anderem Fingerprint werden nie
+    verwendet, persistierte Caches mit anderem Fingerprint werden verworfen.
+    :param generation: Generation des Index, nach einem neuen Indexing sind die gespeicherten Antworten veraltet
+    """
+    params = {
+        "index_generation": generation,
+        "embedding_model": cfg.embedding_model,
+        "embedding_backend": embedding_variant(cfg),
+        "normalize_embeddings": cfg.normalize_embeddings,
+        "chunking_strategy": cfg.chunking_strategy,
+        "chunk_size": cfg.chunk_size,
+        "chunk_overlap": cfg.chunk_overlap,
+        "chunk_unit": cfg.chunk_unit,
+        "top_k": cfg.top_k,
+        "vector_backend": cfg.vector_backend,
+        "vector_quantization": cfg.vector_quantization,
+        "retrieval_mode": cfg.retrieval_mode,
+        "bm25_candidates": cfg.bm25_candidates,
+        "rrf_k": cfg.rrf_k,
+        "candidate_pool_factor": cfg.candidate_pool_factor,
+        "candidate_pool_max": cfg.candidate_pool_max,
+        "metadata_filter": cfg.metadata_filter,
+        "filter_pushdown": cfg.filter_pushdown,
+        "metadata_enhancement": cfg.metadata_enhancement,
+        "post_bm25_rerank": cfg.post_bm25_rerank,
+        "similarity_threshold": cfg.similarity_threshold,
+        "context_assembly": cfg.context_assembly,
+        "context_max_tokens": cfg.context_max_tokens,
+        "context_tokenizer": cfg.context_tokenizer,
+        "llm_model": cfg.llm_model,
+        "temperature": cfg.temperature,
+        "max_tokens": cfg.max_tokens,
+        "prompt": BASE_PROMPT,
+    }
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Entry:
+    key: str
+    embedding: np.ndarray
+    result: dict[str, Any]
+    created: float
+
+
+class AnswerCache:
+    """
+    Semantischer Answer Cache vor der RAG Pipeline. Ein Treffer ist entweder dieselbe (normalisierte) Frage oder eine
+    Frage, deren Embedding eine Cosinus-Ähnlichkeit >= threshold zu einer gespeicherten Frage hat. Verdrängung nach
+    LRU (max. size Einträge) und TTL (ttl_s Sekunden, 0 = unbegrenzt).
+    Wechselt die Generation des Index (neues Indexing), wird der Cache geleert.
+    """
+
+    def __init__(self, cfg: Config):
+        self.cfg = cfg
+        self._watcher = GenerationWatcher(cfg.index_dir)
+        self.generation = self._watcher.current()
+        self.fingerprint = cache_fingerprint(cfg, self.generation)
+        self.threshold = float(cfg.answer_cache_threshold)
+        self.size = max(1, cfg.answer_cache_size)
+        self.ttl_s = float(cfg.answer_cache_ttl)
+        self.path = Path(cfg.index_dir) / CACHE_FILE if cfg.answer_cache_persist else None
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._matrix: np.ndarray | None = None
+        self._matrix_keys: list[str] = []
+
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.path is not None:
+            self._load()
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_s > 0 and now - entry.created > self.ttl_s
+
+    def _invalidate(self) -> None:
+        self._matrix = None
+
+    def _check_generation(self) -> None:
+        generation = self._watcher.current()
+        if generation == self.generation:
+            return
+        logger.info(f"Neue Index-Generation {generation}, Answer Cache wird geleert ({len(self._entries)} Einträge).")
+        self.evictions += len(self._entries)
+        self._entries.clear()
+        self._invalidate()
+        self.generation = generation
+        self.fingerprint = cache_fingerprint(self.cfg, generation)
+
+    def _similarities(self, emb: np.ndarray) -> tuple[list[str], np.ndarray]:
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries)
+            self._matrix = np.stack([self._entries[k].embedding for k in self._matrix_keys])
+        return self._matrix_keys, self._matrix @ emb
+
+    @staticmethod
+    def _unit(emb: np.ndarray) -> np.ndarray:
+        emb = np.asarray(emb, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(emb))
+        return emb / norm if norm > 0 else emb
+
+    def lookup(self, question: str, emb: np.ndarray) -> tuple[dict[str, Any] | None, float]:
+        """
+        :param question: Frage
+        :param emb: Embedding der Frage
+        :return: (Gespeichertes Ergebnis oder None, Cosinus-Ähnlichkeit des besten Eintrags)
+        """
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            self._check_generation()
+            expired = [k for k, e in self._entries.items() if self._expired(e, now)]
+            for k in expired:
+                del self._entries[k]
+                self.evictions += 1
+            if expired:
+                self._invalidate()
+
+            entry = self._entries.get(key)
+            similarity = 1.0
+            if entry is not None:
+                self.exact_hits += 1
+            elif self._entries:
+                keys, sims = self._similarities(self._unit(emb))
+                best = int(np.argmax(sims))
+                similarity = float(sims[best])
+                if similarity >= self.threshold:
+                    entry = self._entries[keys[best]]
+            else:
+                similarity = 0.0
+
+            if entry is None:
+                self.misses += 1
+                return None, similarity
+
+            self.hits += 1
+            self._entries.move_to_end(entry.key)
+            return copy.deepcopy(entry.result), similarity
+
+    def add(self, question: str, emb: np.ndarray, result: dict[str, Any]) -> None:
+        key = normalize_question(question)
+        with self._lock:
+            self._check_generation()
+            self._entries[key] = _Entry(key, self._unit(emb), copy.deepcopy(result), time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._invalidate()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "exact_hits": self.exact_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning(f"Answer Cache {self.path} konnte nicht gelesen werden ({e}).")
+            return
+
+        if data.get("fingerprint") != self.fingerprint:
+            logger.info("Answer Cache wurde mit anderen Parametern erstellt und wird verworfen.")
+            return
+
+        now = time.time()
+        for e in data.get("entries", [])[-self.size:]:
+            entry = _Entry(e["key"], np.asarray(e["embedding"], dtype=np.float32), e["result"], float(e["created"]))
+            if not self._expired(entry, now):
+                self._entries[entry.key] = entry
+        logger.info(f"Answer Cache geladen: {len(self._entries)} Einträge aus {self.path}.")
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            fingerprint = self.fingerprint
+            entries = [
+                {"key": e.key, "embedding": e.embedding.tolist(), "result": e.result, "created": e.created}
+                for e in self._entries.values()
+            ]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"fingerprint": fingerprint, "entries": entries}, ensure_ascii=False),
+                       encoding="utf-8")
+        tmp.replace(self.path)
+        logger.info(f"Answer Cache gespeichert: {self.path} ({len(entries)} Einträge).")
@@ -1,7 +1,12 @@
-from fastapi import FastAPI
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.config import load_config
 from app.rag_pipeline import RagPipeline
+from app.request_executor import QueueFullError, RequestExecutor
+from app.retrieval import close_index, close_query_cache, get_query_cache, open_index
 from app.simple_logging import setup_logging
 from app.time_marker import mark
 
@@ -9,8 +14,21 @@ setup_logging()
 
 cfg = load_config()
 pipeline = RagPipeline(cfg)
+executor = RequestExecutor(cfg.api_workers, cfg.api_max_queue)
 
-app = FastAPI(title="RAG Baseline API")
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Chroma Collection und Chunk Store einmal pro Prozess öffnen, wird von allen Requests geteilt
+    open_index(cfg)
+    yield
+    executor.shutdown()
+    pipeline.close()
+    close_query_cache()
+    close_index()
+
+
+app = FastAPI(title="RAG Baseline API", lifespan=lifespan)
 
 
 class Question(BaseModel):
@@ -21,5 +39,66 @@ class Question(BaseModel):
 # POST endpoint für RAG-APP
 @app.post("/ask")
 async def ask(payload: Question):
-    result = pipeline.answer(payload.q_id, payload.question)
+    result = await _run(pipeline.answer, payload.q_id, payload.question)
     return result
+
+
+class QuestionBatch(BaseModel):
+    questions: list[Question]
+
+
+# POST endpoint für mehrere Fragen, Embedding und Vektorsuche laufen gemeinsam für alle Fragen
+@app.post("/ask_batch")
+async def ask_batch(payload: QuestionBatch):
+    results = await _run(pipeline.answer_many, [(q.q_id, q.question) for q in payload.questions])
+    return results
+
+
+# POST endpoint mit Streaming der Antwort als Server-Sent Events: zuerst der Kontext, danach die einzelnen Tokens
+@app.post("/ask_stream")
+async def ask_stream(payload: Question):
+    # Läuft wie /ask über den Request Executor und belegt für die gesamte Dauer des Streams einen Worker. Die Response
+    # beginnt erst mit dem ersten Event, damit eine volle Queue wie bei /ask mit 503 abgelehnt werden kann.
+    stream = executor.stream(pipeline.answer_stream, payload.q_id, payload.question)
+    try:
+        first = await anext(stream, None)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        return StreamingResponse(iter([_sse("error", str(e))]), media_type="text/event-stream")
+
+    async def events():
+        try:
+            if first is not None:
+                yield _sse(*first)
+                async for event, data in stream:
+                    yield _sse(event, data)
+        except Exception as e:
+            yield _sse("error", str(e))
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# GET endpoint für Queue- und Auslastungsmetriken der API
+@app.get("/metrics")
+async def metrics():
+    out = {"requests": executor.metrics(), "llm": pipeline.llm.stats()}
+    if pipeline.cache is not None:
+        out["answer_cache"] = pipeline.cache.stats()
+    if (query_cache := get_query_cache(cfg)) is not None:
+        out["query_cache"] = query_cache.stats()
+    return out
+
+
+async def _run(func, *args):
+    # Pipeline blockiert (Embedding, Chroma, Ollama), läuft deshalb im Thread Pool statt im Event Loop
+    try:
+        return await executor.run(func, *args)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
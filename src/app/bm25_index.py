@@ -0,0 +1,173 @@
+import json
+import logging
+import numpy as np
+import re
+import shutil
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Sequence
+
+logger = logging.getLogger(__name__)
+
+BM25_DIR = "bm25"
+TOK = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list[str]:
+    return TOK.findall((text or "").lower())
+
+
+def build_bm25_index(index_dir: str, docs: Iterable[tuple[str, str]], k1: float = 1.5, b: float = 0.75) -> int:
+    """
+    Baut einen korpusweiten invertierten Index (BM25) und speichert ihn in index_dir/bm25:
+    - terms.txt: Term Dictionary, Zeile t gehört zu Term t
+    - indptr.npy, postings.npy, tfs.npy: Postings im CSR Format, Term t in postings[indptr[t]:indptr[t+1]]
+    - doc_len.npy: Anzahl Tokens pro Chunk
+    - ids.txt: chunk id pro Zeile, Zeile i gehört zu Chunk i
+    - meta.json: k1, b, Anzahl Chunks und mittlere Länge
+    :param index_dir: Verzeichnis des Index
+    :param docs: (chunk id, Chunk-Text)
+    :return: Anzahl indexierter Chunks
+    """
+    vocab: dict[str, int] = {}
+    ids: list[str] = []
+    doc_len: list[int] = []
+    term_parts: list[np.ndarray] = []
+    doc_parts: list[np.ndarray] = []
+    tf_parts: list[np.ndarray] = []
+
+    for row, (chunk_id, text) in enumerate(docs):
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        ids.append(chunk_id)
+        doc_len.append(len(tokens))
+        if not counts:
+            continue
+        term_parts.append(np.fromiter((vocab.setdefault(t, len(vocab)) for t in counts), dtype=np.int32,
+                                      count=len(counts)))
+        tf_parts.append(np.fromiter(counts.values(), dtype=np.int32, count=len(counts)))
+        doc_parts.append(np.full(len(counts), row, dtype=np.int32))
+
+    terms = np.concatenate(term_parts) if term_parts else np.zeros(0, dtype=np.int32)
+    postings = np.concatenate(doc_parts) if doc_parts else np.zeros(0, dtype=np.int32)
+    tfs = np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.int32)
+
+    # Nach Term sortieren (stabil, die Chunks bleiben pro Term aufsteigend)
+    order = np.argsort(terms, kind="stable")
+    postings, tfs = postings[order], tfs[order]
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=len(vocab)), out=indptr[1:])
+
+    out_dir = Path(index_dir) / BM25_DIR
+    tmp_dir = Path(index_dir) / f"{BM25_DIR}.tmp"
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    term_list = [""] * len(vocab)
+    for t, i in vocab.items():
+        term_list[i] = t
+    (tmp_dir / "terms.txt").write_text("".join(f"{t}\n" for t in term_list), encoding="utf-8")
+    (tmp_dir / "ids.txt").write_text("".join(f"{i}\n" for i in ids), encoding="utf-8")
+    np.save(tmp_dir / "indptr.npy", indptr)
+    np.save(tmp_dir / "postings.npy", postings)
+    np.save(tmp_dir / "tfs.npy", tfs.astype(np.float32))
+    np.save(tmp_dir / "doc_len.npy", np.asarray(doc_len, dtype=np.float32))
+    avgdl = float(np.mean(doc_len)) if doc_len else 0.0
+    (tmp_dir / "meta.json").write_text(json.dumps({"k1": k1, "b": b, "n_docs": len(ids), "avgdl": avgdl}),
+                                       encoding="utf-8")
+
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    tmp_dir.rename(out_dir)
+    logger.info(f"BM25 Index gespeichert: {out_dir} ({len(ids)} Chunks, {len(vocab)} Terme, "
+                f"{len(postings)} Postings).")
+    return len(ids)
+
+
+class Bm25Index:
+    """
+    Lesezugriff auf den BM25 Index. Die Postings werden per mmap geladen, Scores werden vektorisiert über die
+    Postings der Query-Terme berechnet (IDF über den gesamten Korpus).
+    """
+
+    def __init__(self, bm25_dir: Path):
+        self.bm25_dir = bm25_dir
+        meta = json.loads((bm25_dir / "meta.json").read_text(encoding="utf-8"))
+        self.k1 = float(meta["k1"])
+        self.b = float(meta["b"])
+        self.n_docs = int(meta["n_docs"])
+        avgdl = float(meta["avgdl"]) or 1.0
+
+        terms = (bm25_dir / "terms.txt").read_text(encoding="utf-8").split("\n")[:-1]
+        self._terms: dict[str, int] = {t: i for i, t in enumerate(terms)}
+        self.ids: list[str] = (bm25_dir / "ids.txt").read_text(encoding="utf-8").split()
+        self._rows: dict[str, int] = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+
+        self._indptr = np.load(bm25_dir / "indptr.npy", mmap_mode="r")
+        self._postings = np.load(bm25_dir / "postings.npy", mmap_mode="r")
+        self._tfs = np.load(bm25_dir / "tfs.npy", mmap_mode="r")
+        doc_len = np.load(bm25_dir / "doc_len.npy")
+        # Längen-Normalisierung pro Chunk, einmal vorberechnet
+        self._norm = (self.k1 * (1.0 - self.b + self.b * doc_len / avgdl)).astype(np.float32)
+
+    @classmethod
+    def open(cls, index_dir: str) -> "Bm25Index | None":
+        bm25_dir = Path(index_dir) / BM25_DIR
+        if not (bm25_dir / "meta.json").exists():
+            return None
+        index = cls(bm25_dir)
+        logger.info(f"BM25 Index geöffnet: {bm25_dir} ({index.n_docs} Chunks, {len(index._terms)} Terme).")
+        return index
+
+    def _query_terms(self, query: str) -> list[int]:
+        return [t for t in dict.fromkeys(self._terms.get(tok, -1) for tok in tokenize(query)) if t >= 0]
+
+    def _idf(self, df: int) -> float:
+        # Nicht-negative IDF Variante (wie Lucene), damit sehr häufige Terme keinen negativen Beitrag liefern
+        return float(np.log1p((self.n_docs - df + 0.5) / (df + 0.5)))
+
+    def _accumulate(self, query: str, scores: np.ndarray, rows: np.ndarray | None = None) -> None:
+        for t in self._query_terms(query):
+            start, end = int(self._indptr[t]), int(self._indptr[t + 1])
+            if end == start:
+                continue
+            docs = self._postings[start:end]
+            tfs = self._tfs[start:end]
+            idf = self._idf(end - start)
+            if rows is None:
+                scores[docs] += idf * tfs * (self.k1 + 1.0) / (tfs + self._norm[docs])
+            else:
+                # Nur Kandidaten bewerten: Postings (aufsteigend sortiert) mit den Kandidaten schneiden
+                pos = np.minimum(np.searchsorted(docs, rows), len(docs) - 1)
+                tf = np.where(docs[pos] == rows, tfs[pos], 0.0)
+                scores += idf * tf * (self.k1 + 1.0) / (tf + self._norm[rows])
+
+    def search(self, query: str, n: int) -> tuple[list[str], np.ndarray]:
+        """
+        :param query: Frage
+        :param n: Anzahl Treffer
+        :return: chunk ids und BM25 Scores der besten n Chunks (absteigend, nur Score > 0)
+        """
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        self._accumulate(query, scores)
+        n = min(n, int(np.count_nonzero(scores)))
+        if n <= 0:
+            return [], np.zeros(0, dtype=np.float32)
+
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self.ids[i] for i in top], scores[top]
+
+    def score(self, query: str, chunk_ids: Sequence[str]) -> np.ndarray:
+        """
+        BM25 Scores (mit korpusweiter IDF) für die gegebenen Chunks, 0 für unbekannte ids.
+        """
+        rows = np.fromiter((self._rows.get(i, -1) for i in chunk_ids), dtype=np.int64, count=len(chunk_ids))
+        known = rows >= 0
+        scores = np.zeros(len(chunk_ids), dtype=np.float32)
+        if known.any():
+            sub = np.zeros(int(known.sum()), dtype=np.float32)
+            self._accumulate(query, sub, rows[known])
+            scores[known] = sub
+        return scores
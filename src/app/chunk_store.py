@@ -0,0 +1,105 @@
+import logging
+import mmap
+import numpy as np
+import shutil
+from pathlib import Path
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = "chunk_store"
+
+
+class ChunkStoreWriter:
+    """
+    Schreibt die Chunk-Texte beim Indexing in einen gepackten Store:
+    - texts.bin: alle Chunk-Texte UTF-8 kodiert hintereinander
+    - offsets.npy: Byte-Offsets (int64, N+1 Einträge), Chunk i liegt in texts.bin[offsets[i]:offsets[i+1]]
+    - ids.txt: chunk id pro Zeile, Zeile i gehört zu Chunk i
+    Geschrieben wird in ein temporäres Verzeichnis, das erst in close() den alten Store ersetzt.
+    """
+
+    def __init__(self, index_dir: str):
+        self.store_dir = Path(index_dir) / STORE_DIR
+        self._tmp_dir = Path(index_dir) / f"{STORE_DIR}.tmp"
+        if self._tmp_dir.exists():
+            shutil.rmtree(self._tmp_dir)
+        self._tmp_dir.mkdir(parents=True)
+
+        self._blob = (self._tmp_dir / "texts.bin").open("wb")
+        self._offsets: list[int] = [0]
+        self._ids: list[str] = []
+
+    def add(self, ids: List[str], texts: Iterable[str]) -> None:
+        pos = self._offsets[-1]
+        for chunk_id, text in zip(ids, texts):
+            data = text.encode("utf-8")
+            self._blob.write(data)
+            pos += len(data)
+            self._offsets.append(pos)
+            self._ids.append(chunk_id)
+
+    def copy_from(self, store: "ChunkStore", ids: Iterable[str]) -> int:
+        """
+        Übernimmt Chunks aus einem bestehenden Store (inkrementelles Indexing, unveränderte Dokumente).
+        :return: Anzahl übernommener Chunks
+        """
+        keep = [chunk_id for chunk_id in ids if chunk_id in store]
+        self.add(keep, (store.get(chunk_id) for chunk_id in keep))
+        return len(keep)
+
+    def close(self) -> None:
+        self._blob.close()
+        np.save(self._tmp_dir / "offsets.npy", np.asarray(self._offsets, dtype=np.int64))
+        (self._tmp_dir / "ids.txt").write_text("".join(f"{i}\n" for i in self._ids), encoding="utf-8")
+
+        if self.store_dir.exists():
+            shutil.rmtree(self.store_dir)
+        self._tmp_dir.rename(self.store_dir)
+        logger.info(f"Chunk Store gespeichert: {self.store_dir} ({len(self._ids)} Chunks, "
+                    f"{self._offsets[-1] / 2 ** 20:.1f} MiB).")
+
+
+class ChunkStore:
+    """
+    Lesezugriff auf den Chunk Store. texts.bin und offsets.npy werden per mmap geöffnet, ein Chunk-Text wird über
+    seine id ohne Datei-Zugriffe und ohne Dekodieren des gesamten Dokuments geladen.
+    """
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = store_dir
+        self._offsets = np.load(store_dir / "offsets.npy", mmap_mode="r")
+        ids = (store_dir / "ids.txt").read_text(encoding="utf-8").split()
+        self._rows: dict[str, int] = {chunk_id: i for i, chunk_id in enumerate(ids)}
+
+        self._file = (store_dir / "texts.bin").open("rb")
+        self._blob: mmap.mmap | bytes = b""
+        if self._offsets[-1] > 0:
+            self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def open(cls, index_dir: str) -> "ChunkStore | None":
+        store_dir = Path(index_dir) / STORE_DIR
+        if not (store_dir / "ids.txt").exists():
+            return None
+        store = cls(store_dir)
+        logger.info(f"Chunk Store geöffnet: {store_dir} ({len(store)} Chunks).")
+        return store
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._rows
+
+    def get(self, chunk_id: str) -> str | None:
+        row = self._rows.get(chunk_id)
+        if row is None:
+            return None
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return self._blob[start:end].decode("utf-8")
+
+    def close(self) -> None:
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._file.close()
@@ -0,0 +1,389 @@
+import json
+import logging
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Tuple
+
+import numpy as np
+
+from app.block_types import ALLOWED_BLOCK_TYPES, BLOCK_TYPES_ALIASES
+
+logger = logging.getLogger(__name__)
+
+# Zeilenumbrüche wie bei str.splitlines(); alle außer \r und \n sind zugleich Whitespace
+_NL = "\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+_NL_WS = "\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+# Marker-Zeile (# - ######), gefunden in einem Durchlauf über den gesamten Text. Eingerückte Marker zählen nur für
+# den Dokumenttitel, nicht als Block-Marker. Wie zuvor in der zeilenweisen Implementierung reicht auch ein
+# Whitespace-Zeilenumbruch (z.B. \f) direkt nach den "#" als Trennzeichen.
+_MARKER_RE = re.compile(
+    rf"(?:(?<=[{_NL}])|\A)([^\S{_NL}]*)(#{{1,6}})(?:[^\S{_NL}]+([^{_NL}]*)|(?=[{_NL_WS}]))"
+)
+# Schneller Pfad für Texte, die nur "\n" als Zeilenumbruch enthalten (Normalfall, read_text() normalisiert \r\n)
+_MARKER_NL_RE = re.compile(r"^([^\S\n]*)(#{1,6})[^\S\n]+([^\n]*)", re.MULTILINE)
+_LINE_END_RE = re.compile(rf"\r\n|[{_NL}]|\Z")
+_NON_WS_RE = re.compile(r"\S")
+
+
+@dataclass
+class RawDocument:
+    text: str
+    metadata: Dict[str, Any]
+
+
+@dataclass
+class ChunkedDocument:
+    """
+    Kompakte Darstellung aller Chunks eines Dokuments: Volltext und Metadaten nur einmal, Chunks als Offsets in den
+    Volltext und Block-Metadaten einmal pro Block statt pro Chunk.
+    """
+    text: str
+    metadata: Dict[str, Any]
+    spans: List[Tuple[int, int, int, int]]  # (chunk_index, chunk_start, chunk_end, block_id)
+    blocks: List[Dict[str, Any]]            # Block-Metadaten, über block_id referenziert (leer bei simple)
+
+    def to_chunks(self) -> List[RawDocument]:
+        chunks: list[RawDocument] = []
+        for chunk_index, start, end, block_id in self.spans:
+            meta = dict(self.metadata)
+            if block_id >= 0:
+                meta.update(self.blocks[block_id])
+            meta["chunk_index"] = chunk_index
+            meta["chunk_start"] = start
+            meta["chunk_end"] = end
+            chunks.append(RawDocument(text=self.text[start:end], metadata=meta))
+        return chunks
+
+
+def _read_document(path: Path) -> RawDocument | None:
+    try:
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        if not text.strip():
+            logger.warning(f"Leeres Dokument: {path}")
+            return None
+
+        metadata = {
+            "source": str(path),
+            "type": "txt",
+        }
+        return RawDocument(text=text, metadata=metadata)
+    except Exception as e:
+        logger.error(f"Fehler beim Laden von {path}: {e}")
+        return None
+
+
+# ========== TOKENS ==========
+#
+# Chunk-Größe in Tokens des Embedding Modells (chunk_unit: tokens). Das Dokument wird einmal mit dem Fast Tokenizer
+# tokenisiert, die Chunks sind Fenster über die Tokens und werden über das Offset Mapping wieder in Zeichen-Offsets
+# übersetzt (chunk_start, chunk_end bleiben damit Zeichen-Offsets im Dokument).
+
+@lru_cache(maxsize=4)
+def load_chunk_tokenizer(model_dir: str):
+    """
+    Fast Tokenizer des lokalen Embedding Modells, model_max_length = max_seq_length des Modells (bis dahin embedded
+    SentenceTransformer, der Rest wird abgeschnitten). Einmal pro Prozess geladen.
+    """
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir, local_files_only=True)
+    if not tokenizer.is_fast:
+        logger.error(f"Token Chunking benötigt einen Fast Tokenizer (Offset Mapping): {model_dir}")
+        raise ValueError()
+
+    config = Path(model_dir) / "sentence_bert_config.json"
+    if config.exists():
+        max_seq_length = json.loads(config.read_text(encoding="utf-8")).get("max_seq_length")
+        if max_seq_length:
+            tokenizer.model_max_length = int(max_seq_length)
+    return tokenizer
+
+
+def max_chunk_tokens(tokenizer) -> int:
+    # Spezial-Tokens ([CLS], [SEP]) zählen zur max. Sequenzlänge des Modells
+    return max(1, tokenizer.model_max_length - tokenizer.num_special_tokens_to_add(pair=False))
+
+
+def _token_offsets(tokenizer, text: str) -> np.ndarray:
+    """
+    :return: Zeichen-Offsets (start, end) aller Tokens des Texts ohne Spezial-Tokens, Shape (n, 2)
+    """
+    enc = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, return_attention_mask=False,
+                    return_token_type_ids=False, verbose=False)
+    return np.asarray(enc["offset_mapping"], dtype=np.int64).reshape(-1, 2)
+
+
+def _token_windows(offsets: np.ndarray, start_abs: int, end_abs: int, chunk_size: int,
+                   chunk_overlap: int) -> Iterator[tuple[int, int]]:
+    """
+    Fenster von max. chunk_size Tokens mit chunk_overlap Tokens Overlap über die Tokens in [start_abs, end_abs).
+    Start und Ende liegen, wenn möglich, an Wortgrenzen (Whitespace): ein mitten im Wort geschnittener Chunk würde
+    beim Embedding in mehr Tokens zerfallen als im gesamten Dokument und wieder über die Sequenzlänge kommen.
+    :return: (chunk_start, chunk_end) als Zeichen-Offsets
+    """
+    lo = int(np.searchsorted(offsets[:, 0], start_abs, side="left"))
+    hi = int(np.searchsorted(offsets[:, 0], end_abs, side="left"))
+    if lo >= hi:
+        return
+
+    # word_start[t - lo]: letztes Token <= t, vor dem Whitespace steht (Beginn eines Worts)
+    idx = np.arange(lo, hi)
+    is_start = np.ones(hi - lo, dtype=bool)
+    is_start[1:] = offsets[lo + 1:hi, 0] > offsets[lo:hi - 1, 1]
+    word_start = np.maximum.accumulate(np.where(is_start, idx, lo))
+
+    i = lo
+    while i < hi:
+        j = min(i + chunk_size, hi)
+        if j < hi and word_start[j - lo] > i:
+            j = int(word_start[j - lo])
+        yield int(offsets[i, 0]), min(int(offsets[j - 1, 1]), end_abs)
+        if j == hi:
+            break
+
+        nxt = max(i + 1, j - chunk_overlap)
+        if word_start[nxt - lo] > i:
+            nxt = int(word_start[nxt - lo])
+        i = nxt
+
+
+def chunk_token_lengths(tokenizer, texts: List[str]) -> np.ndarray:
+    """
+    Anzahl Tokens pro Chunk inkl. Spezial-Tokens, ohne Abschneiden (für die Truncation-Statistik im Indexing).
+    """
+    if not texts:
+        return np.zeros(0, dtype=np.int64)
+    enc = tokenizer(texts, return_attention_mask=False, return_token_type_ids=False, return_length=True,
+                    verbose=False)
+    return np.asarray(enc["length"], dtype=np.int64)
+
+
+# ========== CHUNKING ==========
+#
+# Verschiedene Chunking Strategien implementieren
+# 1. _simple_chunk(): Feste Chunk Größe und fester Overlap, möglichst einfaches aufteilen der Dokumente
+# 2. _structure_chunk(): Chunking auf Basis von strukturellen Eigenschaften der Dokumente
+#
+# Mit tokenizer sind chunk_size und chunk_overlap in Tokens (begrenzt auf die max. Sequenzlänge des Modells),
+# sonst in Zeichen.
+
+def _simple_chunk(doc: RawDocument, chunk_size: int, chunk_overlap: int, tokenizer=None) -> List[RawDocument]:
+    """
+    Einfache Chunking Strategie mit fester chunk size und einem festen overlap zwischen den Chunks.
+    :param doc: Liste der Raw Textdokumente
+    :param chunk_size: Größe der Chunks
+    :param chunk_overlap: Overlap zwischen Chunks
+    :param tokenizer: Fast Tokenizer des Embedding Modells, wenn chunk_size in Tokens (siehe load_chunk_tokenizer)
+    :return: Liste der gechunkten Dokumente
+    """
+    text = doc.text
+    chunks: list[RawDocument] = []
+    chunk_index = 0
+
+    if tokenizer is not None:
+        chunk_size = min(chunk_size, max_chunk_tokens(tokenizer))
+        windows = _token_windows(_token_offsets(tokenizer, text), 0, len(text), chunk_size,
+                                 min(chunk_overlap, chunk_size - 1))
+        for chunk_index, (start, end) in enumerate(windows):
+            metadata = dict(doc.metadata)
+            metadata["chunk_index"] = chunk_index
+            metadata["chunk_start"] = start
+            metadata["chunk_end"] = end
+            chunks.append(RawDocument(text=text[start:end], metadata=metadata))
+        return chunks
+
+    start = 0
+    step = max(1, chunk_size - chunk_overlap)
+
+    while start < len(text):
+        end = start + chunk_size
+        chunk_text = text[start:end]
+        metadata = dict(doc.metadata)
+        metadata["chunk_index"] = chunk_index
+        metadata["chunk_start"] = start
+        metadata["chunk_end"] = min(end, len(text))
+        if chunk_text.strip():
+            chunks.append(RawDocument(text=chunk_text, metadata=metadata))
+        chunk_index += 1
+        start += step
+
+    return chunks
+
+
+def _block_type(hashes: str, title: str) -> str:
+    if len(hashes) == 1:
+        return "title"
+
+    if len(hashes) == 6:
+        first = (title.split()[0] if title else "").lower()
+        first = first.strip(" \t\r\n()[]{}<>\"'“”‘’").rstrip(".,;:")    # Satzzeichen filtern
+        if (not first) or any(ch.isdigit() for ch in first):            # Nummerierungen filtern
+            return "special"
+        first = BLOCK_TYPES_ALIASES.get(first, first)
+        return first if first in ALLOWED_BLOCK_TYPES else "special"
+
+    return "heading"
+
+
+def _structure_spans(doc: RawDocument, chunk_size: int, chunk_overlap: int, tokenizer=None) -> ChunkedDocument:
+    """
+    Chunking auf Basis der Markdown Strukturen der arXiv Dokumente im Datensatz. Mit sections: #-#####;
+    besondere Blöcke: ###### (Abstract, Theorem, Definition, Proof, ...). Das Chunking findet auf Basis dieser Blöcke
+    statt. Die Information dieser Blöcke (Typ, Titel, ...) wird zusätzlich zu Start und Ende des Chunks als Metadaten
+    zum Chunk gespeichert.
+    Alle Marker werden in einem Durchlauf über den Text gefunden, Chunks werden nur als Offsets (start, end, block_id)
+    erzeugt, ohne Teilstrings oder Metadaten pro Chunk zu kopieren.
+    :param doc: Raw Textdokument
+    :param chunk_size: maximale Größe der Chunks
+    :param chunk_overlap: Overlap zwischen Chunks
+    :param tokenizer: Fast Tokenizer des Embedding Modells, wenn chunk_size in Tokens (siehe load_chunk_tokenizer)
+    :return: Kompakte Chunks des Dokuments
+    """
+    text = doc.text
+    spans: list[tuple[int, int, int, int]] = []
+    blocks: list[dict[str, Any]] = []
+
+    # Block-Grenzen: (Start, Ende, Marker-Titel, Block Typ); der erste Block vor einem Marker ist vom Typ "text"
+    bounds: list[tuple[int, int, str, str]] = []
+    doc_title = ""
+    block_start, block_title, block_type = 0, "", "text"
+
+    marker_re = _MARKER_RE if any(c in text for c in _NL[1:]) else _MARKER_NL_RE
+    for m in marker_re.finditer(text):
+        indent, hashes, title = m.group(1), m.group(2), (m.group(3) or "").strip()
+
+        # Doc Title: erste Zeile mit "#" (auch eingerückt)
+        if not doc_title and len(hashes) == 1 and title:
+            doc_title = title
+        if indent:
+            continue
+
+        bounds.append((block_start, m.start(), block_title, block_type))
+        block_start = _LINE_END_RE.search(text, m.end()).end()
+        block_title, block_type = title, _block_type(hashes, title)
+
+    bounds.append((block_start, len(text), block_title, block_type))
+
+    # Fallback wenn kein "#": 1st (non-empty) line in Doc
+    if not doc_title:
+        first = _NON_WS_RE.search(text)
+        if first:
+            doc_title = text[first.start():_LINE_END_RE.search(text, first.start()).start()].strip()
+
+    offsets = None
+    if tokenizer is not None:
+        offsets = _token_offsets(tokenizer, text)
+        chunk_size = min(chunk_size, max_chunk_tokens(tokenizer))
+        chunk_overlap = min(chunk_overlap, chunk_size - 1)
+
+    chunk_index = 0
+    for start_abs, end_abs, title, btype in bounds:
+        if end_abs <= start_abs or not _NON_WS_RE.search(text, start_abs, end_abs):
+            continue
+
+        block_id = len(blocks)
+        blocks.append({"doc_title": doc_title, "block_title": title, "block_type": btype})
+
+        if offsets is not None:
+            for start, end in _token_windows(offsets, start_abs, end_abs, chunk_size, chunk_overlap):
+                spans.append((chunk_index, start, end, block_id))
+                chunk_index += 1
+            continue
+
+        start = start_abs
+        while start < end_abs:
+            end = min(start + chunk_size, end_abs)
+            if _NON_WS_RE.search(text, start, end):
+                spans.append((chunk_index, start, end, block_id))
+                chunk_index += 1
+
+            if end == end_abs:
+                break
+
+            start = max(start + 1, end - chunk_overlap) if chunk_overlap > 0 else end
+
+    return ChunkedDocument(text=text, metadata=doc.metadata, spans=spans, blocks=blocks)
+
+
+def _structure_chunk(doc: RawDocument, chunk_size: int, chunk_overlap: int, tokenizer=None) -> List[RawDocument]:
+    """
+    Structure Chunking (siehe _structure_spans), Chunks als einzelne Dokumente mit Metadaten.
+    :param doc: Raw Textdokument
+    :param chunk_size: maximale Größe der Chunks
+    :param chunk_overlap: Overlap zwischen Chunks
+    :param tokenizer: Fast Tokenizer des Embedding Modells, wenn chunk_size in Tokens
+    :return: Liste der gechunkten Dokumente
+    """
+    return _structure_spans(doc, chunk_size, chunk_overlap, tokenizer).to_chunks()
+
+
+_CHUNK_FUNCS = {
+    "simple": _simple_chunk,
+    "structure": _structure_chunk,
+}
+
+
+# ========== PARALLELES CHUNKING ==========
+#
+# Chunking über mehrere Prozesse. Die Worker lesen und chunken die Dokumente selbst und geben pro Dokument eine
+# kompakte Darstellung zurück (Volltext und Metadaten einmal, Chunks nur als Offsets), statt einer Kopie von Text
+# und Metadaten pro Chunk. Das reduziert die Daten, die zwischen den Prozessen serialisiert werden müssen.
+
+def _compact(doc: RawDocument, chunks: List[RawDocument]) -> ChunkedDocument:
+    block_ids: dict[tuple, int] = {}
+    blocks: list[dict[str, Any]] = []
+    spans: list[tuple[int, int, int, int]] = []
+
+    for c in chunks:
+        m = c.metadata
+        block_id = -1
+        if "block_type" in m:
+            key = (m["doc_title"], m["block_title"], m["block_type"])
+            block_id = block_ids.get(key, -1)
+            if block_id < 0:
+                block_id = block_ids[key] = len(blocks)
+                blocks.append({"doc_title": key[0], "block_title": key[1], "block_type": key[2]})
+        spans.append((m["chunk_index"], m["chunk_start"], m["chunk_end"], block_id))
+
+    return ChunkedDocument(text=doc.text, metadata=doc.metadata, spans=spans, blocks=blocks)
+
+
+def _chunk_file(path: Path, strategy: str, chunk_size: int, chunk_overlap: int,
+                tokenizer_dir: str | None = None) -> ChunkedDocument | None:
+    doc = _read_document(path)
+    if doc is None:
+        return None
+    tokenizer = load_chunk_tokenizer(tokenizer_dir) if tokenizer_dir else None
+    if strategy == "structure":
+        return _structure_spans(doc, chunk_size=chunk_size, chunk_overlap=chunk_overlap, tokenizer=tokenizer)
+    chunks = _CHUNK_FUNCS[strategy](doc, chunk_size=chunk_size, chunk_overlap=chunk_overlap, tokenizer=tokenizer)
+    return _compact(doc, chunks)
+
+
+def chunk_files_parallel(paths: List[Path], strategy: str, chunk_size: int, chunk_overlap: int,
+                         workers: int, tokenizer_dir: str | None = None) -> Iterator[ChunkedDocument]:
+    """
+    Liest und chunkt die Dokumente in einem Process Pool. Die Dokumente werden in Shards auf die Worker verteilt,
+    die Ergebnisse kommen in derselben Reihenfolge wie paths zurück, damit ids und chunk_index reproduzierbar sind.
+    :param paths: Dokumente
+    :param strategy: Chunking Strategie (simple | structure)
+    :param chunk_size: Größe der Chunks
+    :param chunk_overlap: Overlap zwischen Chunks
+    :param workers: Anzahl Prozesse
+    :param tokenizer_dir: Lokales Embedding Modell, wenn chunk_size in Tokens (jeder Worker lädt den Tokenizer einmal)
+    :return: Kompakte Chunks pro Dokument (leere/fehlerhafte Dokumente werden übersprungen)
+    """
+    # "spawn", da im Parent bereits Threads (Chroma Client) laufen und fork dann nicht sicher ist
+    ctx = multiprocessing.get_context("spawn")
+    shard_size = max(1, len(paths) // (workers * 8))
+    func = partial(_chunk_file, strategy=strategy, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                   tokenizer_dir=tokenizer_dir)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        for chunked in pool.map(func, paths, chunksize=shard_size):
+            if chunked is not None:
+                yield chunked
@@ -15,26 +15,83 @@ class Config:
     chunking_strategy: str
     chunk_size: int
     chunk_overlap: int
+    chunk_unit: str
+    chunking_workers: int
+
+    incremental_indexing: bool
+    indexing_mode: str
+    indexing_batch_size: int
+    indexing_workers: int
+    indexing_queue_size: int
+    chunk_store: bool
+    bm25_index: bool
+    chunk_token_stats: bool
 
     embedding_model: str
     embedding_device: str
     normalize_embeddings: bool
+    embedding_cache: bool
+    embedding_batching: str
+    embedding_batch_size: int
+    embedding_batch_tokens: int
+    embedding_workers: int
+    embedding_worker_threads: int
+    embedding_backend: str
+    onnx_quantization: str
+    onnx_threads: int
+    onnx_min_similarity: float
 
     hnsw_ef_construction: int
     hnsw_ef_search: int
     hnsw_max_neighbors: int
+    vector_backend: str
+    vector_quantization: str
+    quantization_rescore: int
 
     top_k: int
+    candidate_pool_factor: int
+    candidate_pool_max: int
+    retrieval_mode: str
+    bm25_candidates: int
+    rrf_k: int
+    index_auto_reload: bool
+    query_cache: bool
+    query_cache_size: int
+    query_cache_persist: bool
 
     metadata_filter: bool
+    filter_pushdown: bool
     metadata_enhancement: bool
     post_bm25_rerank: bool
     similarity_threshold: float
 
+    context_assembly: bool
+    context_max_tokens: int
+    context_tokenizer: str
+    context_chars_per_token: float
+
+    answer_cache: bool
+    answer_cache_threshold: float
+    answer_cache_size: int
+    answer_cache_ttl: int
+    answer_cache_persist: bool
+
     llm_host: str
     llm_model: str
     temperature: float
     max_tokens: int
+    llm_keep_alive: str
+    llm_pool_size: int
+    llm_connect_timeout: float
+    llm_read_timeout: float
+    llm_retries: int
+    llm_retry_backoff: float
+    generation_cache: bool
+    generation_cache_path: str
+    generation_cache_max_mb: float
+
+    api_workers: int
+    api_max_queue: int
 
     log_level: str
 
@@ -70,26 +127,83 @@ def load_config(path: str | Path = Path(__file__).parent / "config.yaml") -> Con
     data["chunking_strategy"] = _env_override("CHUNKING_STRATEGY", data["chunking_strategy"])
     data["chunk_size"] = _env_override("CHUNK_SIZE", data["chunk_size"])
     data["chunk_overlap"] = _env_override("CHUNK_OVERLAP", data["chunk_overlap"])
+    data["chunk_unit"] = _env_override("CHUNK_UNIT", data["chunk_unit"])
+    data["chunking_workers"] = _env_override("CHUNKING_WORKERS", data["chunking_workers"])
+
+    data["incremental_indexing"] = _env_override("INCREMENTAL_INDEXING", data["incremental_indexing"])
+    data["indexing_mode"] = _env_override("INDEXING_MODE", data["indexing_mode"])
+    data["indexing_batch_size"] = _env_override("INDEXING_BATCH_SIZE", data["indexing_batch_size"])
+    data["indexing_workers"] = _env_override("INDEXING_WORKERS", data["indexing_workers"])
+    data["indexing_queue_size"] = _env_override("INDEXING_QUEUE_SIZE", data["indexing_queue_size"])
+    data["chunk_store"] = _env_override("CHUNK_STORE", data["chunk_store"])
+    data["bm25_index"] = _env_override("BM25_INDEX", data["bm25_index"])
+    data["chunk_token_stats"] = _env_override("CHUNK_TOKEN_STATS", data["chunk_token_stats"])
 
     data["embedding_model"] = _env_override("EMBEDDING_MODEL", data["embedding_model"])
     data["embedding_device"] = _env_override("EMBEDDING_DEVICE", data["embedding_device"])
     data["normalize_embeddings"] = _env_override("NORMALIZE_EMBEDDINGS", data["normalize_embeddings"])
+    data["embedding_cache"] = _env_override("EMBEDDING_CACHE", data["embedding_cache"])
+    data["embedding_batching"] = _env_override("EMBEDDING_BATCHING", data["embedding_batching"])
+    data["embedding_batch_size"] = _env_override("EMBEDDING_BATCH_SIZE", data["embedding_batch_size"])
+    data["embedding_batch_tokens"] = _env_override("EMBEDDING_BATCH_TOKENS", data["embedding_batch_tokens"])
+    data["embedding_workers"] = _env_override("EMBEDDING_WORKERS", data["embedding_workers"])
+    data["embedding_worker_threads"] = _env_override("EMBEDDING_WORKER_THREADS", data["embedding_worker_threads"])
+    data["embedding_backend"] = _env_override("EMBEDDING_BACKEND", data["embedding_backend"])
+    data["onnx_quantization"] = _env_override("ONNX_QUANTIZATION", data["onnx_quantization"])
+    data["onnx_threads"] = _env_override("ONNX_THREADS", data["onnx_threads"])
+    data["onnx_min_similarity"] = _env_override("ONNX_MIN_SIMILARITY", data["onnx_min_similarity"])
 
     data["hnsw_ef_construction"] = _env_override("HNSW_EF_CONSTRUCTION", data["hnsw_ef_construction"])
     data["hnsw_ef_search"] = _env_override("HNSW_EF_SEARCH", data["hnsw_ef_search"])
     data["hnsw_max_neighbors"] = _env_override("HNSW_MAX_NEIGHBORS", data["hnsw_max_neighbors"])
+    data["vector_backend"] = _env_override("VECTOR_BACKEND", data["vector_backend"])
+    data["vector_quantization"] = _env_override("VECTOR_QUANTIZATION", data["vector_quantization"])
+    data["quantization_rescore"] = _env_override("QUANTIZATION_RESCORE", data["quantization_rescore"])
 
     data["top_k"] = _env_override("TOP_K", data["top_k"])
+    data["candidate_pool_factor"] = _env_override("CANDIDATE_POOL_FACTOR", data["candidate_pool_factor"])
+    data["candidate_pool_max"] = _env_override("CANDIDATE_POOL_MAX", data["candidate_pool_max"])
+    data["retrieval_mode"] = _env_override("RETRIEVAL_MODE", data["retrieval_mode"])
+    data["bm25_candidates"] = _env_override("BM25_CANDIDATES", data["bm25_candidates"])
+    data["rrf_k"] = _env_override("RRF_K", data["rrf_k"])
+    data["index_auto_reload"] = _env_override("INDEX_AUTO_RELOAD", data["index_auto_reload"])
+    data["query_cache"] = _env_override("QUERY_CACHE", data["query_cache"])
+    data["query_cache_size"] = _env_override("QUERY_CACHE_SIZE", data["query_cache_size"])
+    data["query_cache_persist"] = _env_override("QUERY_CACHE_PERSIST", data["query_cache_persist"])
 
     data["metadata_filter"] = _env_override("METADATA_FILTER", data["metadata_filter"])
+    data["filter_pushdown"] = _env_override("FILTER_PUSHDOWN", data["filter_pushdown"])
     data["metadata_enhancement"] = _env_override("METADATA_ENHACEMENT", data["metadata_enhancement"])
     data["post_bm25_rerank"] = _env_override("POST_BM25_RERANK", data["post_bm25_rerank"])
     data["similarity_threshold"] = _env_override("SIMILARITY_THRESHOLD", data["similarity_threshold"])
 
+    data["context_assembly"] = _env_override("CONTEXT_ASSEMBLY", data["context_assembly"])
+    data["context_max_tokens"] = _env_override("CONTEXT_MAX_TOKENS", data["context_max_tokens"])
+    data["context_tokenizer"] = _env_override("CONTEXT_TOKENIZER", data["context_tokenizer"])
+    data["context_chars_per_token"] = _env_override("CONTEXT_CHARS_PER_TOKEN", data["context_chars_per_token"])
+
+    data["answer_cache"] = _env_override("ANSWER_CACHE", data["answer_cache"])
+    data["answer_cache_threshold"] = _env_override("ANSWER_CACHE_THRESHOLD", data["answer_cache_threshold"])
+    data["answer_cache_size"] = _env_override("ANSWER_CACHE_SIZE", data["answer_cache_size"])
+    data["answer_cache_ttl"] = _env_override("ANSWER_CACHE_TTL", data["answer_cache_ttl"])
+    data["answer_cache_persist"] = _env_override("ANSWER_CACHE_PERSIST", data["answer_cache_persist"])
+
     data["llm_host"] = _env_override("LLM_HOST", data["llm_host"])
     data["llm_model"] = _env_override("OLLAMA_MODEL", data["llm_model"])
     data["temperature"] = _env_override("TEMPERATURE", data["temperature"])
     data["max_tokens"] = _env_override("MAX_TOKENS", data["max_tokens"])
+    data["llm_keep_alive"] = _env_override("LLM_KEEP_ALIVE", data["llm_keep_alive"])
+    data["llm_pool_size"] = _env_override("LLM_POOL_SIZE", data["llm_pool_size"])
+    data["llm_connect_timeout"] = _env_override("LLM_CONNECT_TIMEOUT", data["llm_connect_timeout"])
+    data["llm_read_timeout"] = _env_override("LLM_READ_TIMEOUT", data["llm_read_timeout"])
+    data["llm_retries"] = _env_override("LLM_RETRIES", data["llm_retries"])
+    data["llm_retry_backoff"] = _env_override("LLM_RETRY_BACKOFF", data["llm_retry_backoff"])
+    data["generation_cache"] = _env_override("GENERATION_CACHE", data["generation_cache"])
+    data["generation_cache_path"] = _env_override("GENERATION_CACHE_PATH", data["generation_cache_path"])
+    data["generation_cache_max_mb"] = _env_override("GENERATION_CACHE_MAX_MB", float(data["generation_cache_max_mb"]))
+
+    data["api_workers"] = _env_override("API_WORKERS", data["api_workers"])
+    data["api_max_queue"] = _env_override("API_MAX_QUEUE", data["api_max_queue"])
 
     data["log_level"] = _env_override("LOG_LEVEL", data["log_level"])
 
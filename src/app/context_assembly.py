@@ -0,0 +1,189 @@
+import logging
+import math
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+_WS = re.compile(r"\s+")
+
+
+class TokenCounter:
+    """
+    Zählt Tokens mit dem Tokenizer der LLM (context_tokenizer, Hugging Face Tokenizer) oder schätzt sie über Zeichen
+    pro Token. Die Schätzung wird laufend mit prompt_eval_count aus den Antworten von Ollama kalibriert.
+    """
+
+    _ALPHA = 0.2
+
+    def __init__(self, cfg: Config):
+        self.chars_per_token = float(cfg.context_chars_per_token)
+        self._lock = threading.Lock()
+        self._tokenizer = None
+        if cfg.context_tokenizer:
+            from transformers import AutoTokenizer
+
+            self._tokenizer = AutoTokenizer.from_pretrained(cfg.context_tokenizer)
+            logger.info(f"Tokenizer für Context Assembly geladen: {cfg.context_tokenizer}.")
+
+    def count(self, text: str) -> int:
+        if self._tokenizer is not None:
+            return len(self._tokenizer(text, add_special_tokens=False)["input_ids"])
+        return math.ceil(len(text) / self.chars_per_token)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Kürzt text auf max_tokens Tokens, mit Schätzung an der letzten Wortgrenze.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self._tokenizer is not None:
+            offsets = self._tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+            return text if len(offsets) <= max_tokens else text[:offsets[max_tokens - 1][1]]
+
+        cut = int(max_tokens * self.chars_per_token)
+        if cut >= len(text):
+            return text
+        space = text.rfind(" ", 0, cut)
+        return text[:space if space > 0 else cut]
+
+    def observe(self, chars: int, tokens: int | None) -> None:
+        """
+        Kalibriert Zeichen pro Token mit der tatsächlichen Anzahl Prompt-Tokens der LLM (gleitender Mittelwert).
+        Unplausible Werte (z.B. wenn Ollama einen Teil des Prompts aus dem KV Cache nimmt) werden ignoriert.
+        """
+        if self._tokenizer is not None or not tokens:
+            return
+        ratio = chars / tokens
+        if not 1.0 <= ratio <= 10.0:
+            return
+        with self._lock:
+            self.chars_per_token += self._ALPHA * (ratio - self.chars_per_token)
+
+
+@dataclass
+class _Block:
+    source: str
+    start: int
+    end: int
+    rank: int
+    prefix: str
+    text: str
+    metas: list[dict[str, Any]] = field(default_factory=list)
+
+
+def _split(doc: str, meta: dict[str, Any]) -> tuple[str, str, int, int] | None:
+    """
+    Der (gestrippte) Chunk-Text ist source[text_start:text_end] und steht am Ende des Segments, davor ggf. der
+    Metadaten-Header (metadata_enhancement). text_start/text_end setzt das Retrieval; chunk_start/chunk_end passen
+    nach dem strip() nicht mehr zum Text.
+    :return: (Präfix, Chunk-Text, text_start, text_end) oder None, wenn der Text nicht zu den Offsets passt
+    """
+    if "text_start" not in meta or "text_end" not in meta:
+        return None
+    start, end = int(meta["text_start"]), int(meta["text_end"])
+    length = end - start
+    if length <= 0 or length > len(doc):
+        return None
+    return doc[:len(doc) - length], doc[len(doc) - length:], start, end
+
+
+def _merge(docs: list[str], metas: list[dict[str, Any]]) -> list[_Block]:
+    """
+    Fasst überlappende oder direkt aneinander grenzende Chunks derselben Quelle zu einem Block zusammen; der
+    überlappende Text steht danach nur noch einmal im Kontext. Jeder Block steht an der Position seines besten Chunks.
+    Segmente ohne passende Offsets werden nie zusammengefasst.
+    """
+    blocks = []
+    for rank, (doc, meta) in enumerate(zip(docs, metas)):
+        split = _split(doc, meta)
+        if split is None:
+            blocks.append(_Block("", 0, 0, rank, "", doc, [meta]))
+            continue
+        prefix, text, start, end = split
+        blocks.append(_Block(str(meta.get("source", "")), start, end, rank, prefix, text, [meta]))
+
+    merged: list[_Block] = []
+    for block in sorted(blocks, key=lambda b: (b.source, b.start, b.end)):
+        last = merged[-1] if merged else None
+        if last is None or not block.source or block.source != last.source or block.start > last.end:
+            merged.append(block)
+            continue
+        if block.end > last.end:
+            last.text += block.text[last.end - block.start:]
+            last.end = block.end
+        last.rank = min(last.rank, block.rank)
+        last.metas.append(block.metas[0])
+
+    return sorted(merged, key=lambda b: b.rank)
+
+
+def _block_meta(block: _Block) -> dict[str, Any]:
+    # Metadaten des besten Chunks, Offsets über den gesamten Block
+    meta = dict(min(block.metas, key=lambda m: m.get("distance", 0.0)))
+    if len(block.metas) > 1:
+        meta.update({
+            "chunk_start": min(int(m.get("chunk_start", 0)) for m in block.metas),
+            "chunk_end": max(int(m.get("chunk_end", 0)) for m in block.metas),
+            "text_start": block.start,
+            "text_end": block.end,
+            "merged_chunks": len(block.metas),
+        })
+    return meta
+
+
+def assemble_context(docs: list[str], metas: list[dict[str, Any]], counter: TokenCounter,
+                     max_tokens: int = 0) -> tuple[list[str], list[dict[str, Any]], dict[str, Any]]:
+    """
+    Context Assembly zwischen Retrieval und Prompt: überlappende Chunks zusammenfassen, doppelte Texte entfernen
+    und die Blöcke in Reihenfolge der Relevanz in das Token-Budget packen (der letzte Block wird ggf. gekürzt).
+    :param docs: Dokumentsegmente aus dem Retrieval
+    :param metas: Metadaten der Segmente (source, text_start, text_end)
+    :param counter: TokenCounter
+    :param max_tokens: Token-Budget für den Kontext (0 = unbegrenzt)
+    :return: Segmente, Metadaten und Statistiken (chunks, blocks, duplicates, tokens_before, tokens_after, truncated)
+    """
+    tokens_before = sum(counter.count(d) for d in docs)
+
+    out_docs: list[str] = []
+    out_metas: list[dict[str, Any]] = []
+    seen: set[str] = set()
+    duplicates = 0
+    truncated = 0
+    used = 0
+    blocks = _merge(docs, metas)
+    for block in blocks:
+        doc = block.prefix + block.text
+        key = _WS.sub(" ", block.text).strip()
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+
+        tokens = counter.count(doc)
+        if max_tokens > 0 and used + tokens > max_tokens:
+            doc = counter.truncate(doc, max_tokens - used)
+            truncated = 1
+            if doc.strip():
+                out_docs.append(doc)
+                out_metas.append(_block_meta(block))
+                used += counter.count(doc)
+            break
+
+        out_docs.append(doc)
+        out_metas.append(_block_meta(block))
+        used += tokens
+
+    stats = {
+        "chunks": len(docs),
+        "blocks": len(blocks),
+        "duplicates": duplicates,
+        "tokens_before": tokens_before,
+        "tokens_after": used,
+        "truncated": truncated,
+    }
+    return out_docs, out_metas, stats
@@ -1,5 +1,9 @@
+import json
 import logging
+import numpy as np
 import os
+import threading
+import time
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
 
@@ -8,6 +12,19 @@ from app.config import Config
 logger = logging.getLogger(__name__)
 
 _model: SentenceTransformer | None = None
+_model_backend = "torch"
+_model_lock = threading.Lock()
+
+# Texte für den Vergleich ONNX vs. PyTorch (kurz, lang, Formeln, nicht-englisch)
+_CHECK_TEXTS = [
+    "Kleines Warmup",
+    "What is the energy consumption of retrieval augmented generation?",
+    "We prove that the estimator is consistent and asymptotically normal under mild regularity conditions.",
+    "Theorem 1. Let $f: \\mathbb{R}^n \\to \\mathbb{R}$ be convex and $L$-smooth. Then gradient descent with step "
+    "size $1/L$ converges at rate $O(1/k)$.",
+    "Die Energieeffizienz von Sprachmodellen hängt stark von der Hardware und der Batch-Größe ab.",
+    " ".join(["Transformer models process long input sequences with self-attention over all tokens."] * 20),
+]
 
 
 def _get_model_dir(cfg: Config) -> Path:
@@ -32,10 +49,156 @@ def _ensure_local_model(cfg: Config) -> Path:
 
 
 def get_embed_model(cfg: Config) -> SentenceTransformer:
-    global _model
     if _model is not None:
         return _model
 
+    # Requests laufen parallel im Thread Pool der API, das Modell darf nur einmal geladen werden
+    with _model_lock:
+        if _model is not None:
+            return _model
+        return _load_embed_model(cfg)
+
+
+def embedding_variant(cfg: Config) -> str:
+    """
+    Backend, mit dem die Embeddings tatsächlich berechnet werden (nach einem eventuellen Fallback auf PyTorch):
+    torch, onnx oder onnx-<onnx_quantization>. ONNX Embeddings sind nicht identisch mit denen von PyTorch, Caches und
+    Index müssen daher nach dem Backend getrennt werden. Ist die ONNX Prüfung noch nicht gelaufen, wird das Modell
+    dafür geladen.
+    """
+    if cfg.embedding_backend != "onnx":
+        return "torch"
+    if _model is not None:
+        return _model_backend
+
+    model_dir = _get_model_dir(cfg)
+    if cfg.onnx_quantization == "none":
+        files = [model_dir / "onnx" / "model.onnx"]
+    else:
+        files = sorted((model_dir / "onnx").glob(f"model_*_{cfg.onnx_quantization}.onnx"))
+    check_path = files[0].with_suffix(".check.json") if files else None
+    if check_path is not None and check_path.exists():
+        min_cosine = float(json.loads(check_path.read_text(encoding="utf-8"))["min_cosine"])
+        return _onnx_variant(cfg) if min_cosine >= cfg.onnx_min_similarity else "torch"
+
+    get_embed_model(cfg)
+    return _model_backend
+
+
+def _onnx_variant(cfg: Config) -> str:
+    return "onnx" if cfg.onnx_quantization == "none" else f"onnx-{cfg.onnx_quantization}"
+
+
+def _onnx_session_options(cfg: Config):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if cfg.onnx_threads > 0:
+        options.intra_op_num_threads = cfg.onnx_threads
+    return options
+
+
+def _ensure_onnx_model(cfg: Config, model_dir: Path) -> str:
+    """
+    Exportiert das lokale Modell einmalig nach ONNX (model_dir/onnx/model.onnx) und bei onnx_quantization zusätzlich
+    dynamisch nach int8 quantisiert (model_dir/onnx/model_*_{onnx_quantization}.onnx).
+    :return: Pfad der ONNX Datei relativ zu model_dir
+    """
+    onnx_dir = model_dir / "onnx"
+    if not (onnx_dir / "model.onnx").exists():
+        logger.info(f"Exportiere Embedding Modell {cfg.embedding_model} nach ONNX ({onnx_dir}) ...")
+        model = SentenceTransformer(str(model_dir), backend="onnx", device="cpu", local_files_only=True,
+                                    model_kwargs={"export": True, "provider": "CPUExecutionProvider"})
+        model.save(str(model_dir))
+
+    if cfg.onnx_quantization == "none":
+        return "onnx/model.onnx"
+
+    matches = sorted(onnx_dir.glob(f"model_*_{cfg.onnx_quantization}.onnx"))
+    if not matches:
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        logger.info(f"Quantisiere ONNX Modell dynamisch nach int8 ({cfg.onnx_quantization}) ...")
+        model = SentenceTransformer(str(model_dir), backend="onnx", device="cpu", local_files_only=True,
+                                    model_kwargs={"file_name": "onnx/model.onnx", "provider": "CPUExecutionProvider"})
+        export_dynamic_quantized_onnx_model(model, cfg.onnx_quantization, str(model_dir))
+        matches = sorted(onnx_dir.glob(f"model_*_{cfg.onnx_quantization}.onnx"))
+    return matches[0].relative_to(model_dir).as_posix()
+
+
+def _check_onnx_model(model_dir: Path, file_name: str, model: SentenceTransformer) -> float:
+    """
+    Vergleicht die Embeddings des ONNX Modells mit denen des PyTorch Modells (mit dem der Index erstellt wurde).
+    Das Ergebnis wird neben der ONNX Datei gespeichert und nur einmal pro Datei berechnet.
+    :return: Minimale Cosinus-Ähnlichkeit über die Testtexte
+    """
+    check_path = (model_dir / file_name).with_suffix(".check.json")
+    if check_path.exists():
+        return float(json.loads(check_path.read_text(encoding="utf-8"))["min_cosine"])
+
+    reference = SentenceTransformer(str(model_dir), device="cpu", local_files_only=True)
+    t = time.perf_counter()
+    expected = reference.encode(_CHECK_TEXTS, convert_to_numpy=True, normalize_embeddings=True)
+    torch_ms = 1000 * (time.perf_counter() - t)
+    t = time.perf_counter()
+    actual = model.encode(_CHECK_TEXTS, convert_to_numpy=True, normalize_embeddings=True)
+    onnx_ms = 1000 * (time.perf_counter() - t)
+
+    min_cosine = float(np.min(np.sum(expected * actual, axis=1)))
+    # Erst in temporäre Datei schreiben, damit parallele Prozesse nie eine halbe Prüfung lesen
+    tmp = check_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"min_cosine": min_cosine, "torch_ms": torch_ms, "onnx_ms": onnx_ms}), encoding="utf-8")
+    os.replace(tmp, check_path)
+    logger.info(f"ONNX Prüfung {file_name}: min. Cosinus-Ähnlichkeit zu PyTorch {min_cosine:.6f} "
+                f"(PyTorch {torch_ms:.1f} ms, ONNX {onnx_ms:.1f} ms).")
+    return min_cosine
+
+
+def _load_onnx_model(cfg: Config, model_dir: Path) -> SentenceTransformer | None:
+    """
+    ONNX Runtime auf der CPU, mit intra-op Threads aus onnx_threads. Weichen die Embeddings stärker als
+    onnx_min_similarity von PyTorch ab, wäre der bestehende Index nicht mehr kompatibel, dann wird None zurückgegeben.
+    """
+    if cfg.embedding_device != "cpu":
+        logger.warning(f"ONNX Backend läuft auf der CPU (embedding_device={cfg.embedding_device} wird ignoriert).")
+
+    file_name = _ensure_onnx_model(cfg, model_dir)
+    logger.debug(f"Embedding Modell {cfg.embedding_model} wird mit ONNX Runtime geladen ({file_name}) ...")
+    model = SentenceTransformer(
+        model_name_or_path=str(model_dir),
+        backend="onnx",
+        device="cpu",
+        local_files_only=True,
+        model_kwargs={
+            "file_name": file_name,
+            "provider": "CPUExecutionProvider",
+            "session_options": _onnx_session_options(cfg),
+        },
+    )
+
+    min_cosine = _check_onnx_model(model_dir, file_name, model)
+    if min_cosine < cfg.onnx_min_similarity:
+        logger.error(f"ONNX Embeddings weichen zu stark ab (min. Cosinus {min_cosine:.6f} < "
+                     f"{cfg.onnx_min_similarity}), nutze PyTorch stattdessen.")
+        return None
+    return model
+
+
+def _load_embed_model(cfg: Config) -> SentenceTransformer:
+    global _model, _model_backend
+    model_dir = _ensure_local_model(cfg)
+
+    if cfg.embedding_backend == "onnx":
+        model = _load_onnx_model(cfg, model_dir)
+        if model is not None:
+            _model = model
+            _model_backend = _onnx_variant(cfg)
+            logger.info("Embedding Modell geladen (ONNX Runtime).")
+            return _model
+    elif cfg.embedding_backend != "torch":
+        logger.error(f"Unbekanntes Embedding Backend: {cfg.embedding_backend}")
+        raise ValueError()
+
     device = cfg.embedding_device
     if device == "cuda":
         import torch
@@ -43,13 +206,12 @@ def get_embed_model(cfg: Config) -> SentenceTransformer:
             logger.warning("CUDA nicht gefunden, nutze CPU stattdessen.")
             device = "cpu"
 
-    model_dir = _ensure_local_model(cfg)
-
     logger.debug(f"Embedding Modell {cfg.embedding_model} wird geladen (Device: {device}) ...")
     _model = SentenceTransformer(
         model_name_or_path=str(model_dir),
         device=device,
         local_files_only=True,
     )
+    _model_backend = "torch"
     logger.info("Embedding Modell geladen.")
     return _model
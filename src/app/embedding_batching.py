@@ -0,0 +1,114 @@
+import logging
+import numpy as np
+from time import perf_counter
+from typing import Any, List
+
+from app.time_marker import mark
+
+logger = logging.getLogger(__name__)
+
+_TOKENIZE_BATCH = 4096
+
+
+def token_lengths(model, texts: List[str]) -> np.ndarray:
+    """
+    Anzahl Tokens pro Text inkl. Spezial-Tokens, begrenzt auf max_seq_length des Modells (wie beim encode).
+    """
+    lengths = np.empty(len(texts), dtype=np.int64)
+    for start in range(0, len(texts), _TOKENIZE_BATCH):
+        enc = model.tokenizer(
+            texts[start:start + _TOKENIZE_BATCH],
+            truncation=True,
+            max_length=model.max_seq_length,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            return_length=True,
+        )
+        lengths[start:start + len(enc["length"])] = enc["length"]
+    return lengths
+
+
+def plan_batches(lengths: np.ndarray, max_tokens: int, max_batch_size: int) -> list[np.ndarray]:
+    """
+    Sortiert die Texte nach Token-Länge (absteigend) und bildet Batches, deren gepaddete Größe
+    (Anzahl Texte * längster Text) max_tokens nicht überschreitet. Kurze Texte landen so in großen Batches, lange in
+    kleinen, und innerhalb eines Batches sind die Längen ähnlich (wenig Padding).
+    :return: Indizes der Texte pro Batch
+    """
+    order = np.argsort(-lengths, kind="stable")
+    batches: list[np.ndarray] = []
+    start = 0
+    while start < len(order):
+        # Absteigend sortiert: der erste Text bestimmt die gepaddete Länge des Batches
+        size = max(1, min(max_tokens // max(1, int(lengths[order[start]])), max_batch_size))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def _padding(lengths: np.ndarray, batches: list[np.ndarray]) -> int:
+    return int(sum(len(b) * lengths[b].max() for b in batches))
+
+
+def _encode_sequential(model, texts: List[str], batches: list[np.ndarray], normalize: bool,
+                       show_progress_bar: bool) -> np.ndarray:
+    out: np.ndarray | None = None
+    iterator: Any = batches
+    if show_progress_bar:
+        from tqdm import tqdm
+        iterator = tqdm(batches, desc="Batches")
+
+    for batch in iterator:
+        emb = model.encode([texts[i] for i in batch], batch_size=len(batch), convert_to_numpy=True,
+                           normalize_embeddings=normalize, show_progress_bar=False)
+        if out is None:
+            out = np.empty((len(texts), emb.shape[1]), dtype=emb.dtype)
+        out[batch] = emb
+    return out
+
+
+def encode_token_batched(model, texts: List[str], max_tokens: int, max_batch_size: int, normalize: bool,
+                         show_progress_bar: bool = False) -> np.ndarray:
+    """
+    encode über Batches mit Token-Budget statt fester Anzahl Texte, die Embeddings stehen danach wieder in der
+    ursprünglichen Reihenfolge. Tokens/s und Padding-Anteil (auch im Vergleich zu festen Batches der Größe
+    max_batch_size) werden als mark() Event ausgegeben.
+    :param model: SentenceTransformer oder EmbeddingPool
+    :param texts: Texte
+    :param max_tokens: Maximale Anzahl Tokens (inkl. Padding) pro Batch
+    :param max_batch_size: Maximale Anzahl Texte pro Batch
+    :param normalize: normalize_embeddings
+    :return: Embeddings (len(texts) x dim)
+    """
+    if not texts:
+        return model.encode(texts, convert_to_numpy=True, normalize_embeddings=normalize)
+
+    t = perf_counter()
+    lengths = token_lengths(model, texts)
+    batches = plan_batches(lengths, max_tokens, max_batch_size)
+    tokenize_s = perf_counter() - t
+
+    t = perf_counter()
+    if hasattr(model, "encode_batches"):
+        # EmbeddingPool: Batches parallel auf die Worker verteilt
+        out = model.encode_batches(texts, batches, normalize, show_progress_bar)
+    else:
+        out = _encode_sequential(model, texts, batches, normalize, show_progress_bar)
+    encode_s = perf_counter() - t
+
+    # Vergleich: feste Batches wie bisher (SentenceTransformer sortiert nach Zeichen-Länge)
+    fixed_order = np.argsort([-len(text) for text in texts], kind="stable")
+    fixed = [fixed_order[i:i + max_batch_size] for i in range(0, len(texts), max_batch_size)]
+
+    tokens = int(lengths.sum())
+    padded = _padding(lengths, batches)
+    padded_fixed = _padding(lengths, fixed)
+    mark("EMBEDDING_BATCHES",
+         texts=len(texts),
+         batches=len(batches),
+         tokens=tokens,
+         padding_waste=f"{1 - tokens / padded:.4f}",
+         padding_waste_fixed=f"{1 - tokens / padded_fixed:.4f}",
+         tokens_per_s=f"{tokens / encode_s:.1f}" if encode_s > 0 else "0",
+         tokenize_ms=f"{1000 * tokenize_s:.1f}")
+    return out
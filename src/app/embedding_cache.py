@@ -0,0 +1,240 @@
+import hashlib
+import json
+import logging
+import numpy as np
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Sequence
+
+from app.config import Config
+from app.embedding import embedding_variant
+from app.time_marker import mark
+
+logger = logging.getLogger(__name__)
+
+_WS = re.compile(r"\s+")
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _cache_name(cfg: Config) -> str:
+    # Ein Cache pro (Embedding Modell, normalize_embeddings, Backend); PyTorch behält den bisherigen Namen
+    safe_name = cfg.embedding_model.replace("/", "_")
+    variant = "normalized" if cfg.normalize_embeddings else "raw"
+    backend = embedding_variant(cfg)
+    return f"{safe_name}_{variant}" if backend == "torch" else f"{safe_name}_{variant}_{backend}"
+
+
+class EmbeddingCache:
+    """
+    Persistenter Embedding Cache auf der Festplatte, ein Verzeichnis pro (Embedding Modell, normalize_embeddings,
+    Backend).
+    - vectors.f32: alle Embeddings als float32 hintereinander (append-only, wird per memmap gelesen)
+    - keys.txt: Hash des Chunk-Texts pro Zeile, Zeile i gehört zu Embedding i
+    - meta.json: Dimension der Embeddings
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = cache_dir / "vectors.f32"
+        self._keys_path = cache_dir / "keys.txt"
+        self._meta_path = cache_dir / "meta.json"
+
+        self.dim: int | None = None
+        if self._meta_path.exists():
+            self.dim = int(json.loads(self._meta_path.read_text(encoding="utf-8"))["dim"])
+
+        keys: list[str] = []
+        if self._keys_path.exists():
+            keys = self._keys_path.read_text(encoding="utf-8").split()
+
+        # Nur vollständig geschriebene Zeilen verwenden (z.B. nach Abbruch während dem Schreiben)
+        rows = 0
+        if self.dim and self._vectors_path.exists():
+            rows = min(len(keys), self._vectors_path.stat().st_size // (self.dim * 4))
+        self._index: dict[str, int] = {k: i for i, k in enumerate(keys[:rows])}
+        self._rows = rows
+        self._vectors: np.memmap | None = None
+
+        if len(keys) != rows:
+            self._truncate(rows, keys[:rows])
+
+    @classmethod
+    def for_config(cls, cfg: Config) -> "EmbeddingCache":
+        return cls(Path(cfg.embed_dir) / "embedding_cache" / _cache_name(cfg))
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _truncate(self, rows: int, keys: list[str]) -> None:
+        logger.warning(f"Embedding Cache {self.cache_dir} unvollständig, wird auf {rows} Einträge gekürzt.")
+        self._keys_path.write_text("".join(f"{k}\n" for k in keys), encoding="utf-8")
+        if self.dim and self._vectors_path.exists():
+            with self._vectors_path.open("r+b") as f:
+                f.truncate(rows * self.dim * 4)
+
+    def _mmap(self) -> np.memmap:
+        if self._vectors is None or self._vectors.shape[0] != self._rows:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+        return self._vectors
+
+    def lookup(self, keys: Sequence[str]) -> np.ndarray:
+        """
+        :param keys: Hashes der Chunk-Texte
+        :return: Zeile im Cache pro key, -1 wenn nicht vorhanden
+        """
+        return np.fromiter((self._index.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+
+    def get(self, rows: np.ndarray) -> np.ndarray:
+        return np.asarray(self._mmap()[rows], dtype=np.float32)
+
+    def add(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            self._meta_path.write_text(json.dumps({"dim": self.dim}), encoding="utf-8")
+
+        # Erst die Vektoren, dann die keys schreiben; so zeigt ein key nie auf einen fehlenden Vektor
+        with self._vectors_path.open("ab") as f:
+            f.write(vectors.tobytes())
+        with self._keys_path.open("a", encoding="utf-8") as f:
+            f.write("".join(f"{k}\n" for k in keys))
+
+        for k in keys:
+            self._index[k] = self._rows
+            self._rows += 1
+
+
+def encode_with_cache(cache: EmbeddingCache, texts: list[str], encode: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+    """
+    Berechnet Embeddings für texts, wobei nur Texte encodiert werden, die noch nicht im Cache sind.
+    :param cache: Embedding Cache, einmal pro Indexing geöffnet (EmbeddingCache.for_config)
+    :param texts: Chunk-Texte
+    :param encode: Funktion, die die Embeddings der Cache misses berechnet
+    :return: Embeddings in derselben Reihenfolge wie texts
+    """
+    keys = [text_key(t) for t in texts]
+    rows = cache.lookup(keys)
+
+    # Cache misses, doppelte Texte werden nur einmal encodiert
+    miss_keys: dict[str, int] = {}
+    for i in np.flatnonzero(rows < 0):
+        miss_keys.setdefault(keys[i], int(i))
+
+    n_hits = int((rows >= 0).sum())
+    logger.info(f"Embedding Cache: {n_hits} Treffer, {len(miss_keys)} Texte müssen encodiert werden.")
+    mark("EMBEDDING_CACHE", hits=n_hits, misses=len(miss_keys))
+
+    if miss_keys:
+        miss_embs = encode([texts[i] for i in miss_keys.values()])
+        cache.add(list(miss_keys), miss_embs)
+        rows = cache.lookup(keys)
+
+    return cache.get(rows)
+
+
+class QueryEmbeddingCache:
+    """
+    LRU Cache der Frage-Embeddings im Speicher, ein Cache pro (Embedding Modell, normalize_embeddings, Backend). Key ist die
+    Frage mit normalisiertem Whitespace (Groß-/Kleinschreibung bleibt, da das Modell sie unterscheiden kann).
+    Optional wird der Cache in embed_dir/query_cache gespeichert und beim Start geladen.
+    """
+
+    def __init__(self, cfg: Config):
+        self.size = max(1, cfg.query_cache_size)
+        self.path = Path(cfg.embed_dir) / "query_cache" / f"{_cache_name(cfg)}.npz" if cfg.query_cache_persist \
+            else None
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._encoded = 0
+        self._encode_s = 0.0
+
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    @staticmethod
+    def key(question: str) -> str:
+        return _WS.sub(" ", question.strip())
+
+    def encode(self, questions: Sequence[str], encode: Callable[[list[str]], np.ndarray]) -> np.ndarray:
+        """
+        :param questions: Fragen
+        :param encode: Funktion, die die Embeddings der Cache misses berechnet
+        :return: Embeddings in derselben Reihenfolge wie questions
+        """
+        keys = [self.key(q) for q in questions]
+        with self._lock:
+            found = {k: self._entries[k] for k in keys if k in self._entries}
+            for k in found:
+                self._entries.move_to_end(k)
+
+        # Doppelte Fragen werden nur einmal encodiert
+        miss_keys = list(dict.fromkeys(k for k in keys if k not in found))
+        n_hits = len(keys) - sum(1 for k in keys if k not in found)
+        if miss_keys:
+            t = perf_counter()
+            miss_embs = np.asarray(encode(miss_keys), dtype=np.float32)
+            encode_s = perf_counter() - t
+            found.update(zip(miss_keys, miss_embs))
+
+            with self._lock:
+                self._encoded += len(miss_keys)
+                self._encode_s += encode_s
+                for k, emb in zip(miss_keys, miss_embs):
+                    self._entries[k] = emb
+                    self._entries.move_to_end(k)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+
+        with self._lock:
+            self.hits += n_hits
+            self.misses += len(keys) - n_hits
+        mark("QUERY_EMBEDDING_CACHE", hits=n_hits, misses=len(keys) - n_hits)
+
+        return np.stack([found[k] for k in keys])
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            avg_s = self._encode_s / self._encoded if self._encoded else 0.0
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "encode_avg_ms": round(1000 * avg_s, 3),
+                # Geschätzt über die mittlere Encode-Zeit pro Frage der Cache misses
+                "saved_encode_ms": round(1000 * avg_s * self.hits, 3),
+            }
+
+    def _load(self) -> None:
+        try:
+            with np.load(self.path) as data:
+                keys, vectors = data["keys"].tolist(), data["vectors"]
+        except Exception as e:
+            logger.warning(f"Query Embedding Cache {self.path} konnte nicht gelesen werden ({e}).")
+            return
+        for k, emb in list(zip(keys, vectors))[-self.size:]:
+            self._entries[k] = emb
+        logger.info(f"Query Embedding Cache geladen: {len(self._entries)} Einträge aus {self.path}.")
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            keys = list(self._entries)
+            vectors = np.stack(list(self._entries.values())) if keys else np.zeros((0, 0), dtype=np.float32)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.stem + ".tmp.npz")
+        np.savez(tmp, keys=np.asarray(keys, dtype=str), vectors=vectors)
+        tmp.replace(self.path)
+        logger.info(f"Query Embedding Cache gespeichert: {self.path} ({len(keys)} Einträge).")
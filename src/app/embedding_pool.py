@@ -0,0 +1,246 @@
+import dataclasses
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import traceback
+import uuid
+from pathlib import Path
+from time import perf_counter
+from typing import Any, List
+
+import numpy as np
+
+from app.config import Config
+from app.embedding import _ensure_local_model, embedding_variant
+from app.time_marker import mark
+
+logger = logging.getLogger(__name__)
+
+_SHM_DIR = Path("/dev/shm")
+_POLL_S = 1.0
+
+
+def _shared_dir(nbytes: int) -> Path:
+    """
+    Verzeichnis für die geteilten Dateien eines encode: /dev/shm (tmpfs), falls genug Platz frei ist (in Docker
+    standardmäßig nur 64 MB), sonst das temporäre Verzeichnis (Page Cache, ebenfalls ohne Kopien gemappt).
+    """
+    try:
+        if _SHM_DIR.is_dir() and shutil.disk_usage(_SHM_DIR).free > 2 * nbytes:
+            return _SHM_DIR
+    except OSError:
+        pass
+    return Path(tempfile.gettempdir())
+
+
+def _worker_cores(worker: int, threads: int) -> set[int] | None:
+    # Worker i bekommt die Kerne [i * threads, (i + 1) * threads) der erlaubten Kerne, wenn diese ausreichen
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    cores = sorted(os.sched_getaffinity(0))
+    cores = cores[worker * threads:(worker + 1) * threads]
+    return set(cores) if len(cores) == threads else None
+
+
+def _worker_main(cfg: Config, worker: int, threads: int, tasks, results) -> None:
+    """
+    Encoder Prozess: lädt das Modell einmal (auf der CPU, mit threads intra-op Threads), liest die Texte seiner Batches
+    aus der geteilten Textdatei und schreibt die Embeddings direkt in die Zeilen der geteilten Ergebnis-Matrix.
+    """
+    try:
+        import torch
+
+        cores = _worker_cores(worker, threads)
+        if cores is not None:
+            os.sched_setaffinity(0, cores)
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+
+        from app.embedding import get_embed_model
+
+        model = get_embed_model(dataclasses.replace(cfg, embedding_device="cpu", onnx_threads=threads))
+        results.put(("ready", worker, model.get_sentence_embedding_dimension(), model.max_seq_length))
+    except Exception:
+        results.put(("error", worker, traceback.format_exc()))
+        return
+
+    call: tuple | None = None
+    text, offsets, out = None, None, None
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        call_id, paths, n, dim, normalize, batch_no, rows = task
+        try:
+            if call != (call_id, paths):
+                # Geteilte Dateien eines encode nur einmal pro Worker mappen
+                call = (call_id, paths)
+                text = np.memmap(paths[0], dtype=np.uint8, mode="r") if os.path.getsize(paths[0]) else b""
+                offsets = np.memmap(paths[1], dtype=np.int64, mode="r", shape=(n + 1,))
+                out = np.memmap(paths[2], dtype=np.float32, mode="r+", shape=(n, dim))
+
+            texts = [bytes(text[offsets[i]:offsets[i + 1]]).decode("utf-8") for i in rows]
+            out[rows] = model.encode(texts, batch_size=len(texts), convert_to_numpy=True,
+                                     normalize_embeddings=normalize, show_progress_bar=False)
+            results.put(("done", worker, call_id, batch_no))
+        except Exception:
+            results.put(("error", worker, traceback.format_exc()))
+
+
+class EmbeddingPool:
+    """
+    Pool aus Encoder Prozessen für das Indexing auf der CPU. Jeder Prozess lädt das Modell einmal und rechnet mit
+    einer festen Anzahl Threads (und, wenn genug Kerne frei sind, auf festen Kernen). Die Texte liegen in einer
+    geteilten Datei (/dev/shm), über die Queue gehen nur die Indizes der Batches; die Worker schreiben die float32
+    Embeddings direkt in eine vorab angelegte, geteilte Matrix, die encode ohne Kopie zurückgibt.
+    Die Schnittstelle entspricht SentenceTransformer.encode, der Pool kann also anstelle des Modells verwendet werden.
+    """
+
+    def __init__(self, cfg: Config, workers: int, threads_per_worker: int = 0):
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        self.workers = max(1, workers)
+        self.threads = threads_per_worker if threads_per_worker > 0 else max(1, cores // self.workers)
+        if self.workers * self.threads > cores:
+            logger.warning(f"Embedding Pool nutzt {self.workers * self.threads} Threads auf {cores} Kernen.")
+        if cfg.embedding_device != "cpu":
+            logger.warning(f"Embedding Pool läuft auf der CPU (embedding_device={cfg.embedding_device} wird ignoriert).")
+
+        # Download, ONNX Export, Quantisierung und ONNX Prüfung einmal im Hauptprozess, nicht gleichzeitig in allen
+        # Workern; die Worker laden danach nur noch fertige Dateien
+        self._model_dir = _ensure_local_model(cfg)
+        self.backend = embedding_variant(dataclasses.replace(cfg, embedding_device="cpu"))
+        self._tokenizer = None
+
+        ctx = multiprocessing.get_context("spawn")
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._procs = []
+        # Vererbte Thread-Anzahl für OpenMP/MKL und Tokenizer, damit die Worker sich nicht gegenseitig überbuchen
+        env = {"OMP_NUM_THREADS": str(self.threads), "MKL_NUM_THREADS": str(self.threads),
+               "TOKENIZERS_PARALLELISM": "false"}
+        saved = {k: os.environ.get(k) for k in env}
+        os.environ.update(env)
+        try:
+            for worker in range(self.workers):
+                p = ctx.Process(target=_worker_main, args=(cfg, worker, self.threads, self._tasks, self._results),
+                                daemon=True)
+                p.start()
+                self._procs.append(p)
+        finally:
+            for k, v in saved.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+
+        logger.info(f"Starte Embedding Pool mit {self.workers} Prozessen à {self.threads} Threads ({self.backend}) ...")
+        ready = [self._next_result() for _ in range(self.workers)]
+        self.dim = int(ready[0][2])
+        self.max_seq_length = int(ready[0][3])
+        logger.info("Embedding Pool bereit.")
+
+    def _next_result(self) -> tuple:
+        while True:
+            try:
+                result = self._results.get(timeout=_POLL_S)
+            except queue.Empty:
+                dead = [p.pid for p in self._procs if not p.is_alive()]
+                if dead:
+                    logger.error(f"Embedding Worker beendet (pid {dead}).")
+                    raise RuntimeError("Embedding Worker beendet")
+                continue
+            if result[0] == "error":
+                logger.error(f"Fehler im Embedding Worker {result[1]}:\n{result[2]}")
+                raise RuntimeError("Fehler im Embedding Worker")
+            return result
+
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, show_progress_bar: bool = False, **_: Any) -> np.ndarray:
+        """
+        Wie SentenceTransformer.encode: Texte nach Länge sortiert in Batches von batch_size auf die Worker verteilt.
+        """
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        batches = [order[i:i + batch_size] for i in range(0, len(texts), max(1, batch_size))]
+        return self.encode_batches(texts, batches, normalize_embeddings, show_progress_bar)
+
+    def encode_batches(self, texts: List[str], batches: List[np.ndarray], normalize: bool,
+                       show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Embeddings der Texte mit vorgegebener Aufteilung in Batches (Indizes in texts), siehe
+        app.embedding_batching. Die Batches werden dynamisch an freie Worker vergeben.
+        :return: Embeddings (len(texts) x dim) in der Reihenfolge von texts, gemappt aus der geteilten Matrix
+        """
+        n = len(texts)
+        if n == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        out_bytes = n * self.dim * 4
+
+        call_id = uuid.uuid4().hex
+        base = _shared_dir(int(offsets[-1]) + offsets.nbytes + out_bytes) / f"embedding_pool_{call_id}"
+        paths = (f"{base}.txt", f"{base}.idx", f"{base}.f32")
+        t = perf_counter()
+        try:
+            with open(paths[0], "wb") as f:
+                f.writelines(encoded)
+            offsets.tofile(paths[1])
+            out = np.memmap(paths[2], dtype=np.float32, mode="w+", shape=(n, self.dim))
+            del encoded
+
+            for batch_no, rows in enumerate(batches):
+                self._tasks.put((call_id, paths, n, self.dim, normalize, batch_no, np.asarray(rows, dtype=np.int64)))
+
+            progress = None
+            if show_progress_bar:
+                from tqdm import tqdm
+                progress = tqdm(total=len(batches), desc="Batches")
+            for _ in batches:
+                self._next_result()
+                if progress is not None:
+                    progress.update(1)
+            if progress is not None:
+                progress.close()
+        finally:
+            # Die Dateien werden sofort gelöscht, das Mapping der Ergebnis-Matrix bleibt bis zur Freigabe gültig
+            for path in paths:
+                Path(path).unlink(missing_ok=True)
+
+        encode_s = perf_counter() - t
+        mark("EMBEDDING_POOL",
+             texts=n,
+             batches=len(batches),
+             workers=self.workers,
+             threads=self.threads,
+             texts_per_s=f"{n / encode_s:.1f}" if encode_s > 0 else "0")
+        return out.view(np.ndarray)
+
+    @property
+    def tokenizer(self):
+        # Tokenizer des Modells im Hauptprozess, für das Batching nach Token-Länge (ohne das Modell zu laden)
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+
+            self._tokenizer = AutoTokenizer.from_pretrained(str(self._model_dir), local_files_only=True)
+        return self._tokenizer
+
+    def close(self) -> None:
+        for _ in self._procs:
+            self._tasks.put(None)
+        for p in self._procs:
+            p.join(timeout=30)
+            if p.is_alive():
+                p.terminate()
+        self._procs = []
+        logger.info("Embedding Pool beendet.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+def generation_key(model: str, prompt: str, options: dict[str, Any]) -> str:
+    return hashlib.sha256(
+        json.dumps({"model": model, "prompt": prompt, "options": options}, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class GenerationCache:
+    """
+    Persistenter Cache der LLM Antworten (SQLite), Key ist der Hash aus Modell, Prompt und Optionen. Nur für
+    deterministische Generierung (temperature 0) sinnvoll. Übersteigt die Größe max_bytes, werden die am längsten
+    nicht verwendeten Einträge gelöscht (LRU). Die Datei kann von mehreren Prozessen gleichzeitig verwendet werden.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, counters TEXT NOT NULL, "
+            "size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS generations_last_used ON generations (last_used)")
+        self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        logger.info(f"Generation Cache geöffnet: {self.path} ({self._count()} Einträge).")
+
+    def _count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0])
+
+    def get(self, key: str) -> tuple[str, dict[str, Any]] | None:
+        """
+        :return: (Antwort, Zähler der ursprünglichen Antwort von Ollama) oder None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT response, counters FROM generations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE generations SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, response: str, counters: dict[str, Any]) -> None:
+        counters_json = json.dumps(counters)
+        size = len(key) + len(response.encode("utf-8")) + len(counters_json)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generations (key, response, counters, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, counters_json, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        if self.max_bytes <= 0:
+            return
+        total = int(self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM generations").fetchone()[0])
+        if total <= self.max_bytes:
+            return
+
+        # Älteste Einträge (nach letzter Verwendung) löschen, bis die Größe wieder unter max_bytes liegt
+        evict: list[str] = []
+        for key, size in self._conn.execute("SELECT key, size FROM generations ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            evict.append(key)
+            total -= size
+        self._conn.executemany("DELETE FROM generations WHERE key = ?", [(k,) for k in evict])
+        self.evictions += len(evict)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM generations").fetchone()
+            total = self.hits + self.misses
+            return {
+                "entries": int(entries),
+                "size_bytes": int(size),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
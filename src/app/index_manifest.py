@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+import uuid
+from pathlib import Path
+from typing import Any
+
+from app.config import Config
+from app.embedding import embedding_variant
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+GENERATION_FILE = "GENERATION"
+
+
+def file_hash(path: Path) -> str:
+    """
+    Inhalts-Hash (sha256) einer Datei, wird blockweise gelesen um große Dokumente nicht komplett zu laden.
+    :param path: Pfad der Datei
+    :return: Hex-Digest des Inhalts
+    """
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def index_params(cfg: Config) -> dict[str, Any]:
+    """
+    Alle Parameter, von denen Chunks, Embeddings oder die Collection abhängen. Ändert sich einer davon, ist der
+    bestehende Index ungültig und muss komplett neu aufgebaut werden.
+    """
+    return {
+        "chunking_strategy": cfg.chunking_strategy,
+        "chunk_size": cfg.chunk_size,
+        "chunk_overlap": cfg.chunk_overlap,
+        "chunk_unit": cfg.chunk_unit,
+        "embedding_model": cfg.embedding_model,
+        "embedding_backend": embedding_variant(cfg),
+        "normalize_embeddings": cfg.normalize_embeddings,
+        "hnsw_ef_construction": cfg.hnsw_ef_construction,
+        "hnsw_ef_search": cfg.hnsw_ef_search,
+        "hnsw_max_neighbors": cfg.hnsw_max_neighbors,
+        "vector_backend": cfg.vector_backend,
+    }
+
+
+def load_manifest(index_dir: str) -> dict[str, Any] | None:
+    path = Path(index_dir) / MANIFEST_FILE
+    if not path.exists():
+        return None
+
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        logger.warning(f"Manifest {path} konnte nicht gelesen werden, Index wird neu aufgebaut ({e}).")
+        return None
+
+
+def save_manifest(index_dir: str, manifest: dict[str, Any]) -> None:
+    path = Path(index_dir) / MANIFEST_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Erst in temporäre Datei schreiben, damit bei Abbruch kein halbes Manifest übrig bleibt
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+    logger.info(f"Manifest gespeichert: {path} ({len(manifest.get('files', {}))} Dateien).")
+
+
+def write_generation(index_dir: str) -> str:
+    """
+    Neue Generation des Index, wird nach jedem abgeschlossenen Indexing geschrieben. Laufende Prozesse (API) erkennen
+    daran, dass der Index neu aufgebaut wurde.
+    """
+    generation = uuid.uuid4().hex
+    # Atomar austauschen, damit ein gleichzeitig lesender Prozess nie eine leere Datei sieht
+    path = Path(index_dir) / GENERATION_FILE
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(generation, encoding="utf-8")
+    tmp.replace(path)
+    return generation
+
+
+def read_generation(index_dir: str) -> str | None:
+    try:
+        return (Path(index_dir) / GENERATION_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+
+
+class GenerationWatcher:
+    """
+    Generation des Index für die Prüfung bei jedem Request: die Datei wird nur neu gelesen, wenn sich mtime, inode
+    oder Größe geändert haben, sonst kostet eine Prüfung nur ein stat(). Nicht thread-safe, Aufrufer halten ein Lock.
+    """
+
+    def __init__(self, index_dir: str):
+        self.path = Path(index_dir) / GENERATION_FILE
+        self._stat: tuple[int, int, int] | None = None
+        self._generation: str | None = None
+
+    def current(self) -> str | None:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            self._stat, self._generation = None, None
+            return None
+        stat = (st.st_mtime_ns, st.st_ino, st.st_size)
+        if stat != self._stat:
+            self._generation = read_generation(str(self.path.parent))
+            self._stat = stat
+        return self._generation
@@ -1,246 +1,308 @@
-import chromadb
+import hashlib
 import shutil
 import logging
-import re
-from dataclasses import dataclass
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
-from typing import List, Dict, Any
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator
 
+from app.bm25_index import build_bm25_index
+from app.chunk_store import ChunkStore, ChunkStoreWriter
+from app.chunking import (RawDocument, _read_document, _CHUNK_FUNCS, chunk_files_parallel, chunk_token_lengths,
+                          load_chunk_tokenizer, max_chunk_tokens)
 from app.config import load_config, Config
-from app.embedding import get_embed_model
+from app.embedding import _ensure_local_model, get_embed_model
+from app.embedding_batching import encode_token_batched
+from app.embedding_cache import EmbeddingCache, encode_with_cache
+from app.embedding_pool import EmbeddingPool
+from app.indexing_pipeline import run_pipelined
+from app.index_manifest import file_hash, index_params, load_manifest, save_manifest, write_generation
 from app.time_marker import mark
+from app.vector_store import VectorStore, open_vector_store
 
 logger = logging.getLogger(__name__)
 
-_MARKER_RE = re.compile(r"^(#{1,6})\s+(.*)\s*$")
-
-
-@dataclass
-class RawDocument:
-    text: str
-    metadata: Dict[str, Any]
-
 
 # ========== LOAD DOCUMENTS ==========
 #
 # Aktuell nur .txt im Datensatz; reicht zm testen der Energieeffizien
-def _load_documents(data_dir: str) -> List[RawDocument]:
+def _list_document_paths(data_dir: str) -> List[Path]:
     base = Path(data_dir)
-    docs: list[RawDocument] = []
-
-    for path in base.rglob("*"):
-        if not path.is_file():
-            continue
+    paths = [p for p in base.rglob("*") if p.is_file() and p.suffix.lower() == ".txt"]
+    # Sortiert, damit die Reihenfolge (und damit chunk ids und Batches) reproduzierbar ist
+    return sorted(paths)
 
-        suffix = path.suffix.lower()
-        if suffix == ".txt":
-            doc_type = "txt"
-        else:
-            continue
 
-        try:
-            text = path.read_text(encoding="utf-8", errors="ignore")
-            if not text.strip():
-                logger.warning(f"Leeres Dokument: {path}")
-                continue
+def _iter_documents(paths: Iterable[Path]) -> Iterator[RawDocument]:
+    for path in paths:
+        doc = _read_document(path)
+        if doc is not None:
+            yield doc
 
-            metadata = {
-                "source": str(path),
-                "type": doc_type,
-            }
-            docs.append(RawDocument(text=text, metadata=metadata))
-        except Exception as e:
-            logger.error(f"Fehler beim Laden von {path}: {e}")
 
+def _load_documents(paths: List[Path]) -> List[RawDocument]:
+    docs = list(_iter_documents(paths))
     logger.info(f"Insgesamt {len(docs)} Dokumente geladen.")
     return docs
 
 
-# ========== CHUNKING ==========
-#
-# Verschiedene Chunking Strategien implementieren
-# 1. _simple_chunk(): Feste Chunk Größe und fester Overlap, möglichst einfaches aufteilen der Dokumente
-# 2. _structure_chunk(): Chunking auf Basis von strukturellen Eigenschaften der Dokumente
+# ========== INDEXING ==========
+def reset_index_dir(index_dir: str) -> None:
+    p = Path(index_dir)
+    if p.exists():
+        logger.info(f"Index-Order {p} wird zurückgesetzt ...")
+        shutil.rmtree(p)
 
-def _simple_chunk(doc: RawDocument, chunk_size: int, chunk_overlap: int) -> List[RawDocument]:
+    p.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Index-Ordner neu angelegt: {p}.")
+
+
+def _chunk_id(metadata: Dict[str, Any]) -> str:
     """
-    Einfache Chunking Strategie mit fester chunk size und einem festen overlap zwischen den Chunks.
-    :param doc: Liste der Raw Textdokumente
-    :param chunk_size: Größe der Chunks
-    :param chunk_overlap: Overlap zwischen Chunks
-    :return: Liste der gechunkten Dokumente
+    Stabile chunk id aus Quelle und Offset des Chunks. Dadurch bekommt derselbe Chunk bei jedem Indexing dieselbe id
+    und kann per upsert aktualisiert bzw. gezielt gelöscht werden.
     """
-    text = doc.text
-    chunks: list[RawDocument] = []
-    chunk_index = 0
+    source_hash = hashlib.sha1(str(metadata["source"]).encode("utf-8")).hexdigest()[:16]
+    return f"{source_hash}:{metadata['chunk_start']}"
 
-    start = 0
-    step = max(1, chunk_size - chunk_overlap)
 
-    while start < len(text):
-        end = start + chunk_size
-        chunk_text = text[start:end]
-        metadata = dict(doc.metadata)
-        metadata["chunk_index"] = chunk_index
-        metadata["chunk_start"] = start
-        metadata["chunk_end"] = min(end, len(text))
-        if chunk_text.strip():
-            chunks.append(RawDocument(text=chunk_text, metadata=metadata))
-        chunk_index += 1
-        start += step
+def _get_chunk_func(cfg: Config):
+    if cfg.chunking_strategy not in _CHUNK_FUNCS:
+        logging.error(f"Unbekannte Chunking Strategie: {cfg.chunking_strategy}")
+        raise ValueError()
 
-    return chunks
+    tokenizer_dir = _chunk_tokenizer_dir(cfg)
+    if tokenizer_dir is None:
+        return _CHUNK_FUNCS[cfg.chunking_strategy]
 
+    tokenizer = load_chunk_tokenizer(tokenizer_dir)
+    if cfg.chunk_size > max_chunk_tokens(tokenizer):
+        logger.warning(f"chunk_size {cfg.chunk_size} Tokens ist größer als die max. Sequenzlänge von "
+                       f"{cfg.embedding_model}, Chunks werden auf {max_chunk_tokens(tokenizer)} Tokens begrenzt.")
+    return partial(_CHUNK_FUNCS[cfg.chunking_strategy], tokenizer=tokenizer)
 
-def _structure_chunk(doc: RawDocument, chunk_size: int, chunk_overlap: int) -> List[RawDocument]:
+
+def _chunk_tokenizer_dir(cfg: Config) -> str | None:
     """
-    Chunking auf Basis der Markdown Strukturen der arXiv Dokumente im Datensatz. Mit sections: #-#####;
-    besondere Blöcke: ###### (Abstract, Theorem, Definition, Proof, ...). Das Chunking findet auf Basis dieser Blöcke
-    statt. Die Information dieser Blöcke (Typ, Titel, ...) wird zusätzlich zu Start und Ende des Chunks als Metadaten
-    zum Chunk gespeichert.
-    :param doc: Liste der Raw Textdokumente
-    :param chunk_size: maximale Größe der Chunks
-    :param chunk_overlap: Overlap zwischen Chunks
-    :return: Liste der gechunkten Dokumente
+    :return: Lokales Embedding Modell, dessen Tokenizer die Chunks misst (chunk_unit: tokens), sonst None
     """
-    from app.block_types import ALLOWED_BLOCK_TYPES, BLOCK_TYPES_ALIASES
-
-    text = doc.text
-    chunks: List[RawDocument] = []
-    chunk_index = 0
-
-    # Extract Doc Title: "#..."; fallback wenn kein "#": 1st (non-empty) line in Doc
-    doc_title, first_non_empty = "", ""
-    for line in text.splitlines():
-        s = line.strip()
-        if not s:
-            continue
-        if not first_non_empty:
-            first_non_empty = s
-
-        m = _MARKER_RE.match(s)
-        if m and len(m.group(1)) == 1:
-            doc_title = (m.group(2).strip() or first_non_empty)
-            break
-
-    doc_title = doc_title or first_non_empty
+    if cfg.chunk_unit == "chars":
+        return None
+    if cfg.chunk_unit != "tokens":
+        logging.error(f"Unbekannte Chunk Einheit: {cfg.chunk_unit}")
+        raise ValueError()
 
-    block_start = 0
-    block_title = ""
-    block_type = "text"
+    return str(_ensure_local_model(cfg))
 
-    def emit_chunk(chunk_text: str, start_abs: int, end_abs: int):
-        nonlocal chunk_index
-        meta = dict(doc.metadata)
-        meta["doc_title"] = doc_title
-        meta["block_title"] = block_title
-        meta["block_type"] = block_type
-        meta["chunk_index"] = chunk_index
-        meta["chunk_start"] = start_abs
-        meta["chunk_end"] = end_abs
 
-        chunks.append(RawDocument(text=chunk_text, metadata=meta))
-        chunk_index += 1
+class _TruncationStats:
+    """
+    Zählt, wie viele Chunks länger als die max. Sequenzlänge des Embedding Modells sind und beim Embedding daher
+    abgeschnitten werden, und wie gut die Chunks die Sequenzlänge ausnutzen (chunk_token_stats).
+    """
 
-    # Aufteilen der Dokumente in Blöcke nach "#" und dann Chunks
-    def finalize_block(block_end: int):
-        if block_end <= block_start:
+    def __init__(self, cfg: Config):
+        self.tokenizer = load_chunk_tokenizer(str(_ensure_local_model(cfg)))
+        self.max_tokens = int(self.tokenizer.model_max_length)
+        self.chunks = 0
+        self.truncated = 0
+        self.tokens = 0
+        self.tokens_lost = 0
+        self.longest = 0
+
+    def add(self, texts: List[str]) -> None:
+        lengths = chunk_token_lengths(self.tokenizer, texts)
+        if not len(lengths):
             return
-
-        block_text = text[block_start:block_end]
-        if not block_text.strip():
+        over = lengths[lengths > self.max_tokens] - self.max_tokens
+        self.chunks += len(lengths)
+        self.truncated += len(over)
+        self.tokens += int(lengths.sum())
+        self.tokens_lost += int(over.sum())
+        self.longest = max(self.longest, int(lengths.max()))
+
+    def report(self) -> None:
+        if not self.chunks:
             return
+        mark("CHUNK_TRUNCATION",
+             chunks=self.chunks,
+             truncated=self.truncated,
+             truncated_ratio=f"{self.truncated / self.chunks:.4f}",
+             tokens=self.tokens,
+             tokens_lost=self.tokens_lost,
+             mean_tokens=f"{self.tokens / self.chunks:.1f}",
+             max_tokens=self.longest,
+             max_seq_length=self.max_tokens)
+        logger.info(f"{self.truncated}/{self.chunks} Chunks länger als {self.max_tokens} Tokens und beim Embedding "
+                    f"abgeschnitten ({self.tokens_lost}/{self.tokens} Tokens), im Mittel "
+                    f"{self.tokens / self.chunks:.1f} Tokens pro Chunk.")
+
+
+@contextmanager
+def _encoder(cfg: Config):
+    """
+    Embedding Modell für das Indexing, bei embedding_workers > 0 ein Pool aus Encoder Prozessen auf der CPU
+    (app.embedding_pool), der danach wieder beendet wird.
+    """
+    if cfg.embedding_workers <= 0:
+        logger.info(f"Lade Embedding-Modell {cfg.embedding_model} ...")
+        yield get_embed_model(cfg)
+        return
 
-        start = 0
-        while start < len(block_text):
-            end = min(start + chunk_size, len(block_text))
-            chunk_text = block_text[start:end]
+    logger.info(f"Lade Embedding-Modell {cfg.embedding_model} in {cfg.embedding_workers} Prozessen ...")
+    pool = EmbeddingPool(cfg, cfg.embedding_workers, cfg.embedding_worker_threads)
+    try:
+        yield pool
+    finally:
+        pool.close()
 
-            if chunk_text.strip():
-                emit_chunk(chunk_text, block_start + start, block_start + end)
 
-            if end == len(block_text):
-                break
+def _encode(cfg: Config, model, texts: List[str], show_progress_bar: bool = True):
+    if cfg.embedding_batching == "tokens":
+        return encode_token_batched(model, texts, cfg.embedding_batch_tokens, cfg.embedding_batch_size,
+                                    cfg.normalize_embeddings, show_progress_bar)
+    if cfg.embedding_batching != "fixed":
+        logging.error(f"Unbekanntes Embedding Batching: {cfg.embedding_batching}")
+        raise ValueError()
+
+    return model.encode(
+        texts,
+        batch_size=cfg.embedding_batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=cfg.normalize_embeddings,
+        show_progress_bar=show_progress_bar
+    )
 
-            start = end - chunk_overlap if chunk_overlap > 0 else end
 
-    pos = 0
-    for line in text.splitlines(keepends=True):
-        line_start = pos
-        line_end = pos + len(line)
-        pos = line_end
+def _embed_texts(cfg: Config, model, texts: List[str], embedding_cache: EmbeddingCache | None,
+                 show_progress_bar: bool = True):
+    if embedding_cache is not None:
+        return encode_with_cache(embedding_cache, texts, lambda miss: _encode(cfg, model, miss, show_progress_bar))
+    return _encode(cfg, model, texts, show_progress_bar)
 
-        marker = _MARKER_RE.match(line.rstrip("\r\n"))
-        if not marker:
+
+def _plan_incremental(cfg: Config, vector_store: VectorStore, paths: List[Path]) -> tuple[Dict[str, Any], List[Path], List[str]]:
+    """
+    Vergleicht die Dokumente in data_dir mit dem Manifest des letzten Indexing. Nur neue oder geänderte Dateien müssen
+    neu gechunkt und embedded werden, Chunks von geänderten und gelöschten Dateien werden aus der Collection entfernt.
+    Haben sich Chunking-, Embedding- oder Index-Parameter geändert, wird die Collection komplett neu aufgebaut.
+    :param cfg: Config
+    :param vector_store: Vector Store des Index
+    :param paths: Alle Dokumente in data_dir
+    :return: neues Manifest, zu indexierende Dokumente, zu löschende chunk ids
+    """
+    params = index_params(cfg)
+    manifest = load_manifest(cfg.index_dir)
+
+    if manifest is None or manifest.get("params") != params:
+        if manifest is not None:
+            logger.info("Index-Parameter haben sich geändert, Collection wird komplett neu aufgebaut ...")
+        vector_store.reset()
+        manifest = {"params": params, "files": {}}
+
+    old_files: Dict[str, Any] = manifest["files"]
+    new_files: Dict[str, Any] = {}
+    changed: list[Path] = []
+    stale_ids: list[str] = []
+
+    for path in paths:
+        src = str(path)
+        digest = file_hash(path)
+        entry = old_files.get(src)
+
+        if entry is not None and entry["hash"] == digest:
+            new_files[src] = entry
             continue
 
-        finalize_block(line_start)
+        if entry is not None:
+            stale_ids.extend(entry["ids"])
+        new_files[src] = {"hash": digest, "ids": []}
+        changed.append(path)
 
-        hashes = marker.group(1)
-        title = (marker.group(2).strip() or "")
+    removed = [src for src in old_files if src not in new_files]
+    for src in removed:
+        stale_ids.extend(old_files[src]["ids"])
 
-        block_title = title
-        seen_title = False
-        if len(hashes) == 1 and not seen_title:
-            block_type = "title"
-            seen_title = True
+    logger.info(f"Inkrementelles Indexing: {len(changed)} neue/geänderte, {len(removed)} gelöschte und "
+                f"{len(paths) - len(changed)} unveränderte Dokumente.")
+    return {"params": params, "files": new_files}, changed, stale_ids
 
-        elif len(hashes) == 6:
-            first = (title.split()[0] if title else "").lower()
-            first = first.strip(" \t\r\n()[]{}<>\"'“”‘’").rstrip(".,;:")    # Satzzeichen filtern
-            if (not first) or any(ch.isdigit() for ch in first):            # Nummerierungen filtern
-                block_type = "special"
-            else:
-                first = BLOCK_TYPES_ALIASES.get(first, first)
-                block_type = first if first in ALLOWED_BLOCK_TYPES else "special"
 
-        else:
-            block_type = "heading"
+def _copy_unchanged_chunks(cfg: Config, store: ChunkStoreWriter, manifest: Dict[str, Any]) -> None:
+    """
+    Inkrementelles Indexing: Chunks unveränderter Dokumente werden aus dem bisherigen Chunk Store übernommen, da sie
+    nicht neu gechunkt werden. Fehlende Chunks lädt das Retrieval weiterhin aus den Dokumenten.
+    """
+    keep = [chunk_id for entry in manifest["files"].values() for chunk_id in entry["ids"]]
+    if not keep:
+        return
 
-        block_start = line_end
+    old_store = ChunkStore.open(cfg.index_dir)
+    if old_store is None:
+        logger.warning("Kein bisheriger Chunk Store vorhanden, Chunks unveränderter Dokumente fehlen im Store.")
+        return
 
-    finalize_block(len(text))
-    return chunks
+    copied = store.copy_from(old_store, keep)
+    old_store.close()
+    logger.info(f"{copied}/{len(keep)} Chunks unveränderter Dokumente aus dem Chunk Store übernommen.")
 
 
-# ========== INDEXING ==========
-def reset_index_dir(index_dir: str) -> None:
-    p = Path(index_dir)
-    if p.exists():
-        logger.info(f"Index-Order {p} wird zurückgesetzt ...")
-        shutil.rmtree(p)
+def _batched(items: Iterable[Any], n: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    while batch := list(islice(it, n)):
+        yield batch
 
-    p.mkdir(parents=True, exist_ok=True)
-    logger.info(f"Index-Ordner neu angelegt: {p}.")
 
+def _make_persist(write, manifest: Dict[str, Any] | None, store: ChunkStoreWriter | None,
+                  token_stats: _TruncationStats | None = None):
+    """
+    Speichert einen Batch an Chunks mit dessen Embeddings in der Collection, schreibt die Chunk-Texte in den
+    Chunk Store, trägt die chunk ids ins Manifest ein und zählt die Tokens der Chunks (jeweils falls aktiv).
+    """
+    def persist(chunks: List[RawDocument], embeddings) -> None:
+        ids = [_chunk_id(d.metadata) for d in chunks]
+        metadatas = [d.metadata for d in chunks]
+        write(ids=ids, embeddings=embeddings, metadatas=metadatas)
 
-def _build_index(cfg: Config | None = None, reset_db: bool = False) -> None:
-    if cfg is None:
-        cfg = load_config()
+        if store is not None:
+            store.add(ids, (d.text for d in chunks))
+        if token_stats is not None:
+            token_stats.add([d.text for d in chunks])
+        if manifest is not None:
+            for chunk_id, meta in zip(ids, metadatas):
+                manifest["files"][meta["source"]]["ids"].append(chunk_id)
 
-    if reset_db:
-        reset_index_dir(cfg.index_dir)
+    return persist
 
-    # ========== 1. Dokumente Laden ==========
-    logger.info(f"Lade Dokumente aus {cfg.data_dir} ...")
-    docs = _load_documents(cfg.data_dir)
 
-    # ========== 2. Dokumente Chunken ==========
-    logger.info("Chunking der Dokumente ...")
+def _index_batch(cfg: Config, persist, chunk_func, paths: List[Path], db_batch_size: int,
+                 embedding_cache: EmbeddingCache | None) -> None:
+    """
+    Standard Indexing: alle Dokumente laden, alle chunken, alle embedden und dann alle in die Collection schreiben.
+    """
     chunked_docs: list[RawDocument] = []
 
-    if cfg.chunking_strategy == "simple":
-        chunk_func = _simple_chunk
-    elif cfg.chunking_strategy == "structure":
-        chunk_func = _structure_chunk
+    if cfg.chunking_workers > 0:
+        # Lesen und Chunking parallel in chunking_workers Prozessen, liegt daher komplett im CHUNKING Fenster
+        logger.info(f"Lesen und Chunking der Dokumente mit {cfg.chunking_workers} Prozessen ...")
+        n_docs = 0
+        mark("CHUNKING_START")
+        for chunked in chunk_files_parallel(paths, cfg.chunking_strategy, cfg.chunk_size, cfg.chunk_overlap,
+                                            workers=cfg.chunking_workers, tokenizer_dir=_chunk_tokenizer_dir(cfg)):
+            chunked_docs.extend(chunked.to_chunks())
+            n_docs += 1
+        mark("CHUNKING_END")
+        logger.info(f"Insgesamt {n_docs} Dokumente geladen.")
     else:
-        logging.error(f"Unbekannte Chunking Strategie: {cfg.chunking_strategy}")
-        raise ValueError()
+        docs = _load_documents(paths)
 
-    mark("CHUNKING_START")
-    for doc in docs:
-        chunked_docs.extend(chunk_func(doc, chunk_size=cfg.chunk_size, chunk_overlap=cfg.chunk_overlap))
-    mark("CHUNKING_END")
+        # ========== 2. Dokumente Chunken ==========
+        logger.info("Chunking der Dokumente ...")
+        mark("CHUNKING_START")
+        for doc in docs:
+            chunked_docs.extend(chunk_func(doc, chunk_size=cfg.chunk_size, chunk_overlap=cfg.chunk_overlap))
+        mark("CHUNKING_END")
 
     logger.info(f"Insgesamt {len(chunked_docs)} Chunks erstellt.")
 
@@ -249,66 +311,211 @@ def _build_index(cfg: Config | None = None, reset_db: bool = False) -> None:
         return
 
     # ========== 3. Embedding der Dokumente ==========
-    logger.info(f"Lade Embedding-Modell {cfg.embedding_model} ...")
-    model = get_embed_model(cfg)
-
-    texts = [d.text for d in chunked_docs]
-    logger.info("Berechne Embeddings ...")
-    mark("EMBEDDING_START")
-    embeddings = model.encode(
-        texts,
-        batch_size=128,
-        convert_to_numpy=True,
-        normalize_embeddings=cfg.normalize_embeddings,
-        show_progress_bar=True
-    )
-    mark("EMBEDDING_END")
+    with _encoder(cfg) as model:
+        texts = [d.text for d in chunked_docs]
+        logger.info("Berechne Embeddings ...")
+        mark("EMBEDDING_START")
+        embeddings = _embed_texts(cfg, model, texts, embedding_cache)
+        mark("EMBEDDING_END")
 
     # ========== 4. Datenbank erstellen ==========
-    logger.info(f"Erzeuge Chroma DB in {cfg.index_dir} ...")
-    client = chromadb.PersistentClient(path=cfg.index_dir)
-
-    # Siehe https://cookbook.chromadb.dev/core/collections/ .
-    # Und https://cookbook.chromadb.dev/core/configuration/ für Details zu metadata
-    collection = client.get_or_create_collection(
-        "rag",
-        metadata={
-            "hnsw:space": "cosine",
-            "hnsw:num_threads": 5,
-            "hnsw:batch_size": 10_000,
-            "hnsw:sync_threshold": 200_000,
-            "ef_construction": cfg.hnsw_ef_construction,
-            "ef_search": cfg.hnsw_ef_search,
-            "max_neighbors": cfg.hnsw_max_neighbors,
-        }
-    )
-
-    ids = [str(i) for i in range(len(chunked_docs))]
-    metadatas = [d.metadata for d in chunked_docs]
-
     # BATCH-WISE schreiben in Chroma DB (siehe https://cookbook.chromadb.dev/strategies/batching/).
     # Wichtig, da chromaDB (in der Regel) maximal eine batch size von 5461 akzeptiert.
     # Wird über client.get_max_batch_size() exakt abgerufen, zur Sicherheit mit "-1".
     logger.info("Speichere Embeddings ...")
-    batch_size = client.get_max_batch_size() - 1
     total = len(chunked_docs)
     mark("PERSIST_IN_DB_START")
 
-    for start in range(0, total, batch_size):
-        end = min(start + batch_size, total)
-        batch_ids = ids[start:end]
-        batch_embs = embeddings[start:end]
-        batch_metas = metadatas[start:end]
+    for start in range(0, total, db_batch_size):
+        end = min(start + db_batch_size, total)
 
         logger.debug(f"Füge Batch {start}–{end} von {total} hinzu ...")
-        collection.add(
-            ids=batch_ids,
-            embeddings=batch_embs,
-            metadatas=batch_metas,
-        )
+        persist(chunked_docs[start:end], embeddings[start:end])
 
     mark("PERSIST_IN_DB_END")
 
+
+def _index_streaming(cfg: Config, persist, chunk_func, paths: List[Path], db_batch_size: int,
+                     embedding_cache: EmbeddingCache | None) -> None:
+    """
+    Streaming Indexing mit begrenztem Speicherverbrauch: Dokumente werden lazy gelesen und gechunkt, die Chunks in
+    Micro-Batches (indexing_batch_size) embedded und direkt in die Collection geschrieben. Im Speicher liegt so immer
+    nur ein Dokument und ein Batch an Chunks/Embeddings, unabhängig von der Größe des Datensatzes.
+    Die mark() Events der Phasen werden pro Batch gesetzt.
+    """
+    with _encoder(cfg) as model:
+        def iter_chunks() -> Iterator[RawDocument]:
+            for doc in _iter_documents(paths):
+                yield from chunk_func(doc, chunk_size=cfg.chunk_size, chunk_overlap=cfg.chunk_overlap)
+
+        batch_size = max(1, min(cfg.indexing_batch_size, db_batch_size))
+        chunks = iter_chunks()
+        total = 0
+        batch_no = 0
+
+        logger.info(f"Streaming Indexing mit Batches von {batch_size} Chunks ...")
+        while True:
+            mark("CHUNKING_START", batch=batch_no)
+            batch = list(islice(chunks, batch_size))
+            mark("CHUNKING_END", batch=batch_no)
+            if not batch:
+                break
+
+            mark("EMBEDDING_START", batch=batch_no)
+            embeddings = _embed_texts(cfg, model, [d.text for d in batch], embedding_cache, show_progress_bar=False)
+            mark("EMBEDDING_END", batch=batch_no)
+
+            mark("PERSIST_IN_DB_START", batch=batch_no)
+            persist(batch, embeddings)
+            mark("PERSIST_IN_DB_END", batch=batch_no)
+
+            total += len(batch)
+            batch_no += 1
+            logger.debug(f"Batch {batch_no} gespeichert ({total} Chunks insgesamt).")
+
+        if total == 0:
+            logger.warning("Keine Chunks gefunden.")
+        logger.info(f"Insgesamt {total} Chunks in {batch_no} Batches gespeichert.")
+
+
+def _index_pipelined(cfg: Config, persist, chunk_func, paths: List[Path], db_batch_size: int,
+                     embedding_cache: EmbeddingCache | None) -> None:
+    """
+    Pipelined Indexing: Lesen+Chunking (Thread Pool), Embedding und Speichern laufen überlappend und sind über
+    begrenzte Queues verbunden, siehe app.indexing_pipeline.
+    """
+    with _encoder(cfg) as model:
+        def read_chunk(path: Path) -> List[RawDocument]:
+            doc = _read_document(path)
+            if doc is None:
+                return []
+            return chunk_func(doc, chunk_size=cfg.chunk_size, chunk_overlap=cfg.chunk_overlap)
+
+        def embed(batch: List[RawDocument]):
+            return _embed_texts(cfg, model, [d.text for d in batch], embedding_cache, show_progress_bar=False)
+
+        logger.info(f"Pipelined Indexing mit {cfg.indexing_workers} Lese-Threads und Batches von "
+                    f"{cfg.indexing_batch_size} Chunks ...")
+        stats = run_pipelined(
+            paths,
+            read_chunk=read_chunk,
+            embed=embed,
+            persist=persist,
+            batch_size=max(1, min(cfg.indexing_batch_size, db_batch_size)),
+            read_workers=max(1, cfg.indexing_workers),
+            queue_size=max(1, cfg.indexing_queue_size),
+        )
+        logger.info(f"Insgesamt {stats['persist'].items} Batches gespeichert.")
+
+
+def _iter_indexed_chunks(cfg: Config, vector_store: VectorStore, page_size: int) -> Iterator[tuple[str, str]]:
+    """
+    Alle Chunks der Collection als (chunk id, Text); der Text kommt aus dem Chunk Store (falls vorhanden), sonst aus
+    den Dokumenten. Dadurch sind nach inkrementellem Indexing auch unveränderte Chunks enthalten.
+    """
+    entries: list[tuple[str, Dict[str, Any]]] = []
+    offset = 0
+    while True:
+        page = vector_store.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        entries.extend(zip(page["ids"], page["metadatas"]))
+        offset += len(page["ids"])
+
+    # Nach Quelle sortiert, damit jedes Dokument nur einmal gelesen wird
+    entries.sort(key=lambda e: (e[1].get("source", ""), int(e[1].get("chunk_start", 0))))
+
+    store = ChunkStore.open(cfg.index_dir) if cfg.chunk_store else None
+    current_src, current_text = None, ""
+    try:
+        for chunk_id, meta in entries:
+            text = store.get(chunk_id) if store is not None else None
+            if text is None:
+                src = meta.get("source")
+                if src != current_src:
+                    current_src = src
+                    current_text = Path(src).read_text(encoding="utf-8", errors="ignore")
+                text = current_text[int(meta.get("chunk_start", 0)):int(meta.get("chunk_end", 0))]
+            yield chunk_id, text
+    finally:
+        if store is not None:
+            store.close()
+
+
+def _build_index(cfg: Config | None = None, reset_db: bool = False) -> None:
+    if cfg is None:
+        cfg = load_config()
+
+    if reset_db:
+        reset_index_dir(cfg.index_dir)
+
+    chunk_func = _get_chunk_func(cfg)
+    logger.info(f"Erzeuge/Öffne Vector Store ({cfg.vector_backend}) in {cfg.index_dir} ...")
+    vector_store = open_vector_store(cfg)
+    db_batch_size = vector_store.max_batch_size
+
+    # ========== 1. Dokumente Laden ==========
+    logger.info(f"Lade Dokumente aus {cfg.data_dir} ...")
+    paths = _list_document_paths(cfg.data_dir)
+
+    manifest: Dict[str, Any] | None = None
+    stale_ids: list[str] = []
+    if cfg.incremental_indexing:
+        manifest, paths, stale_ids = _plan_incremental(cfg, vector_store, paths)
+
+    # Veraltete Chunks (geänderte und gelöschte Dateien) entfernen
+    if stale_ids:
+        logger.info(f"Lösche {len(stale_ids)} veraltete Chunks ...")
+        mark("DELETE_IN_DB_START")
+        for batch_ids in _batched(stale_ids, db_batch_size):
+            vector_store.delete(ids=batch_ids)
+        mark("DELETE_IN_DB_END")
+
+    # Im inkrementellen Modus per upsert, damit bereits vorhandene ids überschrieben werden
+    write = vector_store.upsert if cfg.incremental_indexing else vector_store.add
+
+    store: ChunkStoreWriter | None = None
+    if cfg.chunk_store:
+        store = ChunkStoreWriter(cfg.index_dir)
+        if manifest is not None:
+            _copy_unchanged_chunks(cfg, store, manifest)
+
+    # Embedding Cache einmal pro Indexing öffnen, nicht pro (Micro-)Batch
+    embedding_cache = EmbeddingCache.for_config(cfg) if cfg.embedding_cache else None
+    token_stats = _TruncationStats(cfg) if cfg.chunk_token_stats else None
+    persist = _make_persist(write, manifest, store, token_stats)
+
+    if cfg.chunking_workers > 0 and cfg.indexing_mode != "batch":
+        logger.warning(f"chunking_workers wird nur im batch Modus verwendet (indexing_mode={cfg.indexing_mode}).")
+
+    if cfg.indexing_mode == "batch":
+        _index_batch(cfg, persist, chunk_func, paths, db_batch_size, embedding_cache)
+    elif cfg.indexing_mode == "streaming":
+        _index_streaming(cfg, persist, chunk_func, paths, db_batch_size, embedding_cache)
+    elif cfg.indexing_mode == "pipelined":
+        _index_pipelined(cfg, persist, chunk_func, paths, db_batch_size, embedding_cache)
+    else:
+        logging.error(f"Unbekannter Indexing Modus: {cfg.indexing_mode}")
+        raise ValueError()
+
+    if store is not None:
+        store.close()
+    if manifest is not None:
+        save_manifest(cfg.index_dir, manifest)
+    if token_stats is not None:
+        token_stats.report()
+
+    # Korpusweiter BM25 Index für Hybrid Retrieval, immer aus der vollständigen Collection
+    if cfg.bm25_index:
+        logger.info("Erstelle BM25 Index ...")
+        mark("BM25_INDEX_START")
+        build_bm25_index(cfg.index_dir, _iter_indexed_chunks(cfg, vector_store, db_batch_size))
+        mark("BM25_INDEX_END")
+
+    vector_store.close()
+
+    write_generation(cfg.index_dir)
+
     logger.info("========== INDEXING FERTIG ==========")
     return
 
@@ -0,0 +1,159 @@
+import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any, Callable, Iterable, List
+
+from app.time_marker import mark
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class _Aborted(Exception):
+    pass
+
+
+@dataclass
+class StageStats:
+    name: str
+    wall_s: float = 0.0
+    idle_s: float = 0.0
+    items: int = 0
+
+    @property
+    def busy_s(self) -> float:
+        return max(0.0, self.wall_s - self.idle_s)
+
+
+def _put(q: queue.Queue, item: Any, stats: StageStats, stop: threading.Event) -> None:
+    t = perf_counter()
+    while True:
+        try:
+            q.put(item, timeout=0.1)
+            break
+        except queue.Full:
+            if stop.is_set():
+                raise _Aborted()
+    stats.idle_s += perf_counter() - t
+
+
+def _get(q: queue.Queue, stats: StageStats, stop: threading.Event) -> Any:
+    t = perf_counter()
+    while True:
+        try:
+            item = q.get(timeout=0.1)
+            break
+        except queue.Empty:
+            if stop.is_set():
+                raise _Aborted()
+    stats.idle_s += perf_counter() - t
+    return item
+
+
+def run_pipelined(
+        sources: Iterable[Any],
+        read_chunk: Callable[[Any], List[Any]],
+        embed: Callable[[List[Any]], Any],
+        persist: Callable[[List[Any], Any], None],
+        batch_size: int,
+        read_workers: int,
+        queue_size: int,
+) -> dict[str, StageStats]:
+    """
+    Producer/Consumer Indexing: Lesen+Chunking, Embedding und Speichern laufen gleichzeitig in eigenen Threads und
+    sind über begrenzte Queues verbunden (Backpressure). Die Reihenfolge der Chunks bleibt erhalten.
+    :param sources: Quellen (Dateipfade), werden von einem Thread Pool gelesen und gechunkt
+    :param read_chunk: Liest und chunkt eine Quelle
+    :param embed: Berechnet die Embeddings eines Batches
+    :param persist: Speichert einen Batch mit dessen Embeddings
+    :param batch_size: Anzahl Chunks pro Batch
+    :param read_workers: Anzahl Threads für Lesen+Chunking
+    :param queue_size: Maximale Anzahl Batches je Queue
+    :return: Busy/Idle Zeiten pro Stage
+    """
+    chunk_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    embed_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors: list[BaseException] = []
+    stats = {name: StageStats(name) for name in ("chunking", "embedding", "persist")}
+
+    def run_stage(name: str, func: Callable[[StageStats], None]):
+        def target():
+            st = stats[name]
+            t = perf_counter()
+            try:
+                func(st)
+            except _Aborted:
+                pass
+            except BaseException as e:
+                logger.error(f"Fehler in Stage {name}: {e}")
+                errors.append(e)
+                stop.set()
+            finally:
+                st.wall_s = perf_counter() - t
+
+        return threading.Thread(target=target, name=f"indexing-{name}", daemon=True)
+
+    def reader(st: StageStats):
+        mark("CHUNKING_START")
+        batch: list[Any] = []
+        pending: deque = deque()
+
+        def drain_one():
+            nonlocal batch
+            batch.extend(pending.popleft().result())
+            while len(batch) >= batch_size:
+                _put(chunk_q, batch[:batch_size], st, stop)
+                st.items += 1
+                batch = batch[batch_size:]
+
+        # Maximal 2 Dokumente pro Worker gleichzeitig in Arbeit, die Ergebnisse werden in Reihenfolge verarbeitet
+        with ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="indexing-read") as pool:
+            for src in sources:
+                pending.append(pool.submit(read_chunk, src))
+                if len(pending) >= 2 * read_workers:
+                    drain_one()
+            while pending:
+                drain_one()
+
+        if batch:
+            _put(chunk_q, batch, st, stop)
+            st.items += 1
+        _put(chunk_q, _DONE, st, stop)
+        mark("CHUNKING_END")
+
+    def encoder(st: StageStats):
+        mark("EMBEDDING_START")
+        while (batch := _get(chunk_q, st, stop)) is not _DONE:
+            _put(embed_q, (batch, embed(batch)), st, stop)
+            st.items += 1
+        _put(embed_q, _DONE, st, stop)
+        mark("EMBEDDING_END")
+
+    def writer(st: StageStats):
+        mark("PERSIST_IN_DB_START")
+        while (item := _get(embed_q, st, stop)) is not _DONE:
+            batch, embeddings = item
+            persist(batch, embeddings)
+            st.items += 1
+        mark("PERSIST_IN_DB_END")
+
+    threads = [run_stage("chunking", reader), run_stage("embedding", encoder), run_stage("persist", writer)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    if errors:
+        raise errors[0]
+
+    for st in stats.values():
+        logger.info(f"Stage {st.name}: {st.items} Batches, busy {st.busy_s:.2f}s, idle {st.idle_s:.2f}s.")
+        mark("PIPELINE_STAGE", stage=st.name, batches=st.items,
+             busy_s=f"{st.busy_s:.3f}", idle_s=f"{st.idle_s:.3f}")
+    return stats
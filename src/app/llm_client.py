@@ -1,6 +1,25 @@
+import json
+import logging
 import requests
+import threading
+from requests.adapters import HTTPAdapter
+from time import perf_counter
+from typing import Any, Iterator
+from urllib3.util.retry import Retry
 
 from app.config import Config
+from app.generation_cache import GenerationCache, generation_key
+from app.time_marker import mark
+
+logger = logging.getLogger(__name__)
+
+
+def _keep_alive(value: str) -> str | int:
+    # Ollama erwartet Dauer als String ("5m") oder Sekunden als Zahl (-1 = Modell nie entladen)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
 
 
 class OllamaClient:
@@ -9,22 +28,182 @@ class OllamaClient:
         self.model = cfg.llm_model
         self.temperature = cfg.temperature
         self.max_tokens = cfg.max_tokens
+        self.keep_alive = _keep_alive(cfg.llm_keep_alive)
+        self.timeout = (cfg.llm_connect_timeout, cfg.llm_read_timeout)
 
-    def generate(self, prompt: str) -> str:
-        resp = requests.post(
-            f"{self.host}/api/generate",
-            json={
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": self.temperature,
-                    "num_predict": self.max_tokens,
-                },
-            },
-            timeout=120,
+        # Persistente Session: TCP Verbindungen werden wiederverwendet, transiente Fehler (Verbindung, 502-504)
+        # werden mit exponentiellem Backoff wiederholt
+        retry = Retry(
+            total=cfg.llm_retries,
+            connect=cfg.llm_retries,
+            read=0,
+            status=cfg.llm_retries,
+            backoff_factor=cfg.llm_retry_backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
         )
-        resp.raise_for_status()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=cfg.llm_pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._errors = 0
+        self._latency_s_total = 0.0
+        self._load_s_total = 0.0
+        self._eval_count_total = 0
+
+        # Antworten nur cachen, wenn die Generierung deterministisch ist
+        self.cache: GenerationCache | None = None
+        if cfg.generation_cache:
+            if cfg.temperature == 0:
+                self.cache = GenerationCache(cfg.generation_cache_path, int(cfg.generation_cache_max_mb * 2 ** 20))
+            else:
+                logger.warning(f"Generation Cache nur bei temperature 0 aktiv (temperature={cfg.temperature}).")
+
+    def _options(self) -> dict[str, Any]:
+        return {
+            "temperature": self.temperature,
+            "num_predict": self.max_tokens,
+        }
+
+    def _payload(self, prompt: str, stream: bool) -> dict[str, Any]:
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": self._options(),
+        }
+
+    def _cache_get(self, prompt: str) -> tuple[str | None, tuple[str, dict[str, Any]] | None]:
+        """
+        :return: (Cache Key, (Antwort, Zähler) bei einem Treffer) bzw. (None, None) ohne Generation Cache
+        """
+        if self.cache is None:
+            return None, None
+        t = perf_counter()
+        key = generation_key(self.model, prompt, self._options())
+        cached = self.cache.get(key)
+        mark("GENERATION_CACHE", hit=int(cached is not None), lookup_ms=f"{1000 * (perf_counter() - t):.2f}")
+        return key, cached
+
+    @staticmethod
+    def _counters(data: dict[str, Any]) -> dict[str, Any]:
+        return {k: v for k, v in data.items() if k.endswith(("_count", "_duration"))}
+
+    def _post(self, prompt: str, stream: bool) -> requests.Response:
+        try:
+            resp = self.session.post(
+                f"{self.host}/api/generate",
+                json=self._payload(prompt, stream=stream),
+                timeout=self.timeout,
+                stream=stream,
+            )
+            resp.raise_for_status()
+            return resp
+        except requests.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def _record(self, latency_s: float, data: dict[str, Any]) -> None:
+        """
+        Metriken eines LLM Aufrufs: Gesamtlatenz (Client) und Zähler aus der Antwort von Ollama (Dauern in ns).
+        """
+        load_s = data.get("load_duration", 0) / 1e9
+        eval_count = int(data.get("eval_count", 0))
+        eval_s = data.get("eval_duration", 0) / 1e9
+        with self._lock:
+            self._calls += 1
+            self._latency_s_total += latency_s
+            self._load_s_total += load_s
+            self._eval_count_total += eval_count
+
+        mark("LLM_CALL",
+             latency_ms=f"{1000 * latency_s:.1f}",
+             load_ms=f"{1000 * load_s:.1f}",
+             prompt_eval_count=int(data.get("prompt_eval_count", 0)),
+             eval_count=eval_count,
+             eval_ms=f"{1000 * eval_s:.1f}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            out = {
+                "calls": self._calls,
+                "errors": self._errors,
+                "latency_avg_ms": round(1000 * self._latency_s_total / self._calls, 3) if self._calls else 0.0,
+                "load_total_ms": round(1000 * self._load_s_total, 3),
+                "eval_count_total": self._eval_count_total,
+            }
+        if self.cache is not None:
+            out["generation_cache"] = self.cache.stats()
+        return out
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.close()
+
+    def generate(self, prompt: str, stats: dict[str, Any] | None = None) -> str:
+        """
+        :param prompt: Vollständiger Prompt
+        :param stats: Wird mit den Zählern aus der Antwort von Ollama befüllt (prompt_eval_count, eval_count, ...) und
+            "cached" (Antwort aus dem Generation Cache)
+        :return: Antwort der LLM
+        """
+        key, cached = self._cache_get(prompt)
+        if cached is not None:
+            if stats is not None:
+                stats.update(cached[1], cached=True)
+            return cached[0].strip()
+
+        t = perf_counter()
+        resp = self._post(prompt, stream=False)
         data = resp.json()
+        self._record(perf_counter() - t, data)
         answer = data.get("response", "")
+        if key is not None:
+            self.cache.put(key, answer, self._counters(data))
+        if stats is not None:
+            stats.update(self._counters(data), cached=False)
         return answer.strip()
+
+    def generate_stream(self, prompt: str, stats: dict[str, Any] | None = None) -> Iterator[str]:
+        """
+        Streaming Generierung, Ollama sendet die Antwort als NDJSON (ein JSON Objekt pro Token).
+        :param prompt: Vollständiger Prompt
+        :param stats: Wird mit den Zählern der letzten Nachricht von Ollama befüllt (eval_count, eval_duration, ...) und
+            "cached" (Antwort aus dem Generation Cache, wird dann als ein einziges Token geliefert)
+        :return: Generator über die Tokens der Antwort
+        """
+        key, cached = self._cache_get(prompt)
+        if cached is not None:
+            if stats is not None:
+                stats.update(cached[1], cached=True)
+            yield cached[0]
+            return
+
+        t = perf_counter()
+        tokens: list[str] = []
+        with self._post(prompt, stream=True) as resp:
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama Fehler: {chunk['error']}")
+
+                token = chunk.get("response", "")
+                if token:
+                    tokens.append(token)
+                    yield token
+
+                if chunk.get("done"):
+                    self._record(perf_counter() - t, chunk)
+                    if key is not None:
+                        self.cache.put(key, "".join(tokens), self._counters(chunk))
+                    if stats is not None:
+                        stats.update(self._counters(chunk), cached=False)
+                    # Kein break: Response vollständig lesen, damit die Verbindung in den Pool zurückgeht
@@ -1,7 +1,13 @@
+from time import perf_counter
+from typing import Any, Iterator
+
+from app.answer_cache import AnswerCache
 from app.config import Config, load_config
-from app.retrieval import retrieve
+from app.context_assembly import TokenCounter, assemble_context
+from app.retrieval import embed_questions, retrieve, retrieve_many
 from app.llm_client import OllamaClient
 from app.prompt_template import BASE_PROMPT
+from app.time_marker import mark
 
 
 class RagPipeline:
@@ -10,18 +16,175 @@ class RagPipeline:
             cfg = load_config()
         self.cfg = cfg
         self.llm = OllamaClient(cfg)
+        self.cache = AnswerCache(cfg) if cfg.answer_cache else None
+        self.tokens = TokenCounter(cfg) if cfg.context_assembly else None
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.save()
+        self.llm.close()
 
     def answer(self, q_id: str, question: str) -> dict:
+        if self.cache is not None:
+            return self.answer_many([(q_id, question)])[0]
+
         docs, metas = retrieve(self.cfg, question)
-        context = "\n\n".join(docs)
+        return self._generate(q_id, question, docs, metas)
+
+    def answer_many(self, items: list[tuple[str, str]]) -> list[dict]:
+        """
+        Beantwortet mehrere Fragen; Embedding und Vektorsuche laufen gemeinsam für alle Fragen (retrieve_many), die
+        Generierung danach pro Frage. Mit Answer Cache werden Retrieval und Generierung nur für Cache misses ausgeführt.
+        :param items: (q_id, question) pro Frage
+        :return: Ergebnis pro Frage, wie answer()
+        """
+        questions = [question for _, question in items]
+        if self.cache is None:
+            retrieved = retrieve_many(self.cfg, questions)
+            return [
+                self._generate(q_id, question, docs, metas)
+                for (q_id, question), (docs, metas) in zip(items, retrieved)
+            ]
+
+        embs = embed_questions(self.cfg, questions)
+        results: list[dict | None] = [self._cache_lookup(q_id, question, emb)
+                                      for (q_id, question), emb in zip(items, embs)]
+
+        misses = [i for i, r in enumerate(results) if r is None]
+        if misses:
+            retrieved = retrieve_many(self.cfg, [questions[i] for i in misses], embs[misses])
+            for i, (docs, metas) in zip(misses, retrieved):
+                q_id, question = items[i]
+                result = self._generate(q_id, question, docs, metas)
+                self.cache.add(question, embs[i], result)
+                result["cached"] = False
+                results[i] = result
+
+        return results
 
-        prompt = BASE_PROMPT.format(context=context, question=question)
-        answer = self.llm.generate(prompt)
+    def _cache_lookup(self, q_id: str, question: str, emb) -> dict | None:
+        result, similarity = self.cache.lookup(question, emb)
+        mark("ANSWER_CACHE", q_id=q_id, hit=int(result is not None), similarity=f"{similarity:.4f}")
+        if result is None:
+            return None
 
-        return {
+        result["cached_question"] = result["question"]
+        result.update({"q_id": q_id, "question": question, "cached": True})
+        return result
+
+    def _build_prompt(self, q_id: str, question: str, docs: list[str], metas: list[dict],
+                      ) -> tuple[str, list[str], list[dict], dict | None]:
+        """
+        Prompt aus Frage und Kontext; mit context_assembly werden die Segmente vorher zusammengefasst und in das
+        Token-Budget gepackt. Prompt-Tokens vor und nach der Context Assembly werden als mark() Event ausgegeben.
+        :return: Prompt, Segmente und Metadaten im Prompt, Statistiken der Context Assembly (oder None)
+        """
+        if self.tokens is None:
+            return BASE_PROMPT.format(context="\n\n".join(docs), question=question), docs, metas, None
+
+        t = perf_counter()
+        docs, metas, stats = assemble_context(docs, metas, self.tokens, self.cfg.context_max_tokens)
+        prompt = BASE_PROMPT.format(context="\n\n".join(docs), question=question)
+        template_tokens = self.tokens.count(BASE_PROMPT.format(context="", question=question))
+        stats["prompt_tokens_before"] = template_tokens + stats["tokens_before"]
+        stats["prompt_tokens_after"] = template_tokens + stats["tokens_after"]
+        mark("CONTEXT_ASSEMBLY", q_id=q_id, chunks=stats["chunks"], blocks=stats["blocks"], kept=len(docs),
+             duplicates=stats["duplicates"], truncated=stats["truncated"],
+             prompt_tokens_before=stats["prompt_tokens_before"], prompt_tokens_after=stats["prompt_tokens_after"],
+             assembly_ms=f"{1000 * (perf_counter() - t):.2f}")
+        return prompt, docs, metas, stats
+
+    def _generate(self, q_id: str, question: str, docs: list[str], metas: list[dict]) -> dict:
+        prompt, docs, metas, assembly = self._build_prompt(q_id, question, docs, metas)
+        llm_stats: dict[str, Any] = {}
+        answer = self.llm.generate(prompt, llm_stats)
+        if self.tokens is not None:
+            self.tokens.observe(len(prompt), llm_stats.get("prompt_eval_count"))
+
+        result = {
             "q_id": q_id,
             "question": question,
             "answer": answer,
             "context": docs,
             "context_meta": metas,
         }
+        if assembly is not None:
+            result["context_assembly"] = assembly
+        if self.llm.cache is not None:
+            result["generation_cached"] = bool(llm_stats.get("cached"))
+        return result
+
+    def answer_stream(self, q_id: str, question: str) -> Iterator[tuple[str, Any]]:
+        """
+        Streaming Variante von answer(): zuerst der Kontext, danach die Tokens der Antwort sobald die LLM sie erzeugt.
+        Time-to-first-token (ab Beginn des Requests) und Tokens/s werden als mark() Events ausgegeben.
+        :return: Generator über (event, data) mit event "context", "token" und zuletzt "done"
+        """
+        t_start = perf_counter()
+        mark("FIRST_TOKEN_START", q_id=q_id)
+
+        emb = None
+        if self.cache is not None:
+            emb = embed_questions(self.cfg, [question])
+            cached = self._cache_lookup(q_id, question, emb[0])
+            if cached is not None:
+                yield "context", {k: cached[k] for k in ("q_id", "question", "context", "context_meta")}
+                mark("FIRST_TOKEN_END", q_id=q_id, ttft_ms=f"{1000 * (perf_counter() - t_start):.1f}")
+                yield "token", cached["answer"]
+                yield "done", {"q_id": q_id, "answer": cached["answer"], "cached": True}
+                return
+
+        docs, metas = retrieve_many(self.cfg, [question], emb)[0]
+        prompt, docs, metas, assembly = self._build_prompt(q_id, question, docs, metas)
+        context_event = {
+            "q_id": q_id,
+            "question": question,
+            "context": docs,
+            "context_meta": metas,
+        }
+        if assembly is not None:
+            context_event["context_assembly"] = assembly
+        yield "context", context_event
+
+        stats: dict[str, Any] = {}
+        tokens: list[str] = []
+        ttft_ms = 0.0
+        t_gen = perf_counter()
+        mark("GENERATION_START", q_id=q_id)
+        for token in self.llm.generate_stream(prompt, stats):
+            if not tokens:
+                ttft_ms = 1000 * (perf_counter() - t_start)
+                mark("FIRST_TOKEN_END", q_id=q_id, ttft_ms=f"{ttft_ms:.1f}")
+            tokens.append(token)
+            yield "token", token
+        gen_s = perf_counter() - t_gen
+
+        # Tokens/s bevorzugt aus den Zählern von Ollama (reine Decode-Zeit), sonst aus der Anzahl Stream-Nachrichten
+        n_tokens = int(stats.get("eval_count", len(tokens)))
+        eval_s = stats["eval_duration"] / 1e9 if stats.get("eval_duration") else gen_s
+        tokens_per_s = n_tokens / eval_s if eval_s > 0 else 0.0
+        mark("GENERATION_END", q_id=q_id, tokens=n_tokens, tokens_per_s=f"{tokens_per_s:.2f}",
+             cached=int(bool(stats.get("cached"))))
+        if self.tokens is not None:
+            self.tokens.observe(len(prompt), stats.get("prompt_eval_count"))
+
+        answer = "".join(tokens).strip()
+        if self.cache is not None:
+            self.cache.add(question, emb[0], {
+                "q_id": q_id,
+                "question": question,
+                "answer": answer,
+                "context": docs,
+                "context_meta": metas,
+            })
+
+        done = {
+            "q_id": q_id,
+            "answer": answer,
+            "tokens": n_tokens,
+            "ttft_ms": round(ttft_ms, 1),
+            "tokens_per_s": round(tokens_per_s, 2),
+        }
+        if self.llm.cache is not None:
+            done["generation_cached"] = bool(stats.get("cached"))
+        yield "done", done
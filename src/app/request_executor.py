@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any, AsyncIterator, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass
+class _Ticket:
+    """
+    Zugelassener Request; started und cancelled werden unter dem Lock des Executors gesetzt, damit ein abgebrochener
+    Request genau einmal aus der Queue gezählt wird.
+    """
+    submitted: float
+    started: bool = False
+    cancelled: bool = False
+
+
+class RequestExecutor:
+    """
+    Führt die blockierende RAG Pipeline (Embedding, Chroma, Dateien, Ollama) in einem begrenzten Thread Pool aus,
+    damit der Event Loop der API frei bleibt. Maximal workers Requests laufen gleichzeitig, weitere warten in der
+    Queue; ist die Queue voll (max_queue > 0), wird der Request abgelehnt.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rag-worker")
+        self._lock = threading.Lock()
+
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_s_total = 0.0
+        self._wait_s_max = 0.0
+        self._run_s_total = 0.0
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        ticket = self._admit()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, self._task(ticket, func, *args))
+        finally:
+            # Abbruch (z.B. Client getrennt), bevor der Request im Pool gestartet wurde
+            self._release(ticket)
+
+    async def stream(self, func: Callable[..., Iterator[Any]], *args: Any) -> AsyncIterator[Any]:
+        """
+        Wie run für Generatoren (Streaming): der Generator läuft für die gesamte Dauer des Streams in einem Worker des
+        Pools und belegt so einen Slot, die Elemente werden an den Event Loop übergeben. Eine volle Queue wirft
+        QueueFullError beim ersten Element. Wird der Stream vorzeitig geschlossen (Client getrennt), beendet der Worker
+        den Generator beim nächsten Element.
+        """
+        ticket = self._admit()
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce() -> None:
+            try:
+                with closing(func(*args)) as gen:
+                    for item in gen:
+                        if stop.is_set():
+                            break
+                        loop.call_soon_threadsafe(items.put_nowait, (False, item))
+            finally:
+                loop.call_soon_threadsafe(items.put_nowait, (True, None))
+
+        future = loop.run_in_executor(self._pool, self._task(ticket, produce))
+        # Exception nach vorzeitigem Schließen nicht als "never retrieved" melden
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            while True:
+                finished, item = await items.get()
+                if finished:
+                    break
+                yield item
+            await future
+        finally:
+            stop.set()
+            self._release(ticket)
+
+    def _admit(self) -> "_Ticket":
+        with self._lock:
+            if 0 < self.max_queue <= self._queued:
+                self._rejected += 1
+                raise QueueFullError(f"Request Queue voll ({self._queued} wartende Requests).")
+            self._queued += 1
+        return _Ticket(perf_counter())
+
+    def _release(self, ticket: "_Ticket") -> None:
+        with self._lock:
+            if not ticket.started and not ticket.cancelled:
+                ticket.cancelled = True
+                self._queued -= 1
+
+    def _task(self, ticket: "_Ticket", func: Callable[..., Any], *args: Any) -> Callable[[], Any]:
+        def task():
+            started = perf_counter()
+            wait_s = started - ticket.submitted
+            with self._lock:
+                if ticket.cancelled:
+                    return None
+                ticket.started = True
+                self._queued -= 1
+                self._running += 1
+                self._wait_s_total += wait_s
+                self._wait_s_max = max(self._wait_s_max, wait_s)
+
+            ok = False
+            try:
+                result = func(*args)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._run_s_total += perf_counter() - started
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+        return task
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            done = self._completed + self._failed
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "queue_wait_avg_ms": round(1000 * self._wait_s_total / done, 3) if done else 0.0,
+                "queue_wait_max_ms": round(1000 * self._wait_s_max, 3),
+                "run_avg_ms": round(1000 * self._run_s_total / done, 3) if done else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        logger.info(f"Request Executor beendet: {self.metrics()}")
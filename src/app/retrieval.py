@@ -1,46 +1,213 @@
-import chromadb
 import logging
+import numpy as np
 import re
+import threading
 
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
 from pathlib import Path
 from rank_bm25 import BM25Okapi
-from typing import Any
+from time import perf_counter
+from typing import Any, Iterator
 
+from app.bm25_index import Bm25Index
+from app.chunk_store import ChunkStore
 from app.config import Config, load_config
 from app.embedding import get_embed_model
+from app.embedding_cache import QueryEmbeddingCache
+from app.index_manifest import GenerationWatcher
+from app.time_marker import mark
+from app.vector_store import VectorStore, open_vector_store
 
 logger = logging.getLogger(__name__)
 TOK = re.compile(r"\w+", re.UNICODE)
 
 
-def get_collection(cfg: Config | None = None):
+@dataclass
+class _IndexState:
+    """
+    Geöffneter Index einer Generation. users zählt die laufenden Requests; nach einem Wechsel der Generation wird der
+    alte Stand erst geschlossen, wenn der letzte Request ihn freigegeben hat.
+    """
+    collection: VectorStore
+    store: ChunkStore | None
+    bm25: Bm25Index | None
+    generation: str | None
+    users: int = 0
+    retired: bool = False
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+        self.collection.close()
+
+
+class _IndexHandle:
+    """
+    Prozessweiter, lazy geöffneter Zugriff auf Vector Store (Collection), Chunk Store und BM25 Index, wird von allen Requests
+    geteilt.
+    Mit index_auto_reload wird bei jedem Zugriff die Generation des Index geprüft (gecacht über mtime der Datei) und
+    nach einem neuen Indexing (in einem anderen Prozess) neu geöffnet. Requests, die noch auf dem alten Stand laufen,
+    behalten ihn bis zum Ende (siehe acquire).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: _IndexState | None = None
+        self._watcher: GenerationWatcher | None = None
+
+    def _generation(self, cfg: Config) -> str | None:
+        if self._watcher is None or self._watcher.path.parent != Path(cfg.index_dir):
+            self._watcher = GenerationWatcher(cfg.index_dir)
+        return self._watcher.current()
+
+    def _open(self, cfg: Config) -> _IndexState:
+        generation = self._generation(cfg)
+        collection = open_vector_store(cfg, create=False)
+        store, bm25 = None, None
+        if cfg.chunk_store:
+            store = ChunkStore.open(cfg.index_dir)
+            if store is None:
+                logger.warning(f"Kein Chunk Store in {cfg.index_dir} gefunden, Chunks werden aus den Dokumenten "
+                               f"geladen.")
+        if cfg.retrieval_mode == "hybrid" or cfg.post_bm25_rerank:
+            bm25 = Bm25Index.open(cfg.index_dir)
+            if bm25 is None:
+                logger.warning(f"Kein BM25 Index in {cfg.index_dir} gefunden (bm25_index beim Indexing aktivieren), "
+                               f"Retrieval läuft nur dense bzw. BM25 Re-Ranking über die Treffer.")
+        logger.info(f"Index geöffnet: {cfg.index_dir} (Generation {generation}).")
+        return _IndexState(collection, store, bm25, generation)
+
+    def _retire(self) -> None:
+        state, self._state = self._state, None
+        if state is None:
+            return
+        state.retired = True
+        state.collection.detach()
+        if state.users == 0:
+            state.close()
+
+    def _current(self, cfg: Config) -> _IndexState:
+        if (self._state is not None and cfg.index_auto_reload
+                and self._generation(cfg) != self._state.generation):
+            logger.info("Neue Index-Generation erkannt, Index wird neu geöffnet ...")
+            self._retire()
+        if self._state is None:
+            self._state = self._open(cfg)
+        return self._state
+
+    def open(self, cfg: Config) -> None:
+        with self._lock:
+            if self._state is not None:
+                return
+            # Noch kein (fertiger) Index vorhanden: nicht öffnen, sonst würde eine leere Collection ohne die
+            # Index-Parameter angelegt. Wird dann beim ersten Zugriff geöffnet.
+            if self._generation(cfg) is None:
+                logger.info(f"Noch kein Index in {cfg.index_dir}, wird beim ersten Zugriff geöffnet.")
+                return
+            self._state = self._open(cfg)
+
+    @contextmanager
+    def acquire(self, cfg: Config) -> Iterator[tuple[VectorStore, ChunkStore | None, Bm25Index | None]]:
+        """
+        (Collection, Chunk Store, BM25 Index) für die Dauer eines Requests. Der Stand bleibt geöffnet, bis alle
+        Requests, die ihn verwenden, fertig sind, auch wenn inzwischen eine neue Generation geöffnet wurde.
+        """
+        with self._lock:
+            state = self._current(cfg)
+            state.users += 1
+        try:
+            yield state.collection, state.store, state.bm25
+        finally:
+            with self._lock:
+                state.users -= 1
+                if state.retired and state.users == 0:
+                    state.close()
+
+    def get(self, cfg: Config):
+        """
+        Aktueller Stand ohne Referenz, nur für Zugriffe außerhalb laufender Requests (z.B. Warmup).
+        """
+        with self._lock:
+            state = self._current(cfg)
+            return state.collection, state.store, state.bm25
+
+    def close(self) -> None:
+        with self._lock:
+            self._retire()
+            logger.info("Index geschlossen.")
+
+
+_index = _IndexHandle()
+
+_query_cache: QueryEmbeddingCache | None = None
+_query_cache_lock = threading.Lock()
+
+
+def open_index(cfg: Config) -> None:
+    _index.open(cfg)
+
+
+def close_index() -> None:
+    _index.close()
+
+
+def get_chunk_store(cfg: Config) -> ChunkStore | None:
+    return _index.get(cfg)[1]
+
+
+def get_collection(cfg: Config | None = None) -> VectorStore:
     if cfg is None:
         cfg = load_config()
 
-    client = chromadb.PersistentClient(path=cfg.index_dir)
-    return client.get_or_create_collection("rag")
-
+    return _index.get(cfg)[0]
+
+
+@dataclass
+class _Hits:
+    """
+    Spaltenweise Darstellung der Treffer für das Post-Retrieval, Filter und Sortierung laufen vektorisiert über die
+    Arrays. scores: höher = besser (dense: 1 - Distanz, hybrid: RRF Score, nach Re-Ranking: BM25 Score).
+    """
+    ids: np.ndarray
+    metas: np.ndarray
+    dists: np.ndarray
+    scores: np.ndarray
+    block_types: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+
+    @classmethod
+    def build(cls, ids: list[str], metas: list[dict[str, Any]], dists, scores=None) -> "_Hits":
+        n = len(ids)
+        obj_ids = np.empty(n, dtype=object)
+        obj_ids[:] = ids
+        obj_metas = np.empty(n, dtype=object)
+        obj_metas[:] = metas
+        dists = np.asarray(dists, dtype=np.float32).reshape(n)
+        return cls(
+            ids=obj_ids,
+            metas=obj_metas,
+            dists=dists,
+            scores=1.0 - dists if scores is None else np.asarray(scores, dtype=np.float32).reshape(n),
+            block_types=np.array([str(m.get("block_type", "") or "").strip().lower() for m in metas], dtype=str),
+            starts=np.fromiter((int(m.get("chunk_start", 0)) for m in metas), dtype=np.int64, count=n),
+            ends=np.fromiter((int(m.get("chunk_end", 0)) for m in metas), dtype=np.int64, count=n),
+        )
 
-def _apply_metadata_filter(hits: list[dict[str, Any]]) -> list[dict[str, Any]]:
-    drop_types = {"title", "contents", "index", "doi", "pacs", "msc", "acknowledgments"}
-    min_span_chars = 20
+    def __len__(self) -> int:
+        return len(self.ids)
 
-    out: list[dict[str, Any]] = []
-    for h in hits:
-        m = h["meta"]
+    def take(self, idx: np.ndarray) -> "_Hits":
+        return _Hits(*(getattr(self, f.name)[idx] for f in fields(self)))
 
-        bt = str(m.get("block_type", "") or "").strip().lower()
-        if bt in drop_types:
-            continue
 
-        start = int(m.get("chunk_start", 0))
-        end = int(m.get("chunk_end", 0))
-        if end - start < min_span_chars:
-            continue
+_DROP_BLOCK_TYPES = np.array(["title", "contents", "index", "doi", "pacs", "msc", "acknowledgments"])
 
-        out.append(h)
 
-    return out
+def _metadata_filter_mask(hits: _Hits) -> np.ndarray:
+    min_span_chars = 20
+    return ~np.isin(hits.block_types, _DROP_BLOCK_TYPES) & (hits.ends - hits.starts >= min_span_chars)
 
 
 def _enhance_context(docs: list[str], metas: list[dict[str, Any]]) -> list[str]:
@@ -62,78 +229,123 @@ def _enhance_context(docs: list[str], metas: list[dict[str, Any]]) -> list[str]:
     return out
 
 
-def _bm25_rerank(question: str, docs: list[str], metas: list[dict[str, Any]]) -> tuple[list[str], list[dict[str, Any]]]:
+def _bm25_rerank(question: str, docs: list[str], ids: np.ndarray, bm25: Bm25Index | None = None,
+                 ) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    :return: (Neue Reihenfolge, BM25 Scores in ursprünglicher Reihenfolge) oder None, wenn die Frage keine Tokens hat
+    """
     def tok(s: str) -> list[str]:
         return TOK.findall((s or "").lower())
 
     tokenized_question = tok(question)
     if not tokenized_question:
-        return docs, metas
-
-    tokenized_docs = [tok(d) for d in docs]
-    bm25 = BM25Okapi(tokenized_docs)
-    scores = bm25.get_scores(tokenized_question)
-
-    # BM25: hoher score = besserer Match
-    order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
-    logger.info(f"Neue Reihenfolge der Textsegmente nach BM25 Re-Ranking: {order}.")
-    return [docs[i] for i in order], [metas[i] for i in order]
-
-
-def retrieve(cfg: Config, question: str):
-    collection = get_collection(cfg)
-
-    model = get_embed_model(cfg)
-    query_emb = model.encode(
-        [question],
-        batch_size=128,
-        convert_to_numpy=True,
-        normalize_embeddings=cfg.normalize_embeddings,
-    )
-
-    retrieval_result = collection.query(
-        query_embeddings=query_emb,
-        n_results=20,
-        include=["metadatas", "distances"],
-    )
-
-    metas = retrieval_result.get("metadatas", [[]])[0]
-    dists = retrieval_result.get("distances", [[]])[0]
-    hits = [{"meta": meta, "dist": float(dist)} for meta, dist in zip(metas, dists)]
+        return None
+
+    if bm25 is not None:
+        # Vorberechneter Index: IDF über den gesamten Korpus statt nur über die Treffer
+        scores = bm25.score(question, ids)
+    else:
+        tokenized_docs = [tok(d) for d in docs]
+        bm25_okapi = BM25Okapi(tokenized_docs)
+        scores = np.asarray(bm25_okapi.get_scores(tokenized_question))
+
+    # BM25: hoher score = besserer Match; stabil, gleiche Scores behalten die bisherige Reihenfolge
+    order = np.argsort(-scores, kind="stable")
+    logger.info(f"Neue Reihenfolge der Textsegmente nach BM25 Re-Ranking: {order.tolist()}.")
+    return order, scores
+
+
+def _hybrid_hits(cfg: Config, collection: VectorStore, bm25: Bm25Index, question: str, query_emb: np.ndarray,
+                 dense: _Hits) -> _Hits:
+    """
+    Hybrid Retrieval: BM25 Kandidaten aus dem korpusweiten Index werden mit den dense Kandidaten über Reciprocal Rank
+    Fusion (score = sum 1 / (rrf_k + rank)) kombiniert. Für reine BM25 Kandidaten werden Metadaten und Embeddings aus
+    der Collection geladen und die Cosinus-Distanz zur Frage berechnet, damit die Distanz-Filter weiter greifen.
+    :return: Treffer nach fusioniertem Score absteigend
+    """
+    bm25_ids, _ = bm25.search(question, cfg.bm25_candidates)
+
+    fused: dict[str, float] = {}
+    for ranked in (dense.ids.tolist(), bm25_ids):
+        for rank, chunk_id in enumerate(ranked, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (cfg.rrf_k + rank)
+
+    ids, metas, dists = dense.ids.tolist(), dense.metas.tolist(), dense.dists.tolist()
+    known = set(ids)
+    missing = [i for i in bm25_ids if i not in known]
+    if missing:
+        got = collection.get(ids=missing, include=["metadatas", "embeddings"])
+        embs = np.asarray(got["embeddings"], dtype=np.float32)
+        q = np.asarray(query_emb, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) or 1.0)
+        norms = np.linalg.norm(embs, axis=1)
+        norms[norms == 0] = 1.0
+        ids += list(got["ids"])
+        metas += list(got["metadatas"])
+        dists += (1.0 - (embs @ q) / norms).tolist()
+
+    hits = _Hits.build(ids, metas, dists, scores=[fused[i] for i in ids])
+    logger.info(f"Hybrid Retrieval: {len(dense)} dense und {len(bm25_ids)} BM25 Kandidaten, "
+                f"{len(hits)} nach Fusion.")
+    return hits.take(np.argsort(-hits.scores, kind="stable"))
+
+
+def _post_retrieve(cfg: Config, question: str, hits: _Hits, store: ChunkStore | None, bm25: Bm25Index | None = None):
+    """
+    Post-Retrieval für eine Frage: Filter, Laden der Dokumentsegmente, Re-Ranking und Metadata-Enhancement. Distanz
+    und finaler Score jedes Treffers werden in den Metadaten zurückgegeben (distance, score).
+    :param hits: Treffer der Vektorsuche für diese Frage
+    :return: Top-k Dokumentsegmente und deren Metadaten
+    """
+    timings: dict[str, float] = {}
+    n_candidates = len(hits)
+    t = perf_counter()
 
     chunking_is_structure = (cfg.chunking_strategy == "structure")
+    keep = np.ones(len(hits), dtype=bool)
     # OPTION 1) Metadaten Filter
     if cfg.metadata_filter and chunking_is_structure:
-        hits = _apply_metadata_filter(hits)
+        keep &= _metadata_filter_mask(hits)
 
     # OPTION 2) Filter über Distanz; nur wenn threshold eine gültige Zahl ist
     threshold = float(cfg.similarity_threshold)
     if 0.0 < threshold <= 2.0:
-        hits = [h for h in hits if h["dist"] <= threshold]
+        keep &= hits.dists <= threshold
+
+    hits = hits.take(np.flatnonzero(keep))
+    timings["filter"] = perf_counter() - t
 
     # Falls Filter alles herausfiltern
-    if not hits:
+    if not len(hits):
         return [], []
 
-    # Dokumentsegmente laden, werden für Re-Ranking und Metadata-Enhancement benötigt
+    # Dokumentsegmente laden, werden für Re-Ranking und Metadata-Enhancement benötigt. Aus dem Chunk Store (falls
+    # vorhanden), sonst aus den Dokumenten. Ohne Re-Ranking reichen die ersten top_k ladbaren Segmente.
+    t = perf_counter()
+    limit = len(hits) if cfg.post_bm25_rerank else cfg.top_k
     file_cache: dict[str, str] = {}
     docs: list[str] = []
-    out_metas: list[dict[str, Any]] = []
-
-    for rank, h in enumerate(hits, start=1):
-        meta = h["meta"]
-        dist = h["dist"]
+    spans: list[tuple[int, int]] = []
+    rows: list[int] = []
 
+    for rank in range(len(hits)):
+        if len(docs) >= limit:
+            break
+        meta = hits.metas[rank]
         src = meta.get("source")
-        start = int(meta.get("chunk_start", 0))
-        end = int(meta.get("chunk_end", 0))
+        start, end = int(hits.starts[rank]), int(hits.ends[rank])
 
         if not src or end <= start:
             continue
         try:
-            if src not in file_cache:
-                file_cache[src] = Path(src).read_text(encoding="utf-8", errors="ignore")
-            doc = file_cache[src][start:end].strip()
+            doc = store.get(hits.ids[rank]) if store is not None else None
+            if doc is None:
+                if src not in file_cache:
+                    file_cache[src] = Path(src).read_text(encoding="utf-8", errors="ignore")
+                doc = file_cache[src][start:end]
+            # Offsets des gestrippten Texts im Dokument, damit die Context Assembly exakt zusammenfassen kann
+            lead = len(doc) - len(doc.lstrip())
+            doc = doc.strip()
             if not doc:
                 continue
         except Exception as e:
@@ -141,28 +353,171 @@ def retrieve(cfg: Config, question: str):
             continue
 
         docs.append(doc)
-        out_metas.append(meta)
+        spans.append((start + lead, start + lead + len(doc)))
+        rows.append(rank)
 
         logger.debug(
-            f"hit#{rank}: "
+            f"hit#{rank + 1}: "
             f"source={meta.get('source')} "
             f"chunk={meta.get('chunk_index')} "
-            f"dist={dist:.4f}"
+            f"dist={hits.dists[rank]:.4f}"
         )
 
+    hits = hits.take(np.asarray(rows, dtype=np.int64))
+    timings["load"] = perf_counter() - t
+
     # Falls Dokumentsegmente nicht geladen werden können
     if not docs:
         return [], []
 
     # OPTION 3) BM25 Re-Ranking der Dokumente
+    t = perf_counter()
     if cfg.post_bm25_rerank:
-        docs, out_metas = _bm25_rerank(question, docs, out_metas)
+        reranked = _bm25_rerank(question, docs, hits.ids, bm25)
+        if reranked is not None:
+            order, hits.scores = reranked
+            hits = hits.take(order)
+            docs = [docs[i] for i in order]
+            spans = [spans[i] for i in order]
+    timings["rerank"] = perf_counter() - t
+
+    max_top_k = cfg.top_k
+    docs, hits = docs[:max_top_k], hits.take(np.arange(min(max_top_k, len(docs))))
+    out_metas = [
+        {**meta, "distance": float(dist), "score": float(score), "text_start": span[0], "text_end": span[1]}
+        for meta, dist, score, span in zip(hits.metas, hits.dists, hits.scores, spans)
+    ]
 
     # OPTION 4) Metadaten als Header der Dokumente hinzufügen
+    t = perf_counter()
     if cfg.metadata_enhancement and chunking_is_structure:
         docs = _enhance_context(docs, out_metas)
+    timings["enhance"] = perf_counter() - t
 
-    max_top_k = cfg.top_k
-    logger.info(f"Retriever hat {len(docs)} Textsegmente zurückgegeben.\n"
-                f"Top-k = {max_top_k if max_top_k < len(docs) else len(docs)} Textsegmente werden als Kontext verwendet.")
-    return docs[: max_top_k], out_metas[: max_top_k]
+    logger.info(f"Retriever hat {n_candidates} Kandidaten zurückgegeben.\n"
+                f"Top-k = {len(docs)} Textsegmente werden als Kontext verwendet.")
+    mark("POST_RETRIEVAL", candidates=n_candidates, kept=len(docs),
+         **{f"{stage}_ms": f"{1000 * sec:.3f}" for stage, sec in timings.items()})
+    return docs, out_metas
+
+
+def get_query_cache(cfg: Config) -> QueryEmbeddingCache | None:
+    global _query_cache
+    if not cfg.query_cache:
+        return None
+    with _query_cache_lock:
+        if _query_cache is None:
+            _query_cache = QueryEmbeddingCache(cfg)
+        return _query_cache
+
+
+def close_query_cache() -> None:
+    global _query_cache
+    with _query_cache_lock:
+        if _query_cache is not None:
+            _query_cache.save()
+            _query_cache = None
+
+
+def embed_questions(cfg: Config, questions: list[str]) -> np.ndarray:
+    """
+    Embeddings der Fragen, ein encode Aufruf für alle Fragen (bzw. alle Cache misses mit query_cache).
+    :return: Embeddings (float32) in derselben Reihenfolge wie questions
+    """
+    cache = get_query_cache(cfg)
+    if cache is not None:
+        return cache.encode(questions, lambda qs: _encode_questions(cfg, qs))
+    return _encode_questions(cfg, questions)
+
+
+def _encode_questions(cfg: Config, questions: list[str]) -> np.ndarray:
+    model = get_embed_model(cfg)
+    return model.encode(
+        questions,
+        batch_size=128,
+        convert_to_numpy=True,
+        normalize_embeddings=cfg.normalize_embeddings,
+    )
+
+
+def _where_filter(cfg: Config) -> dict[str, Any] | None:
+    # Block-Typ Ausschlüsse des Metadaten Filters direkt in Chroma anwenden, nur Chunks aus Structure-Chunking haben
+    # block_type Metadaten. Der Filter auf kurze Spans bleibt im Post-Retrieval.
+    if cfg.metadata_filter and cfg.filter_pushdown and cfg.chunking_strategy == "structure":
+        return {"block_type": {"$nin": _DROP_BLOCK_TYPES.tolist()}}
+    return None
+
+
+def retrieve_many(cfg: Config, questions: list[str], query_embs: np.ndarray | None = None,
+                  ) -> list[tuple[list[str], list[dict[str, Any]]]]:
+    """
+    Retrieval für mehrere Fragen: alle Fragen werden in einem encode Aufruf embedded und mit einer einzigen
+    Collection-Abfrage gesucht, das Post-Retrieval läuft danach pro Frage.
+    Der Kandidaten-Pool startet bei top_k * candidate_pool_factor; bleiben nach den Filtern weniger als top_k
+    Segmente übrig, werden diese Fragen mit doppeltem Pool (bis candidate_pool_max) erneut abgefragt.
+    :param cfg: Config
+    :param questions: Fragen
+    :param query_embs: Bereits berechnete Embeddings der Fragen (optional, z.B. vom Answer Cache)
+    :return: (Dokumentsegmente, Metadaten) pro Frage, in derselben Reihenfolge wie questions
+    """
+    if not questions:
+        return []
+
+    if query_embs is None:
+        query_embs = embed_questions(cfg, questions)
+    query_embs = np.asarray(query_embs)
+
+    with _index.acquire(cfg) as (collection, store, bm25):
+        return _retrieve_many(cfg, questions, query_embs, collection, store, bm25)
+
+
+def _retrieve_many(cfg: Config, questions: list[str], query_embs: np.ndarray, collection: VectorStore,
+                   store: ChunkStore | None, bm25: Bm25Index | None) -> list[tuple[list[str], list[dict[str, Any]]]]:
+    pool_max = max(cfg.top_k, cfg.candidate_pool_max)
+    pool = min(max(cfg.top_k, cfg.top_k * cfg.candidate_pool_factor), pool_max)
+    where = _where_filter(cfg)
+    threshold = float(cfg.similarity_threshold)
+
+    results: list[tuple[list[str], list[dict[str, Any]]]] = [([], [])] * len(questions)
+    pending = list(range(len(questions)))
+    rounds = 0
+    while pending:
+        rounds += 1
+        retrieval_result = collection.query(
+            query_embeddings=query_embs[pending],
+            n_results=pool,
+            where=where,
+            include=["metadatas", "distances"],
+        )
+
+        retry: list[int] = []
+        for row, q_no in enumerate(pending):
+            question = questions[q_no]
+            ids = retrieval_result["ids"][row]
+            metas = retrieval_result["metadatas"][row]
+            dists = retrieval_result["distances"][row]
+            hits = _Hits.build(ids, metas, dists)
+            if cfg.retrieval_mode == "hybrid" and bm25 is not None:
+                hits = _hybrid_hits(cfg, collection, bm25, question, query_embs[q_no], hits)
+            results[q_no] = _post_retrieve(cfg, question, hits, store, bm25)
+
+            # Nur erneut abfragen, wenn der Pool ausgeschöpft war (es also weitere Kandidaten geben kann) und nicht
+            # schon der letzte Kandidat über dem Distanz-Threshold liegt (weitere wären noch weiter entfernt)
+            n_docs = len(results[q_no][0])
+            beyond_threshold = 0.0 < threshold <= 2.0 and len(dists) > 0 and dists[-1] > threshold
+            if n_docs < cfg.top_k and len(ids) >= pool and pool < pool_max and not beyond_threshold:
+                retry.append(q_no)
+            else:
+                mark("RETRIEVAL_CANDIDATES", pool=pool, candidates=len(ids), kept=n_docs, rounds=rounds)
+
+        if retry:
+            logger.info(f"{len(retry)} Fragen mit weniger als top_k={cfg.top_k} Segmenten, Kandidaten-Pool wird von "
+                        f"{pool} auf {min(2 * pool, pool_max)} erhöht.")
+        pending = retry
+        pool = min(2 * pool, pool_max)
+
+    return results
+
+
+def retrieve(cfg: Config, question: str):
+    return retrieve_many(cfg, [question])[0]
@@ -0,0 +1,554 @@
+import chromadb
+import chromadb.errors
+import json
+import logging
+import numpy as np
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Sequence
+
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+NUMPY_STORE_DIR = "numpy_store"
+QUANTIZATIONS = ("none", "float16", "int8", "binary")
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    """
+    Anzahl gesetzter Bits pro Zeile (uint64 Wörter), np.bitwise_count ab NumPy 2.0, sonst über eine Lookup-Tabelle.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[words.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+class VectorStore(ABC):
+    """
+    Schnittstelle der Vektor-Datenbank, entspricht der von Indexing und Retrieval verwendeten Teilmenge der Chroma
+    Collection API (add, upsert, delete, query, get, count, peek). Distanzen sind Cosinus-Distanzen (1 - cos).
+    """
+
+    max_batch_size: int
+
+    @abstractmethod
+    def add(self, ids: list[str], embeddings, metadatas: list[dict[str, Any]]) -> None:
+        ...
+
+    @abstractmethod
+    def upsert(self, ids: list[str], embeddings, metadatas: list[dict[str, Any]]) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, ids: list[str]) -> None:
+        ...
+
+    @abstractmethod
+    def query(self, query_embeddings, n_results: int, where: dict[str, Any] | None = None,
+              include: Sequence[str] = ("metadatas", "distances")) -> dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def get(self, ids: list[str] | None = None, include: Sequence[str] = ("metadatas",), limit: int | None = None,
+            offset: int | None = None) -> dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def reset(self) -> None:
+        """
+        Löscht alle Einträge (z.B. wenn sich die Index-Parameter geändert haben).
+        """
+
+    def peek(self, limit: int = 10) -> dict[str, Any]:
+        return self.get(include=("metadatas",), limit=limit)
+
+    def detach(self) -> None:
+        """
+        Löst den Store von prozessweiten Caches, damit ein neu geöffneter Store den aktuellen Stand liest. Laufende
+        Abfragen auf diesem Store bleiben bis zum close() möglich.
+        """
+
+    def close(self) -> None:
+        pass
+
+
+def _chroma_metadata(cfg: Config) -> dict[str, Any]:
+    # Siehe https://cookbook.chromadb.dev/core/collections/ .
+    # Und https://cookbook.chromadb.dev/core/configuration/ für Details zu metadata
+    return {
+        "hnsw:space": "cosine",
+        "hnsw:num_threads": 5,
+        "hnsw:batch_size": 10_000,
+        "hnsw:sync_threshold": 200_000,
+        "ef_construction": cfg.hnsw_ef_construction,
+        "ef_search": cfg.hnsw_ef_search,
+        "max_neighbors": cfg.hnsw_max_neighbors,
+    }
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    Chroma PersistentClient mit Collection "rag" (HNSW Index, Metadaten in SQLite).
+    """
+
+    def __init__(self, cfg: Config, create: bool = True):
+        """
+        :param create: Collection mit den HNSW Parametern anlegen (Indexing); sonst wird nur geöffnet (Retrieval)
+        """
+        self._cfg = cfg
+        self._create = create
+        self._client = chromadb.PersistentClient(path=cfg.index_dir)
+        # Referenz auf das System (SQLite, HNSW Segmente) für close(), auch nachdem es aus dem Cache gelöst wurde
+        self._system = self._client._system
+        self._collection = self._open()
+        self.max_batch_size = self._client.get_max_batch_size() - 1
+
+    def _open(self):
+        if self._create:
+            return self._client.get_or_create_collection("rag", metadata=_chroma_metadata(self._cfg))
+        return self._client.get_or_create_collection("rag")
+
+    def add(self, ids, embeddings, metadatas):
+        self._collection.add(ids=ids, embeddings=embeddings, metadatas=metadatas)
+
+    def upsert(self, ids, embeddings, metadatas):
+        self._collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas)
+
+    def delete(self, ids):
+        self._collection.delete(ids=ids)
+
+    def query(self, query_embeddings, n_results, where=None, include=("metadatas", "distances")):
+        return self._collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where,
+                                      include=list(include))
+
+    def get(self, ids=None, include=("metadatas",), limit=None, offset=None):
+        return self._collection.get(ids=ids, include=list(include), limit=limit, offset=offset)
+
+    def count(self):
+        return self._collection.count()
+
+    def reset(self):
+        try:
+            self._client.delete_collection("rag")
+        except (ValueError, chromadb.errors.NotFoundError):
+            pass
+        self._collection = self._open()
+
+    def detach(self):
+        # Chroma cached das System pro Pfad, ohne clear würde ein neuer Client den alten Stand verwenden. Der Cache
+        # hält nur Referenzen, der bestehende Client bleibt nutzbar.
+        self._client.clear_system_cache()
+
+    def close(self):
+        # System stoppen, damit SQLite Verbindungen und HNSW Segmente sofort freigegeben werden und nicht erst per GC
+        self.detach()
+        self._system.stop()
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exakte Suche (flat) über eine Embedding-Matrix im Prozess, ohne SQLite und HNSW. Gespeichert in
+    index_dir/numpy_store:
+    - embeddings.f32: float32 Matrix (N x dim, append-only, wird per memmap gelesen)
+    - ids.txt / metadatas.jsonl: chunk id bzw. Metadaten (JSON) pro Zeile, Zeile i gehört zu Embedding i
+    - deleted.txt: gelöschte Zeilen, werden beim close() aus allen Dateien entfernt
+    - meta.json: Dimension der Embeddings
+    - quantized_{float16|int8|binary}.npz: quantisierte Kopie der normalisierten Embeddings (optional)
+
+    Mit Quantisierung läuft die Suche zuerst über die quantisierte Matrix im Speicher (float16: 2, int8: 1, binary:
+    1/8 Byte pro Dimension) und liefert top n * rescore Kandidaten, nur diese werden danach exakt mit float32
+    bewertet. Die float32 Matrix wird dabei nur für die Kandidaten gelesen.
+    """
+
+    max_batch_size = 10_000
+    _BLOCK_ROWS = 65_536
+    # Quantisierte Blöcke werden nach float32 konvertiert, kleine Blöcke bleiben dabei im Cache
+    _QUANTIZED_BLOCK_ROWS = 4_096
+
+    def __init__(self, index_dir: str, readonly: bool = False, quantization: str = "none", rescore: int = 4):
+        """
+        :param readonly: Nur lesen (Retrieval), beim close() wird dann nicht kompaktiert
+        :param quantization: none | float16 | int8 | binary
+        :param rescore: Faktor für die Anzahl Kandidaten der quantisierten Suche, die exakt neu bewertet werden
+        """
+        if quantization not in QUANTIZATIONS:
+            logger.error(f"Unbekannte Quantisierung: {quantization}")
+            raise ValueError()
+        self.store_dir = Path(index_dir) / NUMPY_STORE_DIR
+        self.readonly = readonly
+        self.quantization = quantization
+        self.rescore = max(1, rescore)
+        if not readonly:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def _path(self, name: str) -> Path:
+        return self.store_dir / name
+
+    def _load(self) -> None:
+        self.dim: int | None = None
+        if self._path("meta.json").exists():
+            self.dim = int(json.loads(self._path("meta.json").read_text(encoding="utf-8"))["dim"])
+
+        ids = self._path("ids.txt").read_text(encoding="utf-8").split("\n")[:-1] \
+            if self._path("ids.txt").exists() else []
+        metas = self._path("metadatas.jsonl").read_text(encoding="utf-8").split("\n")[:-1] \
+            if self._path("metadatas.jsonl").exists() else []
+        rows = min(len(ids), len(metas))
+        if self.dim and self._path("embeddings.f32").exists():
+            rows = min(rows, self._path("embeddings.f32").stat().st_size // (self.dim * 4))
+        else:
+            rows = 0
+
+        self._ids: list[str] = ids[:rows]
+        self._metas: list[dict[str, Any]] = [json.loads(m) for m in metas[:rows]]
+        self._rows: dict[str, int] = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+        self._deleted: set[int] = set()
+        if self._path("deleted.txt").exists():
+            self._deleted = {int(r) for r in self._path("deleted.txt").read_text(encoding="utf-8").split()}
+        for r in self._deleted:
+            if r < rows and self._rows.get(self._ids[r]) == r:
+                del self._rows[self._ids[r]]
+        self._reset_views()
+
+    def _reset_views(self) -> None:
+        self._matrix: np.ndarray | None = None
+        self._norms: np.ndarray | None = None
+        self._masks: dict[str, np.ndarray] = {}
+        self._quantized: tuple[np.ndarray, np.ndarray | None] | None = None
+
+    def _embeddings(self) -> np.ndarray:
+        n = len(self._ids)
+        if self._matrix is None or self._matrix.shape[0] != n:
+            if n == 0:
+                self._matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+            else:
+                self._matrix = np.memmap(self._path("embeddings.f32"), dtype=np.float32, mode="r",
+                                         shape=(n, self.dim))
+            self._norms = None
+        return self._matrix
+
+    def _row_norms(self) -> np.ndarray:
+        if self._norms is None:
+            matrix = self._embeddings()
+            norms = np.empty(matrix.shape[0], dtype=np.float32)
+            for start in range(0, matrix.shape[0], self._BLOCK_ROWS):
+                norms[start:start + self._BLOCK_ROWS] = np.linalg.norm(matrix[start:start + self._BLOCK_ROWS], axis=1)
+            norms[norms == 0] = 1.0
+            self._norms = norms
+        return self._norms
+
+    def _quantized_path(self) -> Path:
+        return self._path(f"quantized_{self.quantization}.npz")
+
+    def _quantize(self) -> tuple[np.ndarray, np.ndarray | None]:
+        """
+        Quantisiert die normalisierten Embeddings blockweise.
+        :return: (quantisierte Matrix, Skalierung pro Dimension bei int8, sonst None)
+        """
+        matrix = self._embeddings()
+        n = matrix.shape[0]
+
+        def unit_blocks():
+            for start in range(0, n, self._BLOCK_ROWS):
+                block = np.asarray(matrix[start:start + self._BLOCK_ROWS], dtype=np.float32)
+                norms = np.linalg.norm(block, axis=1, keepdims=True)
+                yield start, block / np.maximum(norms, 1e-12)
+
+        if self.quantization == "float16":
+            out = np.empty((n, self.dim), dtype=np.float16)
+            for start, block in unit_blocks():
+                out[start:start + len(block)] = block
+            return out, None
+
+        if self.quantization == "int8":
+            # Symmetrische Skalierung pro Dimension (max. Betrag über den Korpus auf 127)
+            scale = np.zeros(self.dim, dtype=np.float32)
+            for _, block in unit_blocks():
+                np.maximum(scale, np.abs(block).max(axis=0), out=scale)
+            scale = np.maximum(scale, 1e-12) / 127.0
+            out = np.empty((n, self.dim), dtype=np.int8)
+            for start, block in unit_blocks():
+                out[start:start + len(block)] = np.clip(np.rint(block / scale), -127, 127)
+            return out, scale
+
+        # binary: ein Bit (Vorzeichen) pro Dimension, aufgefüllt auf 64 Bit Wörter
+        out = np.empty((n, (self.dim + 63) // 64), dtype=np.uint64)
+        for start, block in unit_blocks():
+            out[start:start + len(block)] = self._pack_bits(block)
+        return out, None
+
+    def _pack_bits(self, vectors: np.ndarray) -> np.ndarray:
+        words = (self.dim + 63) // 64
+        bits = np.zeros((len(vectors), words * 64), dtype=bool)
+        bits[:, :self.dim] = vectors > 0
+        return np.packbits(bits, axis=1).view(np.uint64)
+
+    def _quantized_matrix(self) -> tuple[np.ndarray, np.ndarray | None]:
+        if self._quantized is not None and self._quantized[0].shape[0] == len(self._ids):
+            return self._quantized
+
+        path = self._quantized_path()
+        if path.exists():
+            data = np.load(path)
+            if data["matrix"].shape[0] == len(self._ids):
+                self._quantized = data["matrix"], data["scale"] if self.quantization == "int8" else None
+                return self._quantized
+
+        logger.info(f"Keine aktuelle {self.quantization} Quantisierung in {self.store_dir}, wird berechnet ...")
+        self._quantized = self._quantize()
+        return self._quantized
+
+    def _write_quantized(self) -> None:
+        matrix, scale = self._quantize()
+        tmp = self._quantized_path().with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            np.savez(f, matrix=matrix, scale=scale if scale is not None else np.zeros(0, dtype=np.float32))
+        tmp.replace(self._quantized_path())
+        logger.info(f"Quantisierte Embeddings gespeichert: {self._quantized_path()} ({matrix.nbytes / 2 ** 20:.1f} "
+                    f"MiB statt {len(self._ids) * (self.dim or 0) * 4 / 2 ** 20:.1f} MiB float32).")
+
+    def _live_mask(self) -> np.ndarray:
+        mask = np.ones(len(self._ids), dtype=bool)
+        if self._deleted:
+            mask[np.fromiter(self._deleted, dtype=np.int64)] = False
+        return mask
+
+    def add(self, ids, embeddings, metadatas):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        # Wie Chroma: bereits vorhandene ids werden bei add ignoriert
+        if any(i in self._rows for i in ids):
+            keep = [n for n, i in enumerate(ids) if i not in self._rows]
+            ids, embeddings, metadatas = [ids[n] for n in keep], embeddings[keep], [metadatas[n] for n in keep]
+        if not ids:
+            return
+        if self.dim is None:
+            self.dim = int(embeddings.shape[1])
+            self._path("meta.json").write_text(json.dumps({"dim": self.dim}), encoding="utf-8")
+
+        # Erst Embeddings, dann Metadaten und ids; Zeilen zählen erst, wenn alle drei geschrieben sind
+        with self._path("embeddings.f32").open("ab") as f:
+            f.write(embeddings.tobytes())
+        with self._path("metadatas.jsonl").open("a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(m, ensure_ascii=False) + "\n" for m in metadatas))
+        with self._path("ids.txt").open("a", encoding="utf-8") as f:
+            f.write("".join(f"{i}\n" for i in ids))
+
+        for chunk_id, meta in zip(ids, metadatas):
+            self._rows[chunk_id] = len(self._ids)
+            self._ids.append(chunk_id)
+            self._metas.append(meta)
+        self._reset_views()
+
+    def upsert(self, ids, embeddings, metadatas):
+        self.delete([i for i in ids if i in self._rows])
+        self.add(ids, embeddings, metadatas)
+
+    def delete(self, ids):
+        rows = [self._rows.pop(i) for i in ids if i in self._rows]
+        if not rows:
+            return
+        self._deleted.update(rows)
+        with self._path("deleted.txt").open("a", encoding="utf-8") as f:
+            f.write("".join(f"{r}\n" for r in rows))
+        self._masks = {}
+
+    def _where_mask(self, where: dict[str, Any] | None) -> np.ndarray:
+        """
+        Unterstützt {key: value}, {key: {"$eq" | "$ne" | "$in" | "$nin": ...}} und {"$and": [...]}. Wie in Chroma
+        erfüllen Einträge ohne den key $eq/$in nicht, $ne/$nin dagegen schon. Die Maske wird pro Filter gecached.
+        """
+        if not where:
+            return self._live_mask()
+
+        cache_key = json.dumps(where, sort_keys=True)
+        if cache_key in self._masks:
+            return self._masks[cache_key]
+
+        def match(cond: dict[str, Any]) -> np.ndarray:
+            if "$and" in cond:
+                return np.logical_and.reduce([match(c) for c in cond["$and"]])
+            mask = np.ones(len(self._ids), dtype=bool)
+            for key, spec in cond.items():
+                op, value = next(iter(spec.items())) if isinstance(spec, dict) else ("$eq", spec)
+                values = set(value) if op in ("$in", "$nin") else {value}
+                missing = object()
+                col = [m.get(key, missing) for m in self._metas]
+                has = np.fromiter((v is not missing for v in col), dtype=bool, count=len(col))
+                hit = np.fromiter((v in values for v in col), dtype=bool, count=len(col))
+                if op in ("$eq", "$in"):
+                    mask &= has & hit
+                elif op in ("$ne", "$nin"):
+                    mask &= ~hit
+                else:
+                    raise ValueError(f"Nicht unterstützter where-Operator: {op}")
+            return mask
+
+        mask = match(where) & self._live_mask()
+        self._masks[cache_key] = mask
+        return mask
+
+    def _top_rows(self, block_dists, n_queries: int, mask: np.ndarray, n: int,
+                  block_rows: int = _BLOCK_ROWS) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Blockweise über alle Zeilen, pro Block nur die besten n Kandidaten behalten (begrenzter Speicher).
+        :param block_dists: (start, end) -> Distanzen (n_queries x Zeilen des Blocks)
+        :return: Zeilen und Distanzen der besten n Treffer pro Frage, aufsteigend nach Distanz
+        """
+        best_rows = np.zeros((n_queries, 0), dtype=np.int64)
+        best_dists = np.zeros((n_queries, 0), dtype=np.float32)
+        if n <= 0:
+            return best_rows, best_dists
+
+        for start in range(0, len(mask), block_rows):
+            end = min(start + block_rows, len(mask))
+            dists = block_dists(start, end)
+            dists[:, ~mask[start:end]] = np.inf
+            rows = np.broadcast_to(np.arange(start, end), dists.shape)
+
+            cand_dists = np.concatenate([best_dists, dists], axis=1)
+            cand_rows = np.concatenate([best_rows, rows], axis=1)
+            k = min(n, cand_dists.shape[1])
+            top = np.argpartition(cand_dists, k - 1, axis=1)[:, :k]
+            best_dists = np.take_along_axis(cand_dists, top, axis=1)
+            best_rows = np.take_along_axis(cand_rows, top, axis=1)
+
+        order = np.argsort(best_dists, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_dists, order, axis=1)
+
+    def _quantized_dists(self, queries: np.ndarray):
+        matrix, scale = self._quantized_matrix()
+        if self.quantization == "float16":
+            return lambda start, end: 1.0 - queries @ matrix[start:end].astype(np.float32).T
+        if self.quantization == "int8":
+            scaled = queries * scale
+            return lambda start, end: 1.0 - scaled @ matrix[start:end].astype(np.float32).T
+
+        # binary: Hamming-Distanz der Vorzeichen-Bits, normiert auf die Dimension
+        bits = self._pack_bits(queries)
+
+        def hamming(start: int, end: int) -> np.ndarray:
+            block = matrix[start:end]
+            return np.stack([_popcount(np.bitwise_xor(block, b)) for b in bits]).astype(np.float32) / self.dim
+        return hamming
+
+    def _rescore(self, queries: np.ndarray, candidates: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Exakte float32 Cosinus-Distanz für die Kandidaten der quantisierten Suche, liest nur deren Zeilen.
+        """
+        matrix = self._embeddings()
+        best_rows = np.empty((len(queries), n), dtype=np.int64)
+        best_dists = np.empty((len(queries), n), dtype=np.float32)
+        for q_no, (query, rows) in enumerate(zip(queries, candidates)):
+            rows = np.sort(rows)
+            vecs = np.asarray(matrix[rows])
+            dists = 1.0 - (vecs @ query) / np.maximum(np.linalg.norm(vecs, axis=1), 1e-12)
+            order = np.argsort(dists, kind="stable")[:n]
+            best_rows[q_no], best_dists[q_no] = rows[order], dists[order]
+        return best_rows, best_dists
+
+    def query(self, query_embeddings, n_results, where=None, include=("metadatas", "distances")):
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        matrix = self._embeddings()
+        mask = self._where_mask(where)
+        n_live = int(mask.sum())
+        n = min(n_results, n_live)
+
+        if self.quantization == "none" or n == 0:
+            norms = self._row_norms()
+            best_rows, best_dists = self._top_rows(
+                lambda start, end: 1.0 - (queries @ np.asarray(matrix[start:end]).T) / norms[start:end],
+                len(queries), mask, n)
+        else:
+            candidates, _ = self._top_rows(self._quantized_dists(queries), len(queries), mask,
+                                           min(n * self.rescore, n_live), self._QUANTIZED_BLOCK_ROWS)
+            best_rows, best_dists = self._rescore(queries, candidates, n)
+
+        result: dict[str, Any] = {"ids": [[self._ids[r] for r in rows] for rows in best_rows]}
+        if "metadatas" in include:
+            result["metadatas"] = [[self._metas[r] for r in rows] for rows in best_rows]
+        if "distances" in include:
+            result["distances"] = best_dists.tolist()
+        if "embeddings" in include:
+            result["embeddings"] = [np.asarray(matrix[rows]) for rows in best_rows]
+        return result
+
+    def get(self, ids=None, include=("metadatas",), limit=None, offset=None):
+        if ids is not None:
+            rows = [self._rows[i] for i in ids if i in self._rows]
+        else:
+            rows = np.flatnonzero(self._live_mask()).tolist()
+        rows = rows[offset or 0:]
+        if limit is not None:
+            rows = rows[:limit]
+
+        result: dict[str, Any] = {"ids": [self._ids[r] for r in rows]}
+        if "metadatas" in include:
+            result["metadatas"] = [self._metas[r] for r in rows]
+        if "embeddings" in include:
+            result["embeddings"] = np.asarray(self._embeddings()[rows]) if rows else np.zeros((0, self.dim or 0))
+        return result
+
+    def count(self):
+        return len(self._rows)
+
+    def reset(self):
+        shutil.rmtree(self.store_dir)
+        self.store_dir.mkdir(parents=True)
+        self._load()
+
+    def close(self):
+        if self.readonly:
+            return
+        if self._deleted:
+            self._compact()
+        if self.quantization != "none" and self._ids:
+            self._write_quantized()
+
+    def _compact(self) -> None:
+        # Gelöschte Zeilen entfernen: in ein temporäres Verzeichnis schreiben und austauschen
+        keep = np.flatnonzero(self._live_mask())
+        tmp_dir = self.store_dir.with_name(f"{NUMPY_STORE_DIR}.tmp")
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+        tmp_dir.mkdir()
+
+        matrix = self._embeddings()
+        with (tmp_dir / "embeddings.f32").open("wb") as f:
+            for start in range(0, len(keep), self._BLOCK_ROWS):
+                f.write(np.ascontiguousarray(matrix[keep[start:start + self._BLOCK_ROWS]]).tobytes())
+        (tmp_dir / "ids.txt").write_text("".join(f"{self._ids[r]}\n" for r in keep), encoding="utf-8")
+        (tmp_dir / "metadatas.jsonl").write_text(
+            "".join(json.dumps(self._metas[r], ensure_ascii=False) + "\n" for r in keep), encoding="utf-8")
+        shutil.copy(self._path("meta.json"), tmp_dir / "meta.json")
+
+        self._matrix = None
+        shutil.rmtree(self.store_dir)
+        tmp_dir.rename(self.store_dir)
+        logger.info(f"Numpy Vector Store kompaktiert: {len(self._ids) - len(keep)} gelöschte Einträge entfernt.")
+        self._load()
+
+
+def open_vector_store(cfg: Config, create: bool = True) -> VectorStore:
+    """
+    :param cfg: Config, vector_backend wählt die Implementierung
+    :param create: Für Indexing öffnen (Chroma: Collection mit HNSW Parametern anlegen) oder nur lesend (Retrieval)
+    """
+    if cfg.vector_backend == "chroma":
+        if cfg.vector_quantization != "none":
+            logger.warning("vector_quantization wird nur vom numpy Backend unterstützt, Chroma speichert float32.")
+        return ChromaVectorStore(cfg, create=create)
+    if cfg.vector_backend == "numpy":
+        return NumpyVectorStore(cfg.index_dir, readonly=not create, quantization=cfg.vector_quantization,
+                                rescore=cfg.quantization_rescore)
+
+    logger.error(f"Unbekanntes Vector Backend: {cfg.vector_backend}")
+    raise ValueError()
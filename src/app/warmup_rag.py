@@ -16,8 +16,8 @@ def main():
     # Collection öffnen (pre-loading)
     collection = get_collection(cfg)
     logger.debug(f"[WARMUP] Collection Größe: {collection.count()} Chunks.")
-    result_10 = collection.get(ids="10")
-    logger.debug(f"[WARMUP] Collection-Eintrag Metadata der ID #10:\n{result_10.get("metadatas", [[]])}")
+    result = collection.peek(limit=1)
+    logger.debug(f"[WARMUP] Collection-Eintrag Metadata:\n{result.get('metadatas', [[]])}")
 
     # Embedding Model vorladen und ein einfaches embedding ausführen
     model = get_embed_model(cfg)
@@ -0,0 +1,179 @@
+"""
+Benchmark der Structure-Chunking Implementierungen auf dem arXiv Datensatz.
+
+Vergleicht die vorherige, zeilenweise Implementierung (hier als _structure_chunk_legacy kopiert) mit der neuen
+Single-Pass Implementierung aus app.chunking: einmal als Offsets (_structure_spans) und einmal als einzelne Chunks
+mit Metadaten (_structure_chunk). Zusätzlich wird geprüft, ob alle Varianten identische Chunks erzeugen.
+
+Aufruf (im Container, aus /src):
+    python -m scripts.benchmark_chunking --repeat 3
+"""
+import argparse
+import re
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List
+
+from app.chunking import RawDocument, _read_document, _structure_chunk, _structure_spans
+from app.config import load_config
+
+_LEGACY_MARKER_RE = re.compile(r"^(#{1,6})\s+(.*)\s*$")
+
+
+def _structure_chunk_legacy(doc: RawDocument, chunk_size: int, chunk_overlap: int) -> List[RawDocument]:
+    from app.block_types import ALLOWED_BLOCK_TYPES, BLOCK_TYPES_ALIASES
+
+    text = doc.text
+    chunks: List[RawDocument] = []
+    chunk_index = 0
+
+    doc_title, first_non_empty = "", ""
+    for line in text.splitlines():
+        s = line.strip()
+        if not s:
+            continue
+        if not first_non_empty:
+            first_non_empty = s
+
+        m = _LEGACY_MARKER_RE.match(s)
+        if m and len(m.group(1)) == 1:
+            doc_title = (m.group(2).strip() or first_non_empty)
+            break
+
+    doc_title = doc_title or first_non_empty
+
+    block_start = 0
+    block_title = ""
+    block_type = "text"
+
+    def emit_chunk(chunk_text: str, start_abs: int, end_abs: int):
+        nonlocal chunk_index
+        meta = dict(doc.metadata)
+        meta["doc_title"] = doc_title
+        meta["block_title"] = block_title
+        meta["block_type"] = block_type
+        meta["chunk_index"] = chunk_index
+        meta["chunk_start"] = start_abs
+        meta["chunk_end"] = end_abs
+
+        chunks.append(RawDocument(text=chunk_text, metadata=meta))
+        chunk_index += 1
+
+    def finalize_block(block_end: int):
+        if block_end <= block_start:
+            return
+
+        block_text = text[block_start:block_end]
+        if not block_text.strip():
+            return
+
+        start = 0
+        while start < len(block_text):
+            end = min(start + chunk_size, len(block_text))
+            chunk_text = block_text[start:end]
+
+            if chunk_text.strip():
+                emit_chunk(chunk_text, block_start + start, block_start + end)
+
+            if end == len(block_text):
+                break
+
+            start = end - chunk_overlap if chunk_overlap > 0 else end
+
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        line_start = pos
+        line_end = pos + len(line)
+        pos = line_end
+
+        marker = _LEGACY_MARKER_RE.match(line.rstrip("\r\n"))
+        if not marker:
+            continue
+
+        finalize_block(line_start)
+
+        hashes = marker.group(1)
+        title = (marker.group(2).strip() or "")
+
+        block_title = title
+        if len(hashes) == 1:
+            block_type = "title"
+
+        elif len(hashes) == 6:
+            first = (title.split()[0] if title else "").lower()
+            first = first.strip(" \t\r\n()[]{}<>\"'“”‘’").rstrip(".,;:")
+            if (not first) or any(ch.isdigit() for ch in first):
+                block_type = "special"
+            else:
+                first = BLOCK_TYPES_ALIASES.get(first, first)
+                block_type = first if first in ALLOWED_BLOCK_TYPES else "special"
+
+        else:
+            block_type = "heading"
+
+        block_start = line_end
+
+    finalize_block(len(text))
+    return chunks
+
+
+def parse_args():
+    cfg = load_config()
+    p = argparse.ArgumentParser(description="Benchmark Structure-Chunking: vorherige vs. Single-Pass Implementierung.")
+    p.add_argument("-d", "--data-dir", default=cfg.data_dir, help="Verzeichnis mit den .txt Dokumenten.")
+    p.add_argument("-s", "--chunk-size", type=int, default=cfg.chunk_size, help="Chunk Größe (Zeichen).")
+    p.add_argument("-o", "--chunk-overlap", type=int, default=cfg.chunk_overlap, help="Chunk Overlap (Zeichen).")
+    p.add_argument("-r", "--repeat", type=int, default=3, help="Anzahl Wiederholungen, bester Lauf zählt.")
+    p.add_argument("-n", "--limit", type=int, default=0, help="Maximale Anzahl Dokumente (0 = alle).")
+    return p.parse_args()
+
+
+def run(name: str, func: Callable, docs: List[RawDocument], args) -> None:
+    best = float("inf")
+    n_chunks = 0
+    for _ in range(args.repeat):
+        t = time.perf_counter()
+        n_chunks = 0
+        for doc in docs:
+            n_chunks += len(func(doc, args.chunk_size, args.chunk_overlap))
+        best = min(best, time.perf_counter() - t)
+
+    # Speicher getrennt messen, tracemalloc verlangsamt die Ausführung
+    tracemalloc.start()
+    results = [func(doc, args.chunk_size, args.chunk_overlap) for doc in docs]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+
+    total_mb = sum(len(d.text) for d in docs) / 1e6
+    print(f"{name:<28} {best:8.3f}s  {len(docs) / best:10.1f} docs/s  {total_mb / best:8.1f} MB/s  "
+          f"{n_chunks:9d} chunks  peak {peak / 2 ** 20:8.1f} MiB")
+
+
+def main():
+    args = parse_args()
+
+    paths = sorted(p for p in Path(args.data_dir).rglob("*.txt") if p.is_file())
+    if args.limit > 0:
+        paths = paths[:args.limit]
+    docs = [d for d in (_read_document(p) for p in paths) if d is not None]
+    print(f"{len(docs)} Dokumente ({sum(len(d.text) for d in docs) / 1e6:.1f} M Zeichen), "
+          f"chunk_size={args.chunk_size}, chunk_overlap={args.chunk_overlap}, repeat={args.repeat}\n")
+
+    # Gleichheit der Chunks prüfen
+    mismatches = 0
+    for doc in docs:
+        legacy = [(c.text, c.metadata) for c in _structure_chunk_legacy(doc, args.chunk_size, args.chunk_overlap)]
+        new = [(c.text, c.metadata) for c in _structure_chunk(doc, args.chunk_size, args.chunk_overlap)]
+        if legacy != new:
+            mismatches += 1
+    print(f"Identische Chunks: {len(docs) - mismatches}/{len(docs)} Dokumente\n")
+
+    run("legacy (zeilenweise)", _structure_chunk_legacy, docs, args)
+    run("single-pass (Chunks)", _structure_chunk, docs, args)
+    run("single-pass (Offsets)", lambda d, s, o: _structure_spans(d, s, o).spans, docs, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark des Embedding Pools (app.embedding_pool) für das Indexing auf der CPU.
+
+Vergleicht ein Modell im Hauptprozess (PyTorch mit allen Kernen, wie bisher) mit Pools aus 1, 2, 4, ... Encoder
+Prozessen bis zur Anzahl der Kerne, jeweils mit Kerne / Prozesse Threads pro Prozess (oder --threads). Gemessen
+werden Durchsatz (Chunks/s), Speedup gegenüber dem Hauptprozess, Startzeit des Pools und die maximale Abweichung
+der Embeddings.
+Als Texte dienen die Chunks der Dokumente in data_dir (mit chunking_strategy, chunk_size, chunk_overlap).
+
+Aufruf (im Container, aus /src):
+    python -m scripts.benchmark_embedding_pool -n 5000
+    python -m scripts.benchmark_embedding_pool -w 1 2 4 8 --threads 1
+"""
+import argparse
+import dataclasses
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.chunking import _CHUNK_FUNCS, _read_document
+from app.config import Config, load_config
+from app.embedding_pool import EmbeddingPool
+
+
+def _cores() -> int:
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+
+def parse_args():
+    cfg = load_config()
+    cores = _cores()
+    workers = [w for w in (1, 2, 4, 8, 16, 32, 64) if w < cores] + [cores]
+    p = argparse.ArgumentParser(description="Benchmark Embedding Pool: Skalierung über die Anzahl Prozesse.")
+    p.add_argument("-n", "--num-chunks", type=int, default=5000, help="Anzahl Chunks.")
+    p.add_argument("-w", "--workers", nargs="+", type=int, default=workers, help="Anzahl Encoder Prozesse.")
+    p.add_argument("--threads", type=int, default=0, help="Threads pro Prozess, 0 = Kerne / Prozesse.")
+    p.add_argument("--batch-size", type=int, default=cfg.embedding_batch_size, help="Chunks pro Batch.")
+    p.add_argument("--repeat", type=int, default=2, help="Wiederholungen, gezählt wird die schnellste.")
+    return p.parse_args()
+
+
+def _load_chunks(cfg: Config, n: int) -> list[str]:
+    chunk_func = _CHUNK_FUNCS[cfg.chunking_strategy]
+    texts: list[str] = []
+    for path in sorted(Path(cfg.data_dir).rglob("*.txt")):
+        doc = _read_document(path)
+        if doc is None:
+            continue
+        texts.extend(c.text for c in chunk_func(doc, chunk_size=cfg.chunk_size, chunk_overlap=cfg.chunk_overlap))
+        if len(texts) >= n:
+            break
+    return texts[:n]
+
+
+def _timed(encode, texts: list[str], repeat: int) -> tuple[float, np.ndarray]:
+    best, emb = float("inf"), None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        emb = encode(texts)
+        best = min(best, time.perf_counter() - t)
+    return best, np.asarray(emb)
+
+
+def main():
+    args = parse_args()
+    cfg = dataclasses.replace(load_config(), embedding_device="cpu")
+    texts = _load_chunks(cfg, args.num_chunks)
+    if not texts:
+        print(f"Keine Chunks in {cfg.data_dir} gefunden.")
+        return
+    print(f"{len(texts)} Chunks ({cfg.chunking_strategy}, {cfg.chunk_size}), Modell {cfg.embedding_model} "
+          f"({cfg.embedding_backend}), {_cores()} Kerne\n")
+
+    import torch
+    from app.embedding import get_embed_model
+
+    torch.set_num_threads(_cores())
+    model = get_embed_model(cfg)
+
+    def encode_main(batch):
+        return model.encode(batch, batch_size=args.batch_size, convert_to_numpy=True,
+                            normalize_embeddings=cfg.normalize_embeddings, show_progress_bar=False)
+
+    encode_main(texts[:args.batch_size])  # Warmup
+    base_s, reference = _timed(encode_main, texts, args.repeat)
+
+    print(f"{'Modus':<16} {'Threads':>8} {'Start':>9} {'Zeit':>9} {'Chunks/s':>10} {'Speedup':>8} {'max. Abw.':>10}")
+    print(f"{'Hauptprozess':<16} {_cores():>8} {'-':>9} {base_s:8.2f}s {len(texts) / base_s:10.1f} {1.0:7.2f}x "
+          f"{0.0:10.2e}")
+
+    for workers in args.workers:
+        t = time.perf_counter()
+        with EmbeddingPool(cfg, workers, args.threads) as pool:
+            start_s = time.perf_counter() - t
+
+            def encode_pool(batch):
+                return pool.encode(batch, batch_size=args.batch_size,
+                                   normalize_embeddings=cfg.normalize_embeddings)
+
+            encode_pool(texts[:args.batch_size * workers])  # Warmup aller Worker
+            pool_s, emb = _timed(encode_pool, texts, args.repeat)
+            threads = pool.threads
+
+        diff = float(np.max(np.abs(emb - reference)))
+        print(f"{f'Pool {workers}':<16} {threads:>8} {start_s:8.2f}s {pool_s:8.2f}s {len(texts) / pool_s:10.1f} "
+              f"{base_s / pool_s:7.2f}x {diff:10.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmark der Vector Store Backends (app.vector_store): Chroma (HNSW) und NumPy (exakte Suche im Prozess), NumPy
+auch mit quantisierten Embeddings (numpy-float16, numpy-int8, numpy-binary; quantisierte Suche + float32 Rescoring).
+
+Pro Backend wird in einem eigenen Prozess ein Index in einem temporären Verzeichnis aufgebaut und abgefragt.
+Gemessen werden Build-Zeit, Latenz einzelner Abfragen (p50/p95), Durchsatz als Batch-Abfrage, recall@k gegenüber
+der exakten Suche, Peak RSS des abfragenden Prozesses, Größe der bei der Suche gescannten Matrix und Größe des Index auf der
+Platte.
+Als Daten dienen entweder die Embeddings des bestehenden Index (index_dir, --source index) oder zufällige,
+geclusterte Vektoren (--source random).
+
+Aufruf (im Container, aus /src):
+    python -m scripts.benchmark_vector_store --source random -n 100000 -q 200
+    python -m scripts.benchmark_vector_store --source index -b numpy numpy-int8 numpy-binary --rescore 8
+"""
+import argparse
+import dataclasses
+import multiprocessing
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from app.config import Config, load_config
+from app.vector_store import NumpyVectorStore, open_vector_store
+
+BACKENDS = ("chroma", "numpy", "numpy-float16", "numpy-int8", "numpy-binary")
+
+
+def parse_args():
+    cfg = load_config()
+    p = argparse.ArgumentParser(description="Benchmark Vector Store Backends: Build, Latenz, recall@k und RSS.")
+    p.add_argument("-b", "--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS, help="Backends.")
+    p.add_argument("--source", default="random", choices=("random", "index"),
+                   help="Zufällige Vektoren oder Embeddings des bestehenden Index (index_dir).")
+    p.add_argument("-n", "--num-vectors", type=int, default=50_000, help="Anzahl Vektoren (random).")
+    p.add_argument("-d", "--dim", type=int, default=384, help="Dimension der Vektoren (random).")
+    p.add_argument("-q", "--queries", type=int, default=200, help="Anzahl Abfragen.")
+    p.add_argument("-k", "--top-k", type=int, default=cfg.top_k, help="Anzahl Treffer pro Abfrage (recall@k).")
+    p.add_argument("--rescore", type=int, default=cfg.quantization_rescore,
+                   help="Faktor der exakt neu bewerteten Kandidaten bei quantisierter Suche.")
+    p.add_argument("--seed", type=int, default=0, help="Seed für Vektoren und Abfragen.")
+    return p.parse_args()
+
+
+def _random_vectors(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    # Geclustert statt gleichverteilt, ähnlicher zu echten Embeddings (bei Gleichverteilung ist HNSW trivial)
+    centers = rng.standard_normal((max(1, n // 500), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _index_vectors(cfg: Config) -> np.ndarray:
+    store = open_vector_store(cfg, create=False)
+    try:
+        parts, offset = [], 0
+        while True:
+            page = store.get(include=["embeddings"], limit=store.max_batch_size, offset=offset)
+            if not len(page["ids"]):
+                break
+            parts.append(np.asarray(page["embeddings"], dtype=np.float32))
+            offset += len(page["ids"])
+    finally:
+        store.close()
+    return np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+
+def _exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    sims = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ \
+           (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).T
+    return np.argsort(-sims, axis=1, kind="stable")[:, :k]
+
+
+def _peak_rss_mib() -> float:
+    # VmHWM gehört zum Adressraum des Prozesses; ru_maxrss würde beim spawn den Wert des Elternprozesses übernehmen
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _build_backend(cfg: Config, vectors_path: str) -> float:
+    vectors = np.load(vectors_path)
+    ids = [str(i) for i in range(len(vectors))]
+    metas = [{"row": i} for i in range(len(vectors))]
+
+    t = time.perf_counter()
+    store = open_vector_store(cfg)
+    for start in range(0, len(ids), store.max_batch_size):
+        end = start + store.max_batch_size
+        store.add(ids=ids[start:end], embeddings=vectors[start:end], metadatas=metas[start:end])
+    store.close()
+    return time.perf_counter() - t
+
+
+def _query_backend(cfg: Config, queries_path: str, k: int) -> dict:
+    """
+    Läuft in einem eigenen Prozess, damit der Peak RSS nur die Abfragen dieses Backends enthält.
+    """
+    queries = np.load(queries_path)
+    store = open_vector_store(cfg, create=False)
+    store.query(query_embeddings=queries[:1], n_results=k)  # Warmup (Laden des Index)
+
+    latencies = []
+    found = []
+    for q in queries:
+        t = time.perf_counter()
+        result = store.query(query_embeddings=q[None, :], n_results=k, include=["distances"])
+        latencies.append(time.perf_counter() - t)
+        found.append([int(i) for i in result["ids"][0]])
+
+    t = time.perf_counter()
+    store.query(query_embeddings=queries, n_results=k, include=["distances"])
+    batch_s = time.perf_counter() - t
+    if isinstance(store, NumpyVectorStore):
+        scan_bytes = store._quantized_matrix()[0].nbytes if store.quantization != "none" \
+            else store._embeddings().nbytes
+    else:
+        scan_bytes = float("nan")
+    store.close()
+
+    return {
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+        "batch_qps": len(queries) / batch_s,
+        "found": found,
+        "rss_mib": _peak_rss_mib(),
+        "scan_mib": scan_bytes / 2 ** 20,
+        "disk_mib": _dir_size(Path(cfg.index_dir)) / 2 ** 20,
+    }
+
+
+def main():
+    args = parse_args()
+    cfg = load_config()
+    rng = np.random.default_rng(args.seed)
+
+    if args.source == "index":
+        vectors = _index_vectors(cfg)
+        queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+        queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    else:
+        vectors = _random_vectors(args.num_vectors, args.dim, rng)
+        queries = _random_vectors(args.queries, args.dim, rng)
+    print(f"{len(vectors)} Vektoren (dim {vectors.shape[1]}, {args.source}), {len(queries)} Abfragen, "
+          f"k={args.top_k}\n")
+
+    truth = _exact_top_k(vectors, queries, args.top_k)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        np.save(Path(tmp) / "vectors.npy", vectors)
+        np.save(Path(tmp) / "queries.npy", queries)
+
+        print(f"{'Backend':<14} {'Build':>9} {'p50':>9} {'p95':>9} {'Batch':>11} {'recall@k':>9} "
+              f"{'Peak RSS':>11} {'Scan':>11} {'Disk':>11}")
+        for name in args.backends:
+            backend, _, quantization = name.partition("-")
+            run_cfg = dataclasses.replace(cfg, index_dir=str(Path(tmp) / name), vector_backend=backend,
+                                          vector_quantization=quantization or "none",
+                                          quantization_rescore=args.rescore)
+            # Eigene Prozesse (spawn) für Build und Abfragen, damit RSS und Chroma System Cache nicht geteilt werden
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                build_s = pool.submit(_build_backend, run_cfg, str(Path(tmp) / "vectors.npy")).result()
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                r = pool.submit(_query_backend, run_cfg, str(Path(tmp) / "queries.npy"), args.top_k).result()
+
+            recall = np.mean([len(set(f) & set(t.tolist())) / len(t) for f, t in zip(r["found"], truth)])
+            print(f"{name:<14} {build_s:8.2f}s {r['p50_ms']:7.2f}ms {r['p95_ms']:7.2f}ms "
+                  f"{r['batch_qps']:7.0f} q/s {recall:9.4f} {r['rss_mib']:7.0f} MiB {r['scan_mib']:7.1f} MiB "
+                  f"{r['disk_mib']:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,25 +6,39 @@ from urllib.request import Request, urlopen
 
 JSON_PATH = "./scripts/questions.json"
 API_URL = "http://127.0.0.1:8000/ask"
+API_BATCH_URL = "http://127.0.0.1:8000/ask_batch"
 PRINT = False   # os.getenv("RAG_PRINT_RESPONSES", "1") == "1"
+BATCH_SIZE = int(os.getenv("RAG_BATCH_SIZE", "0"))  # > 0: Fragen in Batches über /ask_batch stellen
 
 
-def post_question(question: str, q_id: str) -> str:
-    data = json.dumps({"q_id": q_id, "question": question}).encode("utf-8")
+def _post(url: str, payload, timeout: int) -> str:
+    data = json.dumps(payload).encode("utf-8")
     req = Request(
-        API_URL,
+        url,
         data,
         headers={"Content-Type": "application/json"},
         method="POST",
     )
-    with urlopen(req, timeout=120) as response:
+    with urlopen(req, timeout=timeout) as response:
         return response.read().decode("utf-8", errors="replace")
 
 
+def post_question(question: str, q_id: str) -> str:
+    return _post(API_URL, {"q_id": q_id, "question": question}, 120)
+
+
+def post_questions(batch: list[dict]) -> str:
+    return _post(API_BATCH_URL, {"questions": batch}, 120 * len(batch))
+
+
 def main():
     with open(JSON_PATH, "r", encoding="utf-8") as f:
         items = json.load(f)
 
+    if BATCH_SIZE > 0:
+        batch_main(items)
+        return
+
     with tqdm(total=len(items)) as pbar:
         for item in items:
             question = item.get("question")
@@ -38,5 +52,18 @@ def main():
             pbar.update(1)
 
 
+def batch_main(items: list[dict]):
+    items = [{"q_id": item.get("q_id"), "question": item.get("question")} for item in items if item.get("question")]
+
+    with tqdm(total=len(items)) as pbar:
+        for i in range(0, len(items), BATCH_SIZE):
+            batch = items[i:i + BATCH_SIZE]
+            pbar.set_description(f"Fragen #{batch[0]['q_id']} - #{batch[-1]['q_id']} werden bearbeitet")
+            output = post_questions(batch)
+            if PRINT:
+                print(f"{output}\n")
+            pbar.update(len(batch))
+
+
 if __name__ == "__main__":
     main()
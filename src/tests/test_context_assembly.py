@@ -0,0 +1,49 @@
+from dataclasses import replace
+
+from app.config import load_config
+from app.context_assembly import TokenCounter, assemble_context
+
+SOURCE = "alpha beta gamma delta\nepsilon zeta eta theta\n iota kappa lambda mu nu\n"
+HEADER = "### Metadata\n- Block type: text\n### Content\n"
+
+
+def _retrieved(start: int, end: int, header: str = "", distance: float = 0.1) -> tuple[str, dict]:
+    # Wie retrieval._post_retrieve: Chunk wird gestrippt, text_start/text_end zeigen auf den gestrippten Text
+    raw = SOURCE[start:end]
+    lead = len(raw) - len(raw.lstrip())
+    doc = raw.strip()
+    meta = {"source": "doc.txt", "chunk_start": start, "chunk_end": end, "distance": distance,
+            "text_start": start + lead, "text_end": start + lead + len(doc)}
+    return header + doc, meta
+
+
+def _assemble(chunks: list[tuple[str, dict]]):
+    counter = TokenCounter(replace(load_config(), context_tokenizer=""))
+    return assemble_context([d for d, _ in chunks], [m for _, m in chunks], counter)
+
+
+def test_merge_overlapping_chunks_with_whitespace_edges():
+    # Chunk 1 endet mit "\n", Chunk 2 beginnt mit " " bzw. mitten in der Überlappung
+    docs, metas, stats = _assemble([_retrieved(0, 24), _retrieved(22, 50)])
+    assert stats["blocks"] == 1
+    assert docs == [SOURCE[0:50].strip()]
+    assert metas[0]["merged_chunks"] == 2
+    assert (metas[0]["chunk_start"], metas[0]["chunk_end"]) == (0, 50)
+
+
+def test_merge_keeps_header_and_text():
+    docs, _, _ = _assemble([_retrieved(20, 47, HEADER), _retrieved(0, 23, HEADER, distance=0.2)])
+    assert docs == [HEADER + SOURCE[0:47].strip()]
+
+
+def test_adjacent_chunks_separated_by_stripped_whitespace_stay_separate():
+    docs, _, stats = _assemble([_retrieved(0, 23), _retrieved(23, 46)])
+    assert stats["blocks"] == 2
+    assert docs == [SOURCE[0:23].strip(), SOURCE[23:46].strip()]
+
+
+def test_chunks_without_text_offsets_are_not_merged():
+    docs, _, stats = _assemble([("alpha beta", {"source": "doc.txt", "chunk_start": 0, "chunk_end": 12}),
+                                ("beta gamma", {"source": "doc.txt", "chunk_start": 6, "chunk_end": 16})])
+    assert stats["blocks"] == 2
+    assert docs == ["alpha beta", "beta gamma"]
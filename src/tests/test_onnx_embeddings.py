@@ -0,0 +1,54 @@
+import importlib.util
+import platform
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app.config import load_config
+from app.embedding import _CHECK_TEXTS, _ensure_onnx_model, _get_model_dir
+
+pytestmark = pytest.mark.skipif(
+    importlib.util.find_spec("onnxruntime") is None or importlib.util.find_spec("optimum") is None,
+    reason="onnxruntime / optimum nicht installiert",
+)
+
+# Typische Chunks und Fragen, zusätzlich zu den Texten der Prüfung beim Laden
+TEXTS = _CHECK_TEXTS + [
+    "### Metadata\n- Block type: text\n### Content\nRetrieval augmented generation combines a retriever with an LLM.",
+    "How much energy does a GPU consume during inference?",
+    "Table 2: Throughput (tokens/s) and latency (ms) for batch sizes 1, 8 and 32.",
+    "Im Folgenden zeigen wir, dass der Algorithmus in O(n log n) terminiert.",
+    "",
+]
+INT8 = "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx2"
+
+
+@pytest.fixture(scope="module")
+def model_dir():
+    model_dir = _get_model_dir(load_config())
+    if not model_dir.is_dir() or not any(model_dir.iterdir()):
+        pytest.skip(f"Embedding Modell nicht vorhanden: {model_dir}")
+    return model_dir
+
+
+@pytest.fixture(scope="module")
+def reference(model_dir):
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(str(model_dir), device="cpu", local_files_only=True)
+    return model.encode(TEXTS, convert_to_numpy=True, normalize_embeddings=True)
+
+
+@pytest.mark.parametrize("quantization", ["none", INT8])
+def test_onnx_embeddings_within_tolerance(model_dir, reference, quantization):
+    from sentence_transformers import SentenceTransformer
+
+    cfg = replace(load_config(), embedding_backend="onnx", onnx_quantization=quantization)
+    file_name = _ensure_onnx_model(cfg, model_dir)
+    model = SentenceTransformer(str(model_dir), backend="onnx", device="cpu", local_files_only=True,
+                                model_kwargs={"file_name": file_name, "provider": "CPUExecutionProvider"})
+    actual = model.encode(TEXTS, convert_to_numpy=True, normalize_embeddings=True)
+
+    min_cosine = float(np.min(np.sum(reference * actual, axis=1)))
+    assert min_cosine >= cfg.onnx_min_similarity, f"{file_name}: min. Cosinus {min_cosine:.6f}"
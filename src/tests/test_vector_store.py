@@ -0,0 +1,104 @@
+from dataclasses import replace
+
+import chromadb
+import numpy as np
+import pytest
+
+from app.config import load_config
+from app.retrieval import _DROP_BLOCK_TYPES, _where_filter
+from app.vector_store import NumpyVectorStore
+
+N, DIM, TOP_K = 3000, 384, 10
+BLOCK_TYPES = ["text", "table", "caption", "heading", *_DROP_BLOCK_TYPES.tolist()]
+SOURCES = ["a.txt", "b.txt", "c.txt"]
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    # Themen aus je TOP_K Chunks, Fragen zu einem Thema. Das Rauschen ist so gewählt, dass die binäre Suche ohne
+    # Rescoring (rescore=1) nicht mehr alle top_k findet.
+    centers = rng.standard_normal((N // TOP_K, DIM)).astype(np.float32)
+    matrix = np.repeat(centers, TOP_K, axis=0) + 1.2 * rng.standard_normal((N, DIM)).astype(np.float32)
+    queries = centers[rng.choice(len(centers), 20, replace=False)] + 1.2 * rng.standard_normal((20, DIM)).astype(
+        np.float32)
+
+    ids = [f"chunk_{i}" for i in range(N)]
+    metas = []
+    for i in range(N):
+        meta = {"source": SOURCES[i % len(SOURCES)], "chunk_index": i}
+        if i % 7:  # Chunks aus anderen Chunking-Strategien haben keinen block_type
+            meta["block_type"] = BLOCK_TYPES[i % len(BLOCK_TYPES)]
+        metas.append(meta)
+    return ids, matrix, metas, queries
+
+
+def _store(tmp_path, data, quantization: str, rescore: int = 4) -> NumpyVectorStore:
+    ids, matrix, metas, _ = data
+    store = NumpyVectorStore(str(tmp_path), quantization=quantization, rescore=rescore)
+    store.add(ids, matrix, metas)
+    return store
+
+
+def _exact_top_k(data, mask: np.ndarray | None = None) -> tuple[list[set[str]], np.ndarray]:
+    """
+    Exakte Cosinus-Suche in float64.
+    :return: ids der top_k pro Frage, Distanzen (aufsteigend)
+    """
+    ids, matrix, _, queries = data
+    unit = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    dists = 1.0 - (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float64) @ unit.T
+    if mask is not None:
+        dists[:, ~mask] = np.inf
+    rows = np.argsort(dists, axis=1, kind="stable")[:, :TOP_K]
+    return [{ids[r] for r in row} for row in rows], np.take_along_axis(dists, rows, axis=1)
+
+
+@pytest.mark.parametrize("quantization", ["float16", "int8", "binary"])
+@pytest.mark.parametrize("rescore", [4, 8])
+def test_quantized_search_matches_exact(tmp_path, data, monkeypatch, quantization, rescore):
+    # Kleine Blöcke, damit die blockweise Kandidatenauswahl mehrere Blöcke zusammenführt
+    monkeypatch.setattr(NumpyVectorStore, "_QUANTIZED_BLOCK_ROWS", 512)
+    store = _store(tmp_path, data, quantization, rescore)
+
+    result = store.query(data[3], n_results=TOP_K)
+    expected_ids, expected_dists = _exact_top_k(data)
+    assert [set(row) for row in result["ids"]] == expected_ids
+    # Rescoring: Distanzen und Reihenfolge wie bei der exakten float32 Suche
+    np.testing.assert_allclose(result["distances"], expected_dists, atol=1e-5)
+
+
+def _filters() -> list[dict]:
+    retrieval_filter = _where_filter(replace(load_config(), metadata_filter=True, filter_pushdown=True,
+                                             chunking_strategy="structure"))
+    return [
+        retrieval_filter,
+        {"$and": [retrieval_filter, {"source": "b.txt"}]},
+        {"$and": [{"source": {"$in": ["a.txt", "c.txt"]}}, {"block_type": {"$ne": "table"}}]},
+        {"block_type": "text"},
+        {"block_type": {"$in": ["table", "caption"]}},
+    ]
+
+
+@pytest.fixture(scope="module")
+def chroma(tmp_path_factory, data):
+    ids, matrix, metas, _ = data
+    client = chromadb.PersistentClient(path=str(tmp_path_factory.mktemp("chroma")))
+    collection = client.get_or_create_collection("rag", metadata={"hnsw:space": "cosine"})
+    collection.add(ids=ids, embeddings=matrix, metadatas=metas)
+    return collection
+
+
+@pytest.mark.parametrize("where", _filters(), ids=lambda w: str(w)[:60])
+def test_where_mask_matches_chroma(tmp_path, data, chroma, where):
+    store = _store(tmp_path, data, "none")
+    store.delete(["chunk_1", "chunk_2"])
+
+    mask = store._where_mask(where)
+    expected = set(chroma.get(where=where, include=[])["ids"]) - {"chunk_1", "chunk_2"}
+    assert {data[0][r] for r in np.flatnonzero(mask)} == expected
+
+    # Die Suche mit Filter liefert die exakten top_k unter den passenden Chunks
+    result = store.query(data[3], n_results=TOP_K, where=where)
+    assert all(chunk_id in expected for row in result["ids"] for chunk_id in row)
+    np.testing.assert_allclose(result["distances"], _exact_top_k(data, mask)[1], atol=1e-5)